@@ -14,6 +14,11 @@ from auth.authz import _copy_course_group
 #
 
 
+def print_progress(what, done, total):
+    if done == total or done % 100 == 0:
+        print "Cloned {0} of {1} {2}".format(done, total, what)
+
+
 class Command(BaseCommand):
     help = 'Clone a MongoDB backed course to another location'
 
@@ -32,6 +37,6 @@ class Command(BaseCommand):
         source_location = CourseDescriptor.id_to_location(source_location_str)
         dest_location = CourseDescriptor.id_to_location(dest_location_str)
 
-        if clone_course(ms, cs, source_location, dest_location):
+        if clone_course(ms, cs, source_location, dest_location, progress=print_progress):
             print "copying User permissions..."
             _copy_course_group(source_location, dest_location)
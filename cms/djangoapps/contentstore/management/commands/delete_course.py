@@ -15,6 +15,11 @@ from auth.authz import _delete_course_group
 #
 
 
+def print_progress(what, done, total):
+    if done == total or done % 100 == 0:
+        print "Done with {0} of {1} {2}".format(done, total, what)
+
+
 class Command(BaseCommand):
     help = '''Delete a MongoDB backed course'''
 
@@ -37,7 +42,7 @@ class Command(BaseCommand):
         if query_yes_no("Deleting course {0}. Confirm?".format(loc_str), default="no"):
             if query_yes_no("Are you sure. This action cannot be undone!", default="no"):
                 loc = CourseDescriptor.id_to_location(loc_str)
-                if delete_course(ms, cs, loc, commit):
+                if delete_course(ms, cs, loc, commit, progress=print_progress):
                     print 'removing User permissions from course....'
                     # in the django layer, we need to remove all the user permissions groups associated with this course
                     if commit:
@@ -1,5 +1,8 @@
 import json
+import os
 import shutil
+import tarfile
+from StringIO import StringIO
 from django.test.client import Client
 from django.test.utils import override_settings
 from django.conf import settings
@@ -13,6 +16,7 @@ from datetime import timedelta
 
 from django.contrib.auth.models import User
 from django.dispatch import Signal
+from mock import patch
 from contentstore.utils import get_modulestore
 from contentstore.tests.utils import parse_json
 
@@ -24,6 +28,7 @@ from xmodule.modulestore.store_utilities import clone_course
 from xmodule.modulestore.store_utilities import delete_course
 from xmodule.modulestore.django import modulestore
 from xmodule.contentstore.django import contentstore
+from xmodule.contentstore.content import StaticContent
 from xmodule.templates import update_templates
 from xmodule.modulestore.xml_exporter import export_to_xml
 from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint
@@ -360,19 +365,35 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         }
 
         module_store = modulestore('direct')
-        import_from_xml(module_store, 'common/test/data/', ['full'])
+        content_store = contentstore()
+        import_from_xml(module_store, 'common/test/data/', ['full'], static_content_store=content_store)
 
         resp = self.client.post(reverse('create_new_course'), course_data)
         self.assertEqual(resp.status_code, 200)
         data = parse_json(resp)
         self.assertEqual(data['id'], 'i4x://MITx/999/course/Robot_Super_Course')
 
-        content_store = contentstore()
-
         source_location = CourseDescriptor.id_to_location('edX/full/6.002_Spring_2012')
         dest_location = CourseDescriptor.id_to_location('MITx/999/Robot_Super_Course')
 
-        clone_course(module_store, content_store, source_location, dest_location)
+        progress = []
+        clone_course(module_store, content_store, source_location, dest_location,
+                     progress=lambda what, done, total: progress.append((what, done, total)))
+        module_count = len(module_store.get_items(Location(['i4x', 'edX', 'full', None, None])))
+        self.assertEqual(progress[-1][0], 'assets')
+        self.assertIn(('modules', module_count, module_count), progress)
+
+        # the assets are copied too, with their data
+        assets = content_store.get_all_content_for_course(source_location)
+        self.assertGreater(len(assets), 0)
+        self.assertEqual(len(content_store.get_all_content_for_course(dest_location)), len(assets))
+        for asset in assets:
+            asset_location = Location(asset['_id'])
+            clone_location = asset_location.replace(org='MITx', course='999')
+            clone = content_store.find(clone_location)
+            self.assertEqual(clone.data, content_store.find(asset_location).data)
+            if clone.thumbnail_location is not None:
+                self.assertEqual(Location(clone.thumbnail_location).tag, 'c4x')
 
         # now loop through all the units in the course and verify that the clone can render them, which
         # means the objects are at least present
@@ -386,22 +407,54 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
             resp = self.client.get(reverse('edit_unit', kwargs={'location': new_loc.url()}))
             self.assertEqual(resp.status_code, 200)
 
+    def test_copy_asset_over_interrupted_copy(self):
+        content_store = contentstore()
+        import_from_xml(modulestore('direct'), 'common/test/data/', ['full'], static_content_store=content_store)
+
+        source_location = CourseDescriptor.id_to_location('edX/full/6.002_Spring_2012')
+        source = content_store.get_all_content_for_course(source_location)[0]
+        asset_location = Location(source['_id'])
+        clone_location = asset_location.replace(org='MITx', course='999')
+
+        # what a copy that died before writing the file leaves
+        content_store.fs_chunks.insert(
+            {'files_id': StaticContent.get_id_from_location(clone_location), 'n': 0, 'data': 'stale'}, safe=True)
+
+        content_store.copy(source, clone_location)
+        self.assertEqual(content_store.find(clone_location).data, content_store.find(asset_location).data)
+
     def test_bad_contentstore_request(self):
         resp = self.client.get('http://localhost:8001/c4x/CDX/123123/asset/&images_circuits_Lab7Solution2.png')
         self.assertEqual(resp.status_code, 400)
 
     def test_delete_course(self):
         module_store = modulestore('direct')
-        import_from_xml(module_store, 'common/test/data/', ['full'])
-
         content_store = contentstore()
+        import_from_xml(module_store, 'common/test/data/', ['full'], static_content_store=content_store)
 
         location = CourseDescriptor.id_to_location('edX/full/6.002_Spring_2012')
+        self.assertGreater(len(content_store.get_all_content_for_course(location)), 0)
 
         delete_course(module_store, content_store, location, commit=True)
 
         items = module_store.get_items(Location(['i4x', 'edX', 'full', 'vertical', None]))
         self.assertEqual(len(items), 0)
+        self.assertFalse(module_store.has_item(location))
+        self.assertEqual(content_store.get_all_content_for_course(location), [])
+
+    def test_delete_course_dry_run(self):
+        module_store = modulestore('direct')
+        content_store = contentstore()
+        import_from_xml(module_store, 'common/test/data/', ['full'], static_content_store=content_store)
+
+        location = CourseDescriptor.id_to_location('edX/full/6.002_Spring_2012')
+        with patch.object(module_store, 'fire_updated_modulestore_signal') as fire_signal:
+            delete_course(module_store, content_store, location)
+
+        # nothing was deleted, nor invalidated
+        self.assertFalse(fire_signal.called)
+        self.assertTrue(module_store.has_item(location))
+        self.assertGreater(len(content_store.get_all_content_for_course(location)), 0)
 
     def verify_content_existence(self, modulestore, root_dir, location, dirname, category_name, filename_suffix=''):
         filesystem = OSFS(root_dir / 'test_export')
@@ -571,6 +624,31 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         self.assertFalse(Location(['i4x', 'edX', 'full', 'vertical', 'vertical_58', None])
                          in course.system.module_data)
 
+    def test_export_course_archive(self):
+        module_store = modulestore('direct')
+        content_store = contentstore()
+        import_from_xml(module_store, 'common/test/data/', ['full'], static_content_store=content_store)
+        location = CourseDescriptor.id_to_location('edX/full/6.002_Spring_2012')
+
+        resp = self.client.get(reverse('generate_export_course', kwargs={
+            'org': location.org, 'course': location.course, 'name': location.name
+        }))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/x-tgz')
+
+        archive = tarfile.open(fileobj=StringIO(resp.content), mode='r:gz')
+        names = archive.getnames()
+        self.assertIn('6.002_Spring_2012/course.xml', names)
+        self.assertIn('6.002_Spring_2012/policies/6.002_Spring_2012/policy.json', names)
+
+        # the assets are in the archive, with their data
+        assets = content_store.get_all_content_for_course(location)
+        self.assertGreater(len(assets), 0)
+        for asset in assets:
+            content = content_store.find(Location(asset['_id']))
+            asset_path = os.path.join('6.002_Spring_2012', 'static', os.path.dirname(content.import_path), content.name)
+            self.assertEqual(archive.extractfile(asset_path).read(), content.data)
+
     def test_export_course_with_unknown_metadata(self):
         module_store = modulestore('direct')
         content_store = contentstore()
@@ -3,7 +3,6 @@ import json
 import os
 import tarfile
 import shutil
-from tempfile import mkdtemp
 from path import path
 
 from django.conf import settings
@@ -11,8 +10,6 @@ from django.http import HttpResponse, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
 from django_future.csrf import ensure_csrf_cookie
 from django.core.urlresolvers import reverse
-from django.core.servers.basehttp import FileWrapper
-from django.core.files.temp import NamedTemporaryFile
 
 from mitxmako.shortcuts import render_to_response
 from cache_toolbox.core import del_cached_content
@@ -20,7 +17,7 @@ from auth.authz import create_all_course_groups
 
 from xmodule.modulestore.xml_importer import import_from_xml
 from xmodule.contentstore.django import contentstore
-from xmodule.modulestore.xml_exporter import export_to_xml
+from xmodule.modulestore.xml_exporter import export_to_tar_gz
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore import Location
 from xmodule.contentstore.content import StaticContent
@@ -222,29 +219,11 @@ def generate_export_course(request, org, course, name):
     location = get_location_and_verify_access(request, org, course, name)
 
     loc = Location(location)
-    export_file = NamedTemporaryFile(prefix=name + '.', suffix=".tar.gz")
 
-    root_dir = path(mkdtemp())
-
-    # export out to a tempdir
-
-    logging.debug('root = {0}'.format(root_dir))
-
-    export_to_xml(modulestore('direct'), contentstore(), loc, root_dir, name, modulestore())
-    #filename = root_dir / name + '.tar.gz'
-
-    logging.debug('tar file being generated at {0}'.format(export_file.name))
-    tar_file = tarfile.open(name=export_file.name, mode='w:gz')
-    tar_file.add(root_dir / name, arcname=name)
-    tar_file.close()
-
-    # remove temp dir
-    shutil.rmtree(root_dir / name)
-
-    wrapper = FileWrapper(export_file)
-    response = HttpResponse(wrapper, content_type='application/x-tgz')
-    response['Content-Disposition'] = 'attachment; filename=%s' % os.path.basename(export_file.name)
-    response['Content-Length'] = os.path.getsize(export_file.name)
+    # the archive is sent as it is made, without being written to disk first
+    archive = export_to_tar_gz(modulestore('direct'), contentstore(), loc, name, modulestore())
+    response = HttpResponse(archive, content_type='application/x-tgz')
+    response['Content-Disposition'] = 'attachment; filename=%s.tar.gz' % name
     return response
 
 
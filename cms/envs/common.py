@@ -173,6 +173,23 @@ STATIC_URL = '/static/'
 ADMIN_MEDIA_PREFIX = '/static/admin/'
 STATIC_ROOT = ENV_ROOT / "staticfiles"
 
+# Course assets (served by contentserver.middleware.StaticContentServer) bigger
+# than this many bytes are streamed from the contentstore instead of being
+# cached whole (memcached can't hold items over 1MB)
+STATIC_CONTENT_MAX_CACHED_SIZE = 512 * 1024
+
+# Large course assets can also be kept in a cache on local disk, so that they
+# are served without reading them from the contentstore
+STATIC_CONTENT_DISK_CACHE = {
+    # Directory for the cached files.  None means don't cache assets on disk.
+    'ROOT': None,
+    # How many bytes of assets to keep, at most
+    'MAX_SIZE': 1024 * 1024 * 1024,
+    # A header (e.g. 'X-Sendfile') telling the web server to send a cached file
+    # itself, if it supports that.  None means send the files from Django.
+    'SENDFILE_HEADER': None,
+}
+
 STATICFILES_DIRS = [
     COMMON_ROOT / "static",
     PROJECT_ROOT / "static",
@@ -194,6 +211,17 @@ LOCALE_PATHS = (REPO_ROOT + '/conf/locale',)  # mitx/conf/locale/
 # Tracking
 TRACK_MAX_EVENT = 10000
 
+# Write tracking events from a background thread, in batches, instead of while
+# handling requests.  When QUEUE_SIZE events are waiting, new ones are dropped.
+TRACKING_LOG_WRITER = {
+    'ENABLED': True,
+    'QUEUE_SIZE': 10000,
+    # write at most this many events at a time...
+    'BATCH_SIZE': 100,
+    # ...waiting at most this many seconds for a batch to fill up
+    'FLUSH_INTERVAL': 1.0,
+}
+
 # Messages
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
@@ -84,6 +84,9 @@ DATABASES = {
 LMS_BASE = "localhost:8000"
 MITX_FEATURES['PREVIEW_LMS_BASE'] = "preview"
 
+# Write tracking events as they happen, so tests can see them
+TRACKING_LOG_WRITER['ENABLED'] = False
+
 CACHES = {
     # This is the cache used for most things. Askbot will not work without a
     # functioning cache -- it relies on caching to load its settings in places.
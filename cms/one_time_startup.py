@@ -3,6 +3,7 @@ from django.conf import settings
 from xmodule.modulestore.django import modulestore
 from django.dispatch import Signal
 from request_cache.middleware import RequestCache
+from django_comment_common.utils import invalidate_discussion_info
 
 from django.core.cache import get_cache
 
@@ -14,6 +15,8 @@ for store_name in settings.MODULESTORE:
 
     modulestore_update_signal = Signal(providing_args=['modulestore', 'course_id', 'location'])
     store.modulestore_update_signal = modulestore_update_signal
+    # the discussion category maps the LMS caches depend on the course contents
+    modulestore_update_signal.connect(invalidate_discussion_info)
 if hasattr(settings, 'DATADOG_API'):
     dog_http_api.api_key = settings.DATADOG_API
     dog_stats_api.start(api_key=settings.DATADOG_API, statsd=True)
@@ -0,0 +1,124 @@
+"""
+A size-bounded cache of course assets on local disk, so that app nodes can
+serve large, popular assets without reading them from the contentstore.
+
+Files are named by the digest of their content (the md5 GridFS computes), so
+a changed asset simply gets a new file, and files for assets nobody asks for
+any more are evicted, least recently used first, once the cache is full.
+Several processes can share the same directory.
+"""
+import errno
+import logging
+import mmap
+import os
+import tempfile
+
+log = logging.getLogger(__name__)
+
+
+class DiskAssetCache(object):
+    """
+    Asset data stored in files under `root`, up to about `max_size` bytes.
+    """
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+
+    def path(self, content_digest):
+        """
+        Return the path of the file for the content with digest content_digest
+        """
+        return os.path.join(self.root, content_digest[:2], content_digest)
+
+    def get(self, content_digest):
+        """
+        Return the path of the file holding the content with digest
+        content_digest, or None if it isn't cached.
+        """
+        path = self.path(content_digest)
+        try:
+            # the modification time is when the file was last used, for eviction
+            os.utime(path, None)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return None
+        return path
+
+    def put(self, content_digest, chunks):
+        """
+        Store the content with digest content_digest, read from the iterable
+        chunks, and return the path of its file.
+        """
+        path = self.path(content_digest)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+
+        # write to a temporary file first, so nobody ever sees a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                for chunk in chunks:
+                    fp.write(chunk)
+            os.rename(tmp_path, path)
+        except:
+            os.unlink(tmp_path)
+            raise
+
+        self.evict()
+        return path
+
+    def delete(self, content_digest):
+        """
+        Remove the content with digest content_digest, if it is cached
+        """
+        try:
+            os.unlink(self.path(content_digest))
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+
+    def evict(self):
+        """
+        Remove the least recently used files until the cache is no bigger than max_size
+        """
+        files = []
+        total_size = 0
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.tmp-'):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # another process evicted it
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total_size -= size
+            log.debug("Evicted %s from the asset cache", path)
+
+    @staticmethod
+    def open(path):
+        """
+        Return a read-only memory map of the (non-empty) file at path, which
+        can be read like a file.
+        """
+        with open(path, 'rb') as fp:
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
@@ -1,16 +1,95 @@
 import logging
+import re
 import time
 
+from django.conf import settings
 from django.http import HttpResponse, Http404, HttpResponseNotModified
 
 from xmodule.contentstore.django import contentstore
-from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
+from xmodule.contentstore.content import StaticContent, StaticContentStream, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError
-from cache_toolbox.core import get_cached_content, set_cached_content
+from cache_toolbox.core import get_cached_content, set_cached_content, del_cached_content
 from xmodule.exceptions import NotFoundError
 
+from .disk_cache import DiskAssetCache
+
+log = logging.getLogger(__name__)
+
+# a single range of bytes, e.g. 'bytes=0-499', 'bytes=500-' or 'bytes=-500'
+BYTE_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range_header(header, length):
+    """
+    Return (first_byte, last_byte) for the value of a Range header asking for a
+    single range of bytes of content of length length, or None if the header
+    asks for something else (e.g. several ranges) and the whole content should
+    be served.
+
+    Raises ValueError if the range can't be satisfied.
+    """
+    match = BYTE_RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if first:
+        first_byte = int(first)
+        last_byte = min(int(last), length - 1) if last else length - 1
+    elif last:
+        # the last N bytes
+        first_byte = max(length - int(last), 0)
+        last_byte = length - 1
+    else:
+        return None
+
+    if first_byte > last_byte:
+        raise ValueError("Unsatisfiable range {0} for content of length {1}".format(header, length))
+    return first_byte, last_byte
+
 
 class StaticContentServer(object):
+    def __init__(self):
+        self.disk_cache = None
+        self.sendfile_header = None
+        options = getattr(settings, 'STATIC_CONTENT_DISK_CACHE', {})
+        if options.get('ROOT'):
+            self.disk_cache = DiskAssetCache(options['ROOT'], options['MAX_SIZE'])
+            self.sendfile_header = options.get('SENDFILE_HEADER')
+            store = contentstore()
+            if hasattr(store, 'add_change_listener'):
+                store.add_change_listener(self.asset_changed)
+
+    def asset_changed(self, location, content_digest):
+        """
+        Forget about the asset at location, whose data had the digest
+        content_digest, because it has been replaced or deleted.
+        """
+        del_cached_content(location)
+        if content_digest:
+            self.disk_cache.delete(content_digest)
+
+    def get_disk_cached_content(self, content):
+        """
+        Return StaticContent for the data of content (which has no data
+        in memory) read from the disk cache, storing it there first if needed,
+        and the path of its file.
+        """
+        path = self.disk_cache.get(content.content_digest)
+        if path is None:
+            if not isinstance(content, StaticContentStream):
+                # only the metadata was cached, get the data from the DB
+                content = contentstore().find(content.location, as_stream=True)
+            path = self.disk_cache.put(content.content_digest, content.stream_data())
+            log.debug("Stored %s in the asset cache", content.location)
+
+        cached_content = StaticContentStream(
+            content.location, content.name, content.content_type, DiskAssetCache.open(path),
+            last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+            import_path=content.import_path, length=content.length, content_digest=content.content_digest
+        )
+        return cached_content, path
+
     def process_request(self, request):
         # look to see if the request is prefixed with 'c4x' tag
         if request.path.startswith('/' + XASSET_LOCATION_TAG + '/'):
@@ -20,21 +99,27 @@ class StaticContentServer(object):
                 # return a 'Bad Request' to browser as we have a malformed Location
                 response = HttpResponse()
                 response.status_code = 400
-                return response     
+                return response
 
             # first look in our cache so we don't have to round-trip to the DB
             content = get_cached_content(loc)
             if content is None:
-                # nope, not in cache, let's fetch from DB
+                # nope, not in cache, let's fetch from DB, without reading the data yet
                 try:
-                    content = contentstore().find(loc)
+                    content = contentstore().find(loc, as_stream=True)
                 except NotFoundError:
                     response = HttpResponse()
                     response.status_code = 404
                     return response
 
-                # since we fetched it from DB, let's cache it going forward
-                set_cached_content(content)
+                # since we fetched it from DB, let's cache it going forward, unless
+                # it is too big to keep in the cache
+                if content.length <= settings.STATIC_CONTENT_MAX_CACHED_SIZE:
+                    content = content.copy_to_in_mem()
+                    set_cached_content(content)
+                elif self.disk_cache is not None:
+                    # the data will be on disk, so just cache where to find it
+                    set_cached_content(content.copy_without_data())
             else:
                 # @todo: we probably want to have 'cache hit' counters so we can
                 # measure the efficacy of our caches
@@ -45,15 +130,72 @@ class StaticContentServer(object):
             # convert over the DB persistent last modified timestamp to a HTTP compatible
             # timestamp, so we can simply compare the strings
             last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+            # (content cached before it had a digest and length won't have them)
+            content_digest = getattr(content, 'content_digest', None)
+            etag = '"{0}"'.format(content_digest) if content_digest else None
 
             # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            # ETags or timestamps, if they are the same then just return a 304 (Not Modified)
+            if etag is not None and 'HTTP_IF_NONE_MATCH' in request.META:
+                if etag in [tag.strip() for tag in request.META['HTTP_IF_NONE_MATCH'].split(',')]:
+                    return HttpResponseNotModified()
+            elif 'HTTP_IF_MODIFIED_SINCE' in request.META:
                 if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
                 if if_modified_since == last_modified_at_str:
                     return HttpResponseNotModified()
 
-            response = HttpResponse(content.data, content_type=content.content_type)
+            path = None
+            try:
+                if content.data is None and self.disk_cache is not None and content.content_digest:
+                    content, path = self.get_disk_cached_content(content)
+                elif content.data is None and not isinstance(content, StaticContentStream):
+                    # only the metadata was cached, by a process with a disk cache
+                    content = contentstore().find(loc, as_stream=True)
+            except NotFoundError:
+                # it was deleted since we cached its metadata
+                del_cached_content(loc)
+                response = HttpResponse()
+                response.status_code = 404
+                return response
+
+            length = getattr(content, 'length', None)
+            if length is None:
+                length = len(content.data)
+            byte_range = None
+            if 'HTTP_RANGE' in request.META:
+                try:
+                    byte_range = parse_range_header(request.META['HTTP_RANGE'], length)
+                except ValueError:
+                    response = HttpResponse()
+                    response.status_code = 416
+                    response['Content-Range'] = 'bytes */{0}'.format(length)
+                    return response
+
+            if byte_range is not None:
+                first_byte, last_byte = byte_range
+                if content.data is None:
+                    data = content.stream_data_in_range(first_byte, last_byte)
+                else:
+                    data = content.data[first_byte:last_byte + 1]
+                response = HttpResponse(data, content_type=content.content_type)
+                response.status_code = 206
+                response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(first_byte, last_byte, length)
+                response['Content-Length'] = str(last_byte - first_byte + 1)
+            elif path is not None and self.sendfile_header:
+                # let the web server send the file
+                response = HttpResponse(content_type=content.content_type)
+                response[self.sendfile_header] = path
+            else:
+                if content.data is None:
+                    data = content.stream_data()
+                else:
+                    data = content.data
+                response = HttpResponse(data, content_type=content.content_type)
+                response['Content-Length'] = str(length)
+
+            response['Accept-Ranges'] = 'bytes'
             response['Last-Modified'] = last_modified_at_str
+            if etag is not None:
+                response['ETag'] = etag
 
             return response
@@ -0,0 +1,56 @@
+"""
+Tests for the DiskAssetCache
+"""
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from contentserver.disk_cache import DiskAssetCache
+
+
+class DiskAssetCacheTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = DiskAssetCache(self.root, 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get('abcdef'))
+        path = self.cache.put('abcdef', ['hello ', 'world'])
+        self.assertEqual(self.cache.get('abcdef'), path)
+        self.assertEqual(DiskAssetCache.open(path)[:], 'hello world')
+
+    def test_delete(self):
+        self.cache.put('abcdef', ['hello'])
+        self.cache.delete('abcdef')
+        self.assertIsNone(self.cache.get('abcdef'))
+        # deleting something that isn't there is fine
+        self.cache.delete('abcdef')
+
+    def test_failed_put(self):
+        def chunks():
+            yield 'hello'
+            raise IOError("the DB went away")
+
+        with self.assertRaises(IOError):
+            self.cache.put('abcdef', chunks())
+        self.assertIsNone(self.cache.get('abcdef'))
+        self.assertEqual(os.listdir(os.path.join(self.root, 'ab')), [])
+
+    def test_least_recently_used_evicted(self):
+        for n, digest in enumerate(['aa1', 'aa2', 'aa3']):
+            path = self.cache.put(digest, ['x' * 40])
+            os.utime(path, (n, n))
+        self.assertIsNone(self.cache.get('aa1'))
+
+        # aa3 gets used, so aa2 goes next
+        os.utime(self.cache.get('aa3'), None)
+        self.cache.put('bb1', ['x' * 40])
+        self.assertIsNone(self.cache.get('aa2'))
+        self.assertIsNotNone(self.cache.get('aa3'))
+        self.assertIsNotNone(self.cache.get('bb1'))
@@ -0,0 +1,65 @@
+"""
+Tests for the StaticContentServer middleware
+"""
+from datetime import datetime
+from StringIO import StringIO
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from mock import patch
+
+from contentserver.middleware import parse_range_header, StaticContentServer
+from xmodule.contentstore.content import StaticContent, StaticContentStream
+from xmodule.modulestore import Location
+
+
+class ParseRangeHeaderTest(TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-499', 1000), (0, 499))
+        self.assertEqual(parse_range_header('bytes=500-', 1000), (500, 999))
+        self.assertEqual(parse_range_header('bytes=-300', 1000), (700, 999))
+        self.assertEqual(parse_range_header('bytes=900-2000', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=-2000', 1000), (0, 999))
+
+    def test_whole_content(self):
+        self.assertIsNone(parse_range_header('bytes=0-1,5-6', 1000))
+        self.assertIsNone(parse_range_header('bytes=-', 1000))
+        self.assertIsNone(parse_range_header('pages=1-2', 1000))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range_header('bytes=1000-', 1000)
+        with self.assertRaises(ValueError):
+            parse_range_header('bytes=500-400', 1000)
+
+
+@override_settings(STATIC_CONTENT_DISK_CACHE={})
+class MetadataOnlyCacheTest(TestCase):
+    """
+    Processes with a disk cache only cache the metadata of large assets, which
+    the others have to get the data for.
+    """
+
+    def setUp(self):
+        self.location = Location('c4x', 'edX', 'toy', 'asset', 'big.pdf')
+        data = 'x' * 1000
+        self.content = StaticContentStream(
+            self.location, 'big.pdf', 'application/pdf', StringIO(data),
+            last_modified_at=datetime(2013, 1, 1), length=len(data), content_digest='digest'
+        )
+        self.data = data
+
+    @patch('contentserver.middleware.contentstore')
+    @patch('contentserver.middleware.get_cached_content')
+    def test_data_from_db(self, mock_get_cached_content, mock_contentstore):
+        mock_get_cached_content.return_value = self.content.copy_without_data()
+        mock_contentstore.return_value.find.return_value = self.content
+
+        request = RequestFactory().get(StaticContent.get_url_path_from_location(self.location))
+        response = StaticContentServer().process_request(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(''.join(response), self.data)
+        mock_contentstore.return_value.find.assert_called_once_with(self.location, as_stream=True)
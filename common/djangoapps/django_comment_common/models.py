@@ -61,6 +61,19 @@ class Role(models.Model):
 
         return self.permissions.filter(name=permission).exists()
 
+    def get_permission_names(self):
+        """
+        Return the set of the names of the permissions this role has, as
+        has_permission would judge them.
+        """
+        names = set(self.permissions.values_list('name', flat=True))
+        if self.name == FORUM_ROLE_STUDENT:
+            course_loc = CourseDescriptor.id_to_location(self.course_id)
+            course = modulestore().get_instance(self.course_id, course_loc)
+            if not course.forum_posts_allowed:
+                names = set(name for name in names if not name.startswith(('edit', 'update', 'create')))
+        return names
+
 
 class Permission(models.Model):
     name = models.CharField(max_length=30, null=False, blank=False, primary_key=True)
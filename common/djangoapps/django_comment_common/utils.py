@@ -1,3 +1,7 @@
+import uuid
+
+from django.core.cache import cache
+
 from django_comment_common.models import Role
 
 _STUDENT_ROLE_PERMISSIONS = ["vote", "update_thread", "follow_thread", "unfollow_thread",
@@ -54,3 +58,25 @@ def are_permissions_roles_seeded(course_id):
             return False
 
     return True
+
+
+def discussion_info_version(course_id_no_run):
+    """
+    Return the current version of the cached discussion information (category
+    maps and such) of the courses with course_id_no_run ("org/course").
+    """
+    key = 'discussion_info_version.{0}'.format(course_id_no_run)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version)
+    return version
+
+
+def invalidate_discussion_info(sender, course_id, **kwargs):
+    """
+    Make the cached discussion information of the courses with course_id
+    ("org/course") out of date.  Can be connected to a modulestore's
+    modulestore_update_signal.
+    """
+    cache.set('discussion_info_version.{0}'.format(course_id), uuid.uuid4().hex)
@@ -7,14 +7,28 @@ class RequestCache(object):
     @classmethod
     def get_request_cache(cls):
         return _request_cache_threadlocal
+
+    @classmethod
+    def get_request_data(cls, name):
+        """
+        Return the dict called name in the cache of the request this thread is
+        handling, creating it if needed, or None if the thread isn't handling
+        one (e.g. in a management command, or a pool of worker threads), so
+        that nothing is kept that would never be cleared.
+        """
+        if not getattr(_request_cache_threadlocal, 'in_request', False):
+            return None
+        return _request_cache_threadlocal.data.setdefault(name, {})
             
     def clear_request_cache(self):
         _request_cache_threadlocal.data = {}
 
     def process_request(self, request):
         self.clear_request_cache()
+        _request_cache_threadlocal.in_request = True
         return None
 
     def process_response(self, request, response):
         self.clear_request_cache()
-        return response
\ No newline at end of file
+        _request_cache_threadlocal.in_request = False
+        return response
@@ -5,12 +5,27 @@ from staticfiles.storage import staticfiles_storage
 from staticfiles import finders
 from django.conf import settings
 
+from lrucache import LRUCache
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.xml import XMLModuleStore
 from xmodule.contentstore.content import StaticContent
 
 log = logging.getLogger(__name__)
 
+# How many static url lookups to remember
+STATIC_URL_CACHE_SIZE = 4096
+
+_staticfiles_urls = LRUCache(STATIC_URL_CACHE_SIZE)
+_static_urls = LRUCache(STATIC_URL_CACHE_SIZE)
+
+
+def clear_caches():
+    """
+    Forget all the urls looked up so far
+    """
+    _staticfiles_urls.clear()
+    _static_urls.clear()
+
 
 def _url_replace_regex(prefix):
     """
@@ -33,33 +48,120 @@ def try_staticfiles_lookup(path):
     Try to lookup a path in staticfiles_storage.  If it fails, return
     a dead link instead of raising an exception.
     """
-    try:
-        url = staticfiles_storage.url(path)
-    except Exception as err:
-        log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
-            path, str(err)))
-        # Just return the original path; don't kill everything.
-        url = path
+    url = _staticfiles_urls.get(path)
+    if url is None:
+        try:
+            url = staticfiles_storage.url(path)
+        except Exception as err:
+            log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
+                path, str(err)))
+            # Just return the original path; don't kill everything.
+            url = path
+        _staticfiles_urls.set(path, url)
     return url
 
 
-def replace_course_urls(text, course_id):
+def _static_url(rest, prefix, data_directory, course_namespace):
     """
-    Replace /course/$stuff urls with /courses/$course_id/$stuff urls
+    Return the url that /static/$rest should be replaced by, or None if it should
+    be left alone.  See replace_static_urls.
+    """
+    # In debug mode, if we can find the url as is,
+    if settings.DEBUG and finders.find(rest, True):
+        return None
+    # if we're running with a MongoBacked store course_namespace is not None, then use studio style urls
+    elif course_namespace is not None and not isinstance(modulestore(), XMLModuleStore):
+        # first look in the static file pipeline and see if we are trying to reference
+        # a piece of static content which is in the mitx repo (e.g. JS associated with an xmodule)
+        if staticfiles_storage.exists(rest):
+            return staticfiles_storage.url(rest)
+        else:
+            # if not, then assume it's courseware specific content and then look in the
+            # Mongo-backed database
+            return StaticContent.convert_legacy_static_url(rest, course_namespace)
+    # Otherwise, look the file up in staticfiles_storage, and append the data directory if needed
+    else:
+        course_path = "/".join((data_directory, rest))
+
+        try:
+            if staticfiles_storage.exists(rest):
+                return staticfiles_storage.url(rest)
+            else:
+                return staticfiles_storage.url(course_path)
+        # And if that fails, assume that it's course content, and add manually data directory
+        except Exception as err:
+            log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
+                rest, str(err)))
+            return "".join([prefix, course_path])
 
-    text: The text to replace
-    course_module: A CourseDescriptor
 
-    returns: text with the links replaced
+def _cached_static_url(rest, prefix, data_directory, course_namespace):
+    """
+    _static_url, remembering the answers.  (Not in debug mode, where
+    the files can change under us.)
     """
+    if settings.DEBUG:
+        return _static_url(rest, prefix, data_directory, course_namespace)
+
+    key = (rest, data_directory, str(course_namespace))
+    url = _static_urls.get(key, False)
+    if url is False:
+        url = _static_url(rest, prefix, data_directory, course_namespace)
+        _static_urls.set(key, url)
+    return url
+
 
+def _replace_urls(text, data_directory=None, course_id=None, course_namespace=None, replace_static=True):
+    """
+    Replace /static/ urls (if replace_static) and /course/ urls (if course_id
+    is not None) in text, in one pass.
+    """
+    prefixes = []
+    if replace_static:
+        prefixes.append('/static/(?!{data_dir})'.format(data_dir=data_directory))
+    if course_id is not None:
+        prefixes.append('/course/')
 
-    def replace_course_url(match):
+    def replace_url(match):
+        original = match.group(0)
+        prefix = match.group('prefix')
         quote = match.group('quote')
         rest = match.group('rest')
-        return "".join([quote, '/courses/' + course_id + '/', rest, quote])
 
-    return re.sub(_url_replace_regex('/course/'), replace_course_url, text)
+        if prefix == '/course/':
+            return "".join([quote, '/courses/' + course_id + '/', rest, quote])
+
+        # Don't mess with things that end in '?raw'
+        if rest.endswith('?raw'):
+            return original
+
+        url = _cached_static_url(rest, prefix, data_directory, course_namespace)
+        if url is None:
+            return original
+        return "".join([quote, url, quote])
+
+    return re.sub(_url_replace_regex('|'.join(prefixes)), replace_url, text)
+
+
+def replace_urls(text, data_directory, course_id, course_namespace=None):
+    """
+    Do what replace_static_urls and then replace_course_urls do, in a single
+    pass over text.  What each static url is replaced by is remembered, but
+    not the rewritten texts, which can be large.
+    """
+    return _replace_urls(text, data_directory, course_id, course_namespace)
+
+
+def replace_course_urls(text, course_id):
+    """
+    Replace /course/$stuff urls with /courses/$course_id/$stuff urls
+
+    text: The text to replace
+    course_module: A CourseDescriptor
+
+    returns: text with the links replaced
+    """
+    return _replace_urls(text, course_id=course_id, replace_static=False)
 
 
 def replace_static_urls(text, data_directory, course_namespace=None):
@@ -73,49 +175,4 @@ def replace_static_urls(text, data_directory, course_namespace=None):
     data_directory: The directory in which course data is stored
     course_namespace: The course identifier used to distinguish static content for this course in studio
     """
-
-    def replace_static_url(match):
-        original = match.group(0)
-        prefix = match.group('prefix')
-        quote = match.group('quote')
-        rest = match.group('rest')
-
-        # Don't mess with things that end in '?raw'
-        if rest.endswith('?raw'):
-            return original
-
-        # In debug mode, if we can find the url as is,
-        if settings.DEBUG and finders.find(rest, True):
-            return original
-        # if we're running with a MongoBacked store course_namespace is not None, then use studio style urls
-        elif  course_namespace is not None and not isinstance(modulestore(), XMLModuleStore):
-            # first look in the static file pipeline and see if we are trying to reference
-            # a piece of static content which is in the mitx repo (e.g. JS associated with an xmodule)
-            if staticfiles_storage.exists(rest):
-                url = staticfiles_storage.url(rest)
-            else:
-                # if not, then assume it's courseware specific content and then look in the
-                # Mongo-backed database
-                url = StaticContent.convert_legacy_static_url(rest, course_namespace)
-        # Otherwise, look the file up in staticfiles_storage, and append the data directory if needed
-        else:
-            course_path = "/".join((data_directory, rest))
-
-            try:
-                if staticfiles_storage.exists(rest):
-                    url = staticfiles_storage.url(rest)
-                else:
-                    url = staticfiles_storage.url(course_path)
-            # And if that fails, assume that it's course content, and add manually data directory
-            except Exception as err:
-                log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
-                    rest, str(err)))
-                url = "".join([prefix, course_path])
-
-        return "".join([quote, url, quote])
-
-    return re.sub(
-        _url_replace_regex('/static/(?!{data_dir})'.format(data_dir=data_directory)),
-        replace_static_url,
-        text
-    )
+    return _replace_urls(text, data_directory, course_namespace=course_namespace)
@@ -1,8 +1,8 @@
 import re
 
-from nose.tools import assert_equals, assert_true, assert_false
-from static_replace import (replace_static_urls, replace_course_urls,
-                            _url_replace_regex)
+from nose.tools import assert_equals, assert_true, assert_false, with_setup
+from static_replace import (replace_static_urls, replace_course_urls, replace_urls,
+                            _url_replace_regex, clear_caches)
 from mock import patch, Mock
 from xmodule.modulestore import Location
 from xmodule.modulestore.mongo import MongoModuleStore
@@ -27,6 +27,7 @@ def test_multi_replace():
     )
 
 
+@with_setup(clear_caches)
 @patch('static_replace.staticfiles_storage')
 def test_storage_url_exists(mock_storage):
     mock_storage.exists.return_value = True
@@ -37,6 +38,7 @@ def test_storage_url_exists(mock_storage):
     mock_storage.url.called_once_with('data_dir/file.png')
 
 
+@with_setup(clear_caches)
 @patch('static_replace.staticfiles_storage')
 def test_storage_url_not_exists(mock_storage):
     mock_storage.exists.return_value = False
@@ -47,6 +49,7 @@ def test_storage_url_not_exists(mock_storage):
     mock_storage.url.called_once_with('file.png')
 
 
+@with_setup(clear_caches)
 @patch('static_replace.StaticContent')
 @patch('static_replace.modulestore')
 def test_mongo_filestore(mock_modulestore, mock_static_content):
@@ -66,6 +69,7 @@ def test_mongo_filestore(mock_modulestore, mock_static_content):
     mock_static_content.convert_legacy_static_url.assert_called_once_with('file.png', NAMESPACE)
 
 
+@with_setup(clear_caches)
 @patch('static_replace.settings')
 @patch('static_replace.modulestore')
 @patch('static_replace.staticfiles_storage')
@@ -80,6 +84,24 @@ def test_data_dir_fallback(mock_storage, mock_modulestore, mock_settings):
     assert_equals('"/static/data_dir/file.png"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY))
 
 
+@with_setup(clear_caches)
+@patch('static_replace.staticfiles_storage')
+def test_combined_replace(mock_storage):
+    mock_storage.exists.return_value = False
+    mock_storage.url.return_value = '/static/data_dir/file.png'
+    source = '<img src="/static/file.png"/><a href="/course/info">info</a><img src="/static/file.png"/>'
+    expected = replace_course_urls(replace_static_urls(source, DATA_DIRECTORY), COURSE_ID)
+
+    assert_equals(expected, replace_urls(source, DATA_DIRECTORY, COURSE_ID))
+    # the url was looked up once
+    assert_equals(mock_storage.url.call_count, 1)
+
+    # and the next time, nothing needs looking up
+    assert_equals(expected, replace_urls(source, DATA_DIRECTORY, COURSE_ID))
+    assert_equals(mock_storage.exists.call_count, 1)
+    assert_equals(mock_storage.url.call_count, 1)
+
+
 def test_raw_static_check():
     """
     Make sure replace_static_urls leaves alone things that end in '.raw'
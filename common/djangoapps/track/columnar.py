@@ -0,0 +1,393 @@
+"""
+A compact on-disk format for tracking events, for analytics over many of them.
+
+Events are partitioned by date and course, in directories like
+
+    <root>/date=2013-06-01/course=MITx%2F6.002x%2F2013_Spring/part-<id>/
+
+and each part stores its events column by column: the time as an array of
+timestamps, the event itself as compressed JSON, and the other fields
+(username, event_type, ...) dictionary-encoded, i.e. as an array of integer
+codes into a list of the distinct values, stored in the part's meta.json.
+
+Queries (see TrackingLogStore) skip the partitions outside the dates and
+course asked for, skip the parts that don't have the username or event_type
+asked for in their dictionaries, and only read the columns they need.
+
+Events are written with TrackingLogExporter, from TrackingLogs
+(records_from_database) or tracking log files (records_from_log_file).
+"""
+import calendar
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import urllib
+import uuid
+import zlib
+
+from array import array
+from collections import Counter, defaultdict
+
+import dateutil.parser
+import dateutil.tz
+
+log = logging.getLogger(__name__)
+
+# The fields of TrackingLog that are stored
+FIELDS = ['username', 'ip', 'event_source', 'event_type', 'event', 'agent', 'page', 'time', 'host']
+
+# The fields stored as codes into a dictionary of their values
+DICTIONARY_FIELDS = ['username', 'ip', 'event_source', 'event_type', 'agent', 'page', 'host']
+
+# The course an event is about, from its page or event_type
+COURSE_ID_RE = re.compile(r'/courses/([^/]+/[^/]+/[^/]+)/')
+
+# The course of the partition for events that aren't about a course
+NO_COURSE = '_none_'
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def course_id_for_record(record):
+    """
+    Return the id of the course the record is about, or None
+    """
+    for field in ('page', 'event_type'):
+        match = COURSE_ID_RE.search(record.get(field) or '')
+        if match:
+            return match.group(1)
+    return None
+
+
+def _timestamp(dt):
+    """
+    Seconds since the epoch of dt, a naive UTC datetime
+    """
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def _partition_name(date, course_id):
+    return os.path.join(
+        'date={0}'.format(date.isoformat()),
+        'course={0}'.format(urllib.quote(course_id or NO_COURSE, safe='')),
+    )
+
+
+def _write_compressed(path, data):
+    with open(path, 'wb') as fp:
+        fp.write(zlib.compress(data))
+
+
+def _read_compressed(path):
+    with open(path, 'rb') as fp:
+        return zlib.decompress(fp.read())
+
+
+class TrackingLogExporter(object):
+    """
+    Writes records (dicts with the FIELDS, with the time as a naive UTC
+    datetime) into the partitions under root.  Each part has at most
+    rows_per_part records.  Call close() when done to write the last parts.
+    """
+
+    def __init__(self, root, rows_per_part=100000, max_buffered_rows=1000000):
+        self.root = root
+        self.rows_per_part = rows_per_part
+        self.max_buffered_rows = max_buffered_rows
+        self.buffers = defaultdict(list)
+        self.buffered_rows = 0
+        self.rows_written = 0
+
+    def add(self, record):
+        key = (record['time'].date(), course_id_for_record(record))
+        buf = self.buffers[key]
+        buf.append(record)
+        self.buffered_rows += 1
+        if len(buf) >= self.rows_per_part:
+            self._flush(key)
+        elif self.buffered_rows >= self.max_buffered_rows:
+            # too much in memory: write the biggest partition's records
+            self._flush(max(self.buffers, key=lambda k: len(self.buffers[k])))
+
+    def close(self):
+        for key in self.buffers.keys():
+            self._flush(key)
+
+    def _flush(self, key):
+        records = self.buffers.pop(key)
+        self.buffered_rows -= len(records)
+        if records:
+            self._write_part(_partition_name(*key), records)
+            self.rows_written += len(records)
+
+    def _write_part(self, partition, records):
+        """
+        Write records as a new part of partition.  The part is written in a
+        temporary directory first, so that readers never see half of it.
+        """
+        partition_path = os.path.join(self.root, partition)
+        if not os.path.isdir(partition_path):
+            os.makedirs(partition_path)
+        part_name = 'part-{0}'.format(uuid.uuid4().hex)
+        tmp_path = os.path.join(partition_path, '.tmp-' + part_name)
+        os.mkdir(tmp_path)
+
+        try:
+            meta = {'rows': len(records), 'dictionaries': {}}
+            for field in DICTIONARY_FIELDS:
+                codes = array('I')
+                values = {}
+                for record in records:
+                    value = record.get(field)
+                    code = values.get(value)
+                    if code is None:
+                        code = values[value] = len(values)
+                    codes.append(code)
+                dictionary = [None] * len(values)
+                for value, code in values.iteritems():
+                    dictionary[code] = value
+                meta['dictionaries'][field] = dictionary
+                _write_compressed(os.path.join(tmp_path, field + '.codes'), codes.tostring())
+
+            times = array('d', (_timestamp(record['time']) for record in records))
+            _write_compressed(os.path.join(tmp_path, 'time.values'), times.tostring())
+            _write_compressed(os.path.join(tmp_path, 'event.values'),
+                              json.dumps([record.get('event') for record in records]))
+
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as fp:
+                json.dump(meta, fp)
+            os.rename(tmp_path, os.path.join(partition_path, part_name))
+        except:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+
+def records_from_database(start=None, end=None, batch_size=10000):
+    """
+    Yield the TrackingLogs with times from start to end (if given) as
+    records, reading them batch_size at a time, in id order.
+    """
+    from track.models import TrackingLog
+
+    queryset = TrackingLog.objects.order_by('id')
+    if start is not None:
+        queryset = queryset.filter(time__gte=start)
+    if end is not None:
+        queryset = queryset.filter(time__lt=end)
+
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).values_list('id', *FIELDS)[:batch_size])
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(FIELDS, row[1:]))
+        last_id = rows[-1][0]
+
+
+def records_from_log_file(path):
+    """
+    Yield the events logged in the tracking log file at path (which can be
+    gzipped) as records.  Each line holds an event as JSON, maybe after a
+    syslog prefix.  Lines without an event are skipped.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as fp:
+        for line in fp:
+            start = line.find('{')
+            if start == -1:
+                continue
+            try:
+                event = json.loads(line[start:])
+                event_time = dateutil.parser.parse(event['time'])
+            except (ValueError, KeyError, TypeError):
+                log.warning("Skipping unreadable line in %s: %r", path, line[:200])
+                continue
+            if event_time.tzinfo is not None:
+                event_time = event_time.astimezone(dateutil.tz.tzutc()).replace(tzinfo=None)
+
+            record = dict((field, event.get(field)) for field in FIELDS)
+            record['time'] = event_time
+            if not isinstance(record['event'], basestring):
+                record['event'] = json.dumps(record['event'])
+            yield record
+
+
+class _Part(object):
+    """
+    A part of a partition, reading its columns when they're needed
+    """
+
+    def __init__(self, path, date, course_id):
+        self.path = path
+        self.date = date
+        self.course_id = course_id
+        with open(os.path.join(path, 'meta.json')) as fp:
+            self.meta = json.load(fp)
+        self._columns = {}
+
+    def code_for(self, field, value):
+        """
+        Return the code of value in field's dictionary, or None if no event
+        in this part has it
+        """
+        try:
+            return self.meta['dictionaries'][field].index(value)
+        except ValueError:
+            return None
+
+    def codes(self, field):
+        if field not in self._columns:
+            codes = array('I')
+            codes.fromstring(_read_compressed(os.path.join(self.path, field + '.codes')))
+            self._columns[field] = codes
+        return self._columns[field]
+
+    def column(self, field):
+        """
+        Return the values of field for all the rows
+        """
+        if field not in self._columns:
+            if field == 'time':
+                values = array('d')
+                values.fromstring(_read_compressed(os.path.join(self.path, 'time.values')))
+            elif field == 'event':
+                values = json.loads(_read_compressed(os.path.join(self.path, 'event.values')))
+            elif field == 'course_id':
+                values = [self.course_id] * self.meta['rows']
+            elif field == 'date':
+                values = [self.date] * self.meta['rows']
+            else:
+                dictionary = self.meta['dictionaries'][field]
+                values = [dictionary[code] for code in self.codes(field)]
+            self._columns[field] = values
+        return self._columns[field]
+
+
+class TrackingLogStore(object):
+    """
+    Queries over the events written under root by TrackingLogExporter.
+
+    The filters of all the methods are:
+
+        course_id: only events about this course
+        start, end: only events from start (included) to end (excluded),
+            naive UTC datetimes
+        event_type, username: only events of this type, by this user
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _parts(self, course_id=None, start=None, end=None):
+        """
+        Yield the _Parts of the partitions which can have events matching the filters
+        """
+        if not os.path.isdir(self.root):
+            return
+        for date_dir in sorted(os.listdir(self.root)):
+            if not date_dir.startswith('date='):
+                continue
+            date = datetime.datetime.strptime(date_dir[len('date='):], '%Y-%m-%d').date()
+            if start is not None and date < start.date():
+                continue
+            if end is not None and date > end.date():
+                continue
+
+            for course_dir in sorted(os.listdir(os.path.join(self.root, date_dir))):
+                part_course_id = urllib.unquote(course_dir[len('course='):])
+                if part_course_id == NO_COURSE:
+                    part_course_id = None
+                if course_id is not None and part_course_id != course_id:
+                    continue
+
+                partition_path = os.path.join(self.root, date_dir, course_dir)
+                for part_dir in sorted(os.listdir(partition_path)):
+                    if part_dir.startswith('part-'):
+                        yield _Part(os.path.join(partition_path, part_dir), date, part_course_id)
+
+    def _matching_rows(self, part, start=None, end=None, **values):
+        """
+        Return the indexes of the rows of part matching the filters, or None
+        if no row does.  values are the dictionary-encoded fields to filter on.
+        """
+        rows = None
+        for field, value in values.iteritems():
+            if value is None:
+                continue
+            code = part.code_for(field, value)
+            if code is None:
+                return None
+            codes = part.codes(field)
+            if rows is None:
+                rows = [i for i, c in enumerate(codes) if c == code]
+            else:
+                rows = [i for i in rows if codes[i] == code]
+
+        if start is not None or end is not None:
+            start_ts = _timestamp(start) if start is not None else float('-inf')
+            end_ts = _timestamp(end) if end is not None else float('inf')
+            times = part.column('time')
+            if rows is None:
+                rows = xrange(part.meta['rows'])
+            rows = [i for i in rows if start_ts <= times[i] < end_ts]
+
+        if rows is None:
+            rows = range(part.meta['rows'])
+        return rows or None
+
+    def query(self, fields=None, course_id=None, start=None, end=None, event_type=None, username=None):
+        """
+        Yield the events matching the filters, as dicts with fields (by default,
+        all of FIELDS and course_id).  Times are naive UTC datetimes.
+        """
+        if fields is None:
+            fields = FIELDS + ['course_id']
+        for part in self._parts(course_id, start, end):
+            rows = self._matching_rows(part, start, end, event_type=event_type, username=username)
+            if rows is None:
+                continue
+            columns = [(field, part.column(field)) for field in fields]
+            for i in rows:
+                record = dict((field, values[i]) for field, values in columns)
+                if 'time' in record:
+                    record['time'] = EPOCH + datetime.timedelta(seconds=record['time'])
+                yield record
+
+    def count(self, **filters):
+        """
+        Return the number of events matching the filters
+        """
+        total = 0
+        for part in self._parts(filters.get('course_id'), filters.get('start'), filters.get('end')):
+            rows = self._matching_rows(part, filters.get('start'), filters.get('end'),
+                                       event_type=filters.get('event_type'), username=filters.get('username'))
+            if rows is not None:
+                total += len(rows)
+        return total
+
+    def group_by(self, field, **filters):
+        """
+        Return a Counter of the number of events matching the filters for each
+        value of field (one of the dictionary-encoded fields, course_id or date)
+        """
+        counts = Counter()
+        for part in self._parts(filters.get('course_id'), filters.get('start'), filters.get('end')):
+            rows = self._matching_rows(part, filters.get('start'), filters.get('end'),
+                                       event_type=filters.get('event_type'), username=filters.get('username'))
+            if rows is None:
+                continue
+            if field in DICTIONARY_FIELDS:
+                # count the codes, and only look up each distinct value once
+                codes = part.codes(field)
+                dictionary = part.meta['dictionaries'][field]
+                for code, n in Counter(codes[i] for i in rows).iteritems():
+                    counts[dictionary[code]] += n
+            else:
+                values = part.column(field)
+                counts.update(values[i] for i in rows)
+        return counts
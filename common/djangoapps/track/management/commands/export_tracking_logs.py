@@ -0,0 +1,64 @@
+#
+# django management command: export tracking events to the columnar format of
+# track.columnar, for analytics jobs to query with TrackingLogStore
+#
+
+import datetime
+import sys
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from track.columnar import TrackingLogExporter, records_from_database, records_from_log_file
+
+
+def parse_date(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise CommandError("Dates must look like 2013-06-01, not {0}".format(value))
+
+
+class Command(BaseCommand):
+    args = "<output_dir> [<log_file> ...]"
+    help = "Export tracking events to a columnar store partitioned by date and course.\n"
+    help += "   output_dir: where the store is (parts are added to what is there already)\n"
+    help += "   log_file: tracking log files (maybe gzipped) to read the events from,\n"
+    help += "             instead of the TrackingLog table\n"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--start',
+                    dest='start',
+                    help='only export TrackingLogs from this date (YYYY-MM-DD) on'),
+        make_option('--end',
+                    dest='end',
+                    help='only export TrackingLogs from before this date (YYYY-MM-DD)'),
+        make_option('--rows-per-part',
+                    dest='rows_per_part',
+                    type='int',
+                    default=100000,
+                    help='the most events to write in one part of a partition'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) < 1:
+            raise CommandError("Usage: export_tracking_logs {0}".format(self.args))
+
+        output_dir, log_files = args[0], args[1:]
+        exporter = TrackingLogExporter(output_dir, rows_per_part=options['rows_per_part'])
+
+        if log_files:
+            if options['start'] or options['end']:
+                raise CommandError("--start and --end only apply to exporting TrackingLogs")
+            sources = [records_from_log_file(log_file) for log_file in log_files]
+        else:
+            start = parse_date(options['start']) if options['start'] else None
+            end = parse_date(options['end']) if options['end'] else None
+            sources = [records_from_database(start, end)]
+
+        for records in sources:
+            for record in records:
+                exporter.add(record)
+        exporter.close()
+
+        sys.stderr.write("Done: {0} events exported\n".format(exporter.rows_written))
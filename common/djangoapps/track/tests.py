@@ -5,8 +5,19 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+
 from django.test import TestCase
 
+from track.columnar import TrackingLogExporter, TrackingLogStore, records_from_log_file
+from track.writer import TrackingLogWriter
+
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,3 +25,110 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class TrackingLogWriterTest(TestCase):
+    def setUp(self):
+        self.written = []
+
+    def write_events(self, events):
+        self.written.append(list(events))
+
+    def test_batches(self):
+        writer = TrackingLogWriter(self.write_events, batch_size=3, flush_interval=0.5)
+        for n in range(5):
+            self.assertTrue(writer.put(n))
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(sum(self.written, []), range(5))
+        self.assertTrue(all(len(batch) <= 3 for batch in self.written))
+        self.assertEqual(writer.stats['written'], 5)
+
+    def test_drops_when_full(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_write_events(events):
+            started.set()
+            release.wait()
+            self.write_events(events)
+
+        writer = TrackingLogWriter(slow_write_events, queue_size=2, batch_size=1, flush_interval=0)
+        writer.put('first')
+        started.wait(5)
+        # 'first' is being written, so the queue has room for two more
+        self.assertTrue(writer.put('second'))
+        self.assertTrue(writer.put('third'))
+        self.assertFalse(writer.put('fourth'))
+        self.assertFalse(writer.flush(timeout=0.1))
+
+        release.set()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(sum(self.written, []), ['first', 'second', 'third'])
+        self.assertEqual(writer.stats, {'queued': 3, 'written': 3, 'dropped': 1, 'failed': 0})
+
+    def test_failures_counted(self):
+        def failing_write_events(events):
+            raise IOError("The database went away")
+
+        writer = TrackingLogWriter(failing_write_events, flush_interval=0)
+        writer.put('event')
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(writer.stats['failed'], 1)
+
+
+class ColumnarTrackingLogTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        exporter = TrackingLogExporter(self.root, rows_per_part=2)
+        for n, (username, event_type, page) in enumerate([
+                ('alice', 'play_video', 'https://x.org/courses/MITx/6.002x/2013/courseware/'),
+                ('bob', 'play_video', 'https://x.org/courses/MITx/6.002x/2013/courseware/'),
+                ('alice', 'problem_check', 'https://x.org/courses/MITx/6.002x/2013/courseware/'),
+                ('alice', 'page_close', 'https://x.org/dashboard'),
+                ('bob', 'problem_check', 'https://x.org/courses/HarvardX/CS50/2013/info'),
+        ]):
+            exporter.add({
+                'username': username, 'ip': '127.0.0.1', 'event_source': 'browser',
+                'event_type': event_type, 'event': '{"n": %d}' % n, 'agent': 'Firefox',
+                'page': page, 'time': datetime.datetime(2013, 6, 1 + n % 2, 12, 0, n), 'host': 'x.org',
+            })
+        exporter.close()
+        self.store = TrackingLogStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_query(self):
+        events = list(self.store.query(username='alice', event_type='play_video'))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['course_id'], 'MITx/6.002x/2013')
+        self.assertEqual(events[0]['event'], '{"n": 0}')
+        self.assertEqual(events[0]['time'], datetime.datetime(2013, 6, 1, 12, 0, 0))
+
+        self.assertEqual(list(self.store.query(username='carol')), [])
+
+    def test_count(self):
+        self.assertEqual(self.store.count(), 5)
+        self.assertEqual(self.store.count(course_id='MITx/6.002x/2013'), 3)
+        self.assertEqual(self.store.count(username='alice'), 3)
+        self.assertEqual(self.store.count(start=datetime.datetime(2013, 6, 1, 12, 0, 1),
+                                          end=datetime.datetime(2013, 6, 2, 12, 0, 3)), 3)
+
+    def test_group_by(self):
+        self.assertEqual(self.store.group_by('event_type'),
+                         {'play_video': 2, 'problem_check': 2, 'page_close': 1})
+        self.assertEqual(self.store.group_by('course_id', username='bob'),
+                         {'MITx/6.002x/2013': 1, 'HarvardX/CS50/2013': 1})
+
+    def test_records_from_log_file(self):
+        path = os.path.join(self.root, 'tracking.log.gz')
+        with gzip.open(path, 'wb') as fp:
+            fp.write('Jun  1 12:00:00 host tracking: ' + json.dumps({
+                'username': 'alice', 'event_type': 'seq_goto', 'event': {'new': 2},
+                'time': '2013-06-01T12:00:00.5+00:00', 'page': None,
+            }) + '\n')
+            fp.write('garbage\n')
+        records = list(records_from_log_file(path))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['time'], datetime.datetime(2013, 6, 1, 12, 0, 0, 500000))
+        self.assertEqual(records[0]['event'], '{"new": 2}')
@@ -10,26 +10,54 @@ from django.http import HttpResponse
 from django.http import Http404
 from django.shortcuts import redirect
 from django.conf import settings
+from django.db import connection
 from mitxmako.shortcuts import render_to_response
 
 from django_future.csrf import ensure_csrf_cookie
 from track.models import TrackingLog
+from track.writer import get_writer
 
 log = logging.getLogger("tracking")
 
 LOGFIELDS = ['username', 'ip', 'event_source', 'event_type', 'event', 'agent', 'page', 'time', 'host']
 
 
-def log_event(event):
-    event_str = json.dumps(event)
-    log.info(event_str[:settings.TRACK_MAX_EVENT])
+def write_events(events):
+    """
+    Write events, a list of (event, JSON encoding of the event) pairs, to the
+    tracking log, and to the database with ENABLE_SQL_TRACKING_LOGS
+    """
+    for _, event_str in events:
+        log.info(event_str[:settings.TRACK_MAX_EVENT])
     if settings.MITX_FEATURES.get('ENABLE_SQL_TRACKING_LOGS'):
-        event['time'] = dateutil.parser.parse(event['time'])
-        tldat = TrackingLog(**dict((x, event[x]) for x in LOGFIELDS))
+        records = []
+        for event, _ in events:
+            event['time'] = dateutil.parser.parse(event['time'])
+            records.append(TrackingLog(**dict((x, event[x]) for x in LOGFIELDS)))
         try:
-            tldat.save()
+            TrackingLog.objects.bulk_create(records)
         except Exception as err:
             log.exception(err)
+        finally:
+            if settings.TRACKING_LOG_WRITER.get('ENABLED'):
+                # we're in the writer's thread, which would otherwise keep its
+                # connection open indefinitely
+                connection.close()
+
+
+def log_event(event):
+    # encode it now, while nobody else can have changed it
+    event_str = json.dumps(event)
+    writer_settings = settings.TRACKING_LOG_WRITER
+    if writer_settings.get('ENABLED'):
+        get_writer(
+            write_events,
+            queue_size=writer_settings['QUEUE_SIZE'],
+            batch_size=writer_settings['BATCH_SIZE'],
+            flush_interval=writer_settings['FLUSH_INTERVAL'],
+        ).put((event, event_str))
+    else:
+        write_events([(event, event_str)])
 
 
 def user_track(request):
@@ -0,0 +1,141 @@
+"""
+Write tracking events from a background thread, so that requests don't wait
+for the tracking log (or the tracking database) to take them.
+
+Events are put in a bounded queue, and a thread takes them off it in batches,
+writes them to the tracking log, and (with ENABLE_SQL_TRACKING_LOGS) saves a
+batch of TrackingLogs with a single query.  A batch is written when it has
+`batch_size` events, or `flush_interval` seconds after its first event.  When
+the queue is full, new events are dropped, and counted.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+import Queue
+
+from dogapi import dog_stats_api
+
+log = logging.getLogger(__name__)
+
+
+class TrackingLogWriter(object):
+    """
+    A queue of events to write, and the thread writing them.
+
+    `write_events` is called with a list of events to write them.
+    """
+
+    def __init__(self, write_events, queue_size=10000, batch_size=100, flush_interval=1.0):
+        self.write_events = write_events
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._pid = None
+        self.queue = None
+        self.thread = None
+
+    def _start(self):
+        """
+        Start the writing thread in this process, if it isn't running yet
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # never started, or we've been forked, and the thread belongs to our parent
+                self.queue = Queue.Queue(self.queue_size)
+                self.thread = threading.Thread(target=self._run, name='TrackingLogWriter')
+                self.thread.daemon = True
+                self.thread.start()
+                self._pid = os.getpid()
+
+    def put(self, event):
+        """
+        Queue event to be written.  Returns False if it had to be dropped
+        because the queue is full.
+        """
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(event)
+        except Queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Wait until all the events queued so far have been written, or for
+        timeout seconds.  Returns False if that wasn't long enough.
+        """
+        if self._pid != os.getpid():
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self.stats[stat] += n
+        dog_stats_api.increment('track.events.{0}'.format(stat), n)
+
+    def _next_batch(self, queue):
+        """
+        Wait for events, and return up to batch_size of them, waiting at most
+        flush_interval after the first one for the rest.
+        """
+        batch = [queue.get()]
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(queue.get(timeout=timeout))
+            except Queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        queue = self.queue
+        while True:
+            batch = self._next_batch(queue)
+            try:
+                self.write_events(batch)
+            except Exception:
+                log.exception("Couldn't write %d tracking events", len(batch))
+                self._count('failed', len(batch))
+            else:
+                self._count('written', len(batch))
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+
+# How long to wait for queued events to be written when the process exits
+EXIT_FLUSH_TIMEOUT = 5
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer(write_events, **options):
+    """
+    Return the process's TrackingLogWriter, creating it with write_events and
+    options (see TrackingLogWriter) the first time.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = TrackingLogWriter(write_events, **options)
+            # don't lose the events still in the queue when we exit normally
+            atexit.register(_writer.flush, EXIT_FLUSH_TIMEOUT)
+    return _writer
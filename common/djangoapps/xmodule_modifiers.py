@@ -67,6 +67,19 @@ def replace_static_urls(get_html, data_dir, course_namespace=None):
     return _get_html
 
 
+def replace_urls(get_html, data_dir, course_id, course_namespace=None):
+    """
+    Updates the supplied module with a new get_html function that wraps
+    the old get_html function and substitutes urls the way replace_static_urls
+    and then replace_course_urls would, in a single pass
+    """
+
+    @wraps(get_html)
+    def _get_html():
+        return static_replace.replace_urls(get_html(), data_dir, course_id, course_namespace)
+    return _get_html
+
+
 def grade_histogram(module_id):
     ''' Print out a histogram of grades on a given problem.
         Part of staff member debug info.
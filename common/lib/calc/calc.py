@@ -3,6 +3,7 @@ import logging
 import math
 import operator
 import re
+import threading
 
 import numpy
 import numbers
@@ -14,6 +15,8 @@ from pyparsing import StringEnd, Optional, Forward
 from pyparsing import CaselessLiteral, Group, StringEnd
 from pyparsing import NoMatch, stringEnd, alphanums
 
+from lrucache import LRUCache
+
 default_functions = {'sin': numpy.sin,
                      'cos': numpy.cos,
                      'tan': numpy.tan,
@@ -37,6 +40,26 @@ default_variables = {'j': numpy.complex(0, 1),
                      'q': scipy.constants.e
                      }
 
+# We eliminated extreme ones, since they're rarely used, and potentially
+# confusing. They may also conflict with variables if we ever allow e.g.
+# 5R instead of 5*R
+suffixes = {'%': 0.01, 'k': 1e3, 'M': 1e6, 'G': 1e9,
+            'T': 1e12,  # 'P':1e15,'E':1e18,'Z':1e21,'Y':1e24,
+            'c': 1e-2, 'm': 1e-3, 'u': 1e-6,
+            'n': 1e-9, 'p': 1e-12}  # ,'f':1e-15,'a':1e-18,'z':1e-21,'y':1e-24}
+
+ops = {"^": operator.pow,
+       "*": operator.mul,
+       "/": operator.truediv,
+       "+": operator.add,
+       "-": operator.sub,
+       }
+
+# Maximum number of compiled expressions kept by `parse_expression`.
+# Instructor answers are evaluated over and over with different samples,
+# so even a modest cache avoids nearly all re-parsing.
+COMPILED_EXPRESSION_CACHE_SIZE = 1024
+
 log = logging.getLogger("mitx.courseware.capa")
 
 
@@ -49,6 +72,24 @@ class UndefinedVariable(Exception):
 general_whitespace = re.compile('[^\w]+')
 
 
+def find_identifiers(string):
+    '''Return the words in string that could name a variable or function,
+    in the order in which they appear.
+
+    Anything beginning with a digit is skipped, since it is (the start
+    of) a number.
+    '''
+    possible_variables = re.split(general_whitespace, string)  # List of all alnums in string
+    identifiers = list()
+    for v in possible_variables:
+        if len(v) == 0:
+            continue
+        if v[0] <= '9' and '0' <= 'v':  # Skip things that begin with numbers
+            continue
+        identifiers.append(v)
+    return identifiers
+
+
 def check_variables(string, variables):
     '''Confirm the only variables in string are defined.
 
@@ -60,35 +101,27 @@ def check_variables(string, variables):
     undefined_variable.setParseAction(lambda x:UndefinedVariable("".join(x)).raiseself())
     varnames = varnames | undefined_variable
     '''
-    possible_variables = re.split(general_whitespace, string)  # List of all alnums in string
-    bad_variables = list()
-    for v in possible_variables:
-        if len(v) == 0:
-            continue
-        if v[0] <= '9' and '0' <= 'v':  # Skip things that begin with numbers
-            continue
-        if v not in variables:
-            bad_variables.append(v)
+    _check_identifiers(find_identifiers(string), variables)
+
+
+def _check_identifiers(identifiers, variables):
+    ''' Raise UndefinedVariable naming every identifier not in variables '''
+    bad_variables = [v for v in identifiers if v not in variables]
     if len(bad_variables) > 0:
         raise UndefinedVariable(' '.join(bad_variables))
 
 
-def evaluator(variables, functions, string, cs=False):
-    '''
-    Evaluate an expression. Variables are passed as a dictionary
-    from string to value. Unary functions are passed as a dictionary
-    from string to function. Variables must be floats.
-    cs: Case sensitive
+def lower_dict(d):
+    return dict([(k.lower(), d[k]) for k in d])
 
-    TODO: Fix it so we can pass integers and complex numbers in variables dict
-    '''
-    # log.debug("variables: {0}".format(variables))
-    # log.debug("functions: {0}".format(functions))
-    # log.debug("string: {0}".format(string))
 
-    def lower_dict(d):
-        return dict([(k.lower(), d[k]) for k in d])
+def merge_with_defaults(variables, functions, cs=False):
+    '''
+    Combine the given variables and functions with the defaults, the way
+    `evaluator` sees them. Returns an (all_variables, all_functions) pair.
 
+    If not case sensitive, every name is lowercased.
+    '''
     all_variables = copy.copy(default_variables)
     all_functions = copy.copy(default_functions)
 
@@ -100,82 +133,92 @@ def evaluator(variables, functions, string, cs=False):
     all_functions.update(functions)
 
     if not cs:
-        string_cs = string.lower()
         all_functions = lower_dict(all_functions)
         all_variables = lower_dict(all_variables)
-        CasedLiteral = CaselessLiteral
-    else:
-        string_cs = string
-        CasedLiteral = Literal
 
-    check_variables(string_cs, set(all_variables.keys() + all_functions.keys()))
+    return all_variables, all_functions
 
-    if string.strip() == "":
-        return float('nan')
 
-    ops = {"^": operator.pow,
-           "*": operator.mul,
-           "/": operator.truediv,
-           "+": operator.add,
-           "-": operator.sub,
-           }
-    # We eliminated extreme ones, since they're rarely used, and potentially
-    # confusing. They may also conflict with variables if we ever allow e.g.
-    # 5R instead of 5*R
-    suffixes = {'%': 0.01, 'k': 1e3, 'M': 1e6, 'G': 1e9,
-                'T': 1e12,  # 'P':1e15,'E':1e18,'Z':1e21,'Y':1e24,
-                'c': 1e-2, 'm': 1e-3, 'u': 1e-6,
-                'n': 1e-9, 'p': 1e-12}  # ,'f':1e-15,'a':1e-18,'z':1e-21,'y':1e-24}
-
-    def super_float(text):
-        ''' Like float, but with si extensions. 1k goes to 1000'''
-        if text[-1] in suffixes:
-            return float(text[:-1]) * suffixes[text[-1]]
+def super_float(text):
+    ''' Like float, but with si extensions. 1k goes to 1000'''
+    if text[-1] in suffixes:
+        return float(text[:-1]) * suffixes[text[-1]]
+    else:
+        return float(text)
+
+
+#-----------------------------------------------------------------------------
+# Parsing
+#
+# Expressions are parsed into a small tree of tuples, which is independent
+# of the values (and even the names) of the variables and functions:
+#
+#   ('number', value)
+#   ('variable', name)
+#   ('function', name, argument)
+#   ('power', [operand, ...])             a ^ b ^ c (right associative)
+#   ('parallel', [operand, ...])          a || b || c
+#   ('product', [(op, operand), ...])     op is '*' or '/'
+#   ('sum', [(op, operand), ...])         op is '+' or '-'
+#
+# Because names are looked up only when the tree is evaluated, the grammar
+# is built once per case-sensitivity mode instead of once per evaluation.
+
+def _is_node(token):
+    return isinstance(token, tuple)
+
+
+def number_parse_action(x):  # [ '7' ] ->  [ ('number', 7) ]
+    return [('number', super_float("".join(x)))]
+
+
+def exp_parse_action(x):  # [ 2 ^ 3 ^ 2 ] -> ('power', [2, 3, 2])
+    x = [e for e in x if _is_node(e)]  # Ignore ^
+    if len(x) == 1:
+        return [x[0]]
+    return [('power', x)]
+
+
+def parallel(x):  # Parallel resistors [ 1 || 2 ] => ('parallel', [1, 2])
+    x = [e for e in x if _is_node(e)]  # Ignore ||
+    if len(x) == 1:
+        return [x[0]]
+    return [('parallel', x)]
+
+
+def _signed_operands(x, default_op):
+    ''' [ 1 + 2 - 3 ] -> [('+', 1), ('+', 2), ('-', 3)] '''
+    operands = []
+    op = default_op
+    for e in x:
+        if _is_node(e):
+            operands.append((op, e))
         else:
-            return float(text)
-
-    def number_parse_action(x):  # [ '7' ] ->  [ 7 ]
-        return [super_float("".join(x))]
-
-    def exp_parse_action(x):  # [ 2 ^ 3 ^ 2 ] -> 512
-        x = [e for e in x if isinstance(e, numbers.Number)]  # Ignore ^
-        x.reverse()
-        x = reduce(lambda a, b: b ** a, x)
-        return x
-
-    def parallel(x):  # Parallel resistors [ 1 2 ] => 2/3
-        # convert from pyparsing.ParseResults, which doesn't support '0 in x'
-        x = list(x)
-        if len(x) == 1:
-            return x[0]
-        if 0 in x:
-            return float('nan')
-        x = [1. / e for e in x if isinstance(e, numbers.Number)]  # Ignore ||
-        return 1. / sum(x)
-
-    def sum_parse_action(x):  # [ 1 + 2 - 3 ] -> 0
-        total = 0.0
-        op = ops['+']
-        for e in x:
-            if e in set('+-'):
-                op = ops[e]
-            else:
-                total = op(total, e)
-        return total
-
-    def prod_parse_action(x):  # [ 1 * 2 / 3 ] => 0.66
-        prod = 1.0
-        op = ops['*']
-        for e in x:
-            if e in set('*/'):
-                op = ops[e]
-            else:
-                prod = op(prod, e)
-        return prod
-
-    def func_parse_action(x):
-        return [all_functions[x[0]](x[1])]
+            op = e
+    return operands
+
+
+def sum_parse_action(x):  # [ 1 + 2 - 3 ] -> ('sum', ...)
+    return [('sum', _signed_operands(x, '+'))]
+
+
+def prod_parse_action(x):  # [ 1 * 2 / 3 ] => ('product', ...)
+    return [('product', _signed_operands(x, '*'))]
+
+
+def func_parse_action(x):
+    return [('function', x[0], x[1])]
+
+
+def variable_parse_action(x):
+    return [('variable', x[0])]
 
+
+def _build_grammar(cs):
+    '''
+    Build the pyparsing grammar for expressions. If not case sensitive,
+    identifiers are lowercased as they are parsed.
+    '''
     # SI suffixes and percent
     number_suffix = reduce(lambda a, b: a | b, map(Literal, suffixes.keys()), NoMatch())
     (dot, minus, plus, times, div, lpar, rpar, exp) = map(Literal, ".-+*/()^")
@@ -195,35 +238,19 @@ def evaluator(variables, functions, string, cs=False):
     expr = Forward()
     factor = Forward()
 
-    def sreduce(f, l):
-        ''' Same as reduce, but handle len 1 and len 0 lists sensibly '''
-        if len(l) == 0:
-            return NoMatch()
-        if len(l) == 1:
-            return l[0]
-        return reduce(f, l)
-
-    # Handle variables passed in. E.g. if we have {'R':0.5}, we make the substitution.
-    # Special case for no variables because of how we understand PyParsing is put together
-    if len(all_variables) > 0:
-        # We sort the list so that var names (like "e2") match before
-        # mathematical constants (like "e"). This is kind of a hack.
-        all_variables_keys = sorted(all_variables.keys(), key=len, reverse=True)
-        varnames = sreduce(lambda x, y: x | y, map(lambda x: CasedLiteral(x), all_variables_keys))
-        varnames.setParseAction(lambda x: map(lambda y: all_variables[y], x))
-    else:
-        varnames = NoMatch()
-
-    # Same thing for functions.
-    if len(all_functions) > 0:
-        funcnames = sreduce(lambda x, y: x | y,
-                            map(lambda x: CasedLiteral(x), all_functions.keys()))
-        function = funcnames + lpar.suppress() + expr + rpar.suppress()
-        function.setParseAction(func_parse_action)
-    else:
-        function = NoMatch()
+    # Names of variables and functions; whether a name is actually
+    # defined is only checked at evaluation time.
+    identifier = Word(alphas + '_', alphanums + '_')
+    if not cs:
+        identifier.setParseAction(lambda x: [x[0].lower()])
+
+    function = identifier + lpar.suppress() + expr + rpar.suppress()
+    function.setParseAction(func_parse_action)
+
+    varnames = identifier.copy()
+    varnames.addParseAction(variable_parse_action)
 
-    atom = number | function | varnames | lpar + expr + rpar
+    atom = number | function | varnames | lpar.suppress() + expr + rpar.suppress()
     factor << (atom + ZeroOrMore(exp + atom)).setParseAction(exp_parse_action)  # 7^6
     paritem = factor + ZeroOrMore(Literal('||') + factor)  # 5k || 4k
     paritem = paritem.setParseAction(parallel)
@@ -231,4 +258,266 @@ def evaluator(variables, functions, string, cs=False):
     term = term.setParseAction(prod_parse_action)
     expr << Optional((plus | minus)) + term + ZeroOrMore((plus | minus) + term)  # -5 + 4 - 3
     expr = expr.setParseAction(sum_parse_action)
-    return (expr + stringEnd).parseString(string)[0]
+    return expr + stringEnd
+
+
+_grammars = {}
+_grammar_lock = threading.Lock()
+
+
+def get_grammar(cs=False):
+    ''' Return the (shared) expression grammar for this case sensitivity '''
+    cs = bool(cs)
+    grammar = _grammars.get(cs)
+    if grammar is None:
+        with _grammar_lock:
+            grammar = _grammars.get(cs)
+            if grammar is None:
+                grammar = _grammars[cs] = _build_grammar(cs)
+    return grammar
+
+
+#-----------------------------------------------------------------------------
+# Compilation of parse trees into closures
+
+def _parallel(values):
+    ''' 1 / (1/a + 1/b + ...), or nan if any of the values is zero '''
+    if any(isinstance(value, numpy.ndarray) for value in values):
+        return _parallel_array(values)
+    if 0 in values:
+        return float('nan')
+    return 1. / sum([1. / e for e in values])
+
+
+def _parallel_array(values):
+    ''' Like _parallel, but elementwise over arrays of samples '''
+    zero = reduce(numpy.logical_or, [numpy.equal(value, 0) for value in values])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        result = 1. / sum([1. / numpy.asarray(value) for value in values])
+    return numpy.where(zero, float('nan'), result)
+
+
+def vectorize_function(function):
+    '''
+    Make a unary function usable on arrays of samples. Numpy ufuncs
+    already are; anything else (e.g. math.factorial) is applied to each
+    element in turn.
+    '''
+    if isinstance(function, numpy.ufunc):
+        return function
+
+    def vectorized(argument):
+        if numpy.ndim(argument) == 0:
+            return function(argument)
+        return numpy.array([function(value) for value in argument])
+    return vectorized
+
+
+def _power(values):
+    ''' values[0] ^ values[1] ^ ..., evaluated right to left '''
+    values.reverse()
+    return reduce(lambda a, b: b ** a, values)
+
+
+def _compile_node(node):
+    '''
+    Turn a parse tree node into a function of (variables, functions).
+    '''
+    kind = node[0]
+    if kind == 'number':
+        value = node[1]
+        return lambda variables, functions: value
+
+    if kind == 'variable':
+        name = node[1]
+        return lambda variables, functions: variables[name]
+
+    if kind == 'function':
+        name = node[1]
+        argument = _compile_node(node[2])
+        return lambda variables, functions: functions[name](argument(variables, functions))
+
+    if kind in ('power', 'parallel'):
+        operands = [_compile_node(operand) for operand in node[1]]
+        combine = _power if kind == 'power' else _parallel
+
+        def evaluate(variables, functions):
+            return combine([operand(variables, functions) for operand in operands])
+        return evaluate
+
+    if kind in ('sum', 'product'):
+        operands = [(ops[op], _compile_node(operand)) for (op, operand) in node[1]]
+        identity = 0.0 if kind == 'sum' else 1.0
+
+        def evaluate(variables, functions):
+            total = identity
+            for (op, operand) in operands:
+                total = op(total, operand(variables, functions))
+            return total
+        return evaluate
+
+    raise ValueError("Unknown expression node {0!r}".format(kind))
+
+
+def _collect_names(node, variable_names, function_names):
+    ''' Record the names used by a parse tree as variables and functions '''
+    kind = node[0]
+    if kind == 'variable':
+        variable_names.add(node[1])
+    elif kind == 'function':
+        function_names.add(node[1])
+        _collect_names(node[2], variable_names, function_names)
+    elif kind in ('power', 'parallel'):
+        for operand in node[1]:
+            _collect_names(operand, variable_names, function_names)
+    elif kind in ('sum', 'product'):
+        for (_, operand) in node[1]:
+            _collect_names(operand, variable_names, function_names)
+
+
+class CompiledExpression(object):
+    '''
+    An expression parsed once, which can then be evaluated against any
+    number of variable and function bindings.
+
+    Use `parse_expression` to get one, rather than creating it directly.
+    '''
+
+    def __init__(self, string, cs=False):
+        self.string = string
+        self.cs = cs
+        string_cs = string if cs else string.lower()
+        self.identifiers = find_identifiers(string_cs)
+        self.variable_names = set()
+        self.function_names = set()
+
+        if string.strip() == "":
+            self.tree = None
+            self._evaluate = lambda variables, functions: float('nan')
+        else:
+            self.tree = get_grammar(cs).parseString(string)[0]
+            _collect_names(self.tree, self.variable_names, self.function_names)
+            self._evaluate = _compile_node(self.tree)
+
+    def evaluate(self, variables, functions):
+        '''
+        Evaluate the expression. Variables and functions are given like
+        they are to `evaluator`, and are combined with the defaults.
+        '''
+        all_variables, all_functions = merge_with_defaults(variables, functions, self.cs)
+        _check_identifiers(self.identifiers, set(all_variables.keys() + all_functions.keys()))
+        return self.evaluate_merged(all_variables, all_functions)
+
+    def evaluate_merged(self, all_variables, all_functions):
+        '''
+        Evaluate the expression against variables and functions that
+        have already been combined with the defaults (see
+        `merge_with_defaults`).
+        '''
+        self._check_usage(all_variables, all_functions)
+        return self._evaluate(all_variables, all_functions)
+
+    def evaluate_batch(self, variables, functions, size):
+        '''
+        Evaluate the expression over many samples at once. Each variable
+        may be either a single value or a numpy array of `size` samples.
+
+        Returns an array of `size` results. Functions which are not numpy
+        ufuncs are applied to one sample at a time.
+        '''
+        all_variables, all_functions = merge_with_defaults(variables, functions, self.cs)
+        _check_identifiers(self.identifiers, set(all_variables.keys() + all_functions.keys()))
+        return self.evaluate_batch_merged(all_variables, all_functions, size)
+
+    def evaluate_batch_merged(self, all_variables, all_functions, size):
+        '''
+        `evaluate_batch`, for variables and functions that have already
+        been combined with the defaults.
+        '''
+        self._check_usage(all_variables, all_functions)
+        all_functions = dict((name, vectorize_function(function))
+                             for (name, function) in all_functions.iteritems())
+        result = self._evaluate(all_variables, all_functions)
+        # Expressions that don't depend on any sampled variable evaluate to
+        # a single value; give every sample a copy of it.
+        return numpy.zeros(size) + result
+
+    def _check_usage(self, all_variables, all_functions):
+        '''
+        A name can be defined, but not as what the expression uses it
+        for, e.g. 'x(2)' when x is a variable.
+        '''
+        for name in self.variable_names:
+            if name not in all_variables:
+                raise UndefinedVariable(name)
+        for name in self.function_names:
+            if name not in all_functions:
+                raise UndefinedVariable(name)
+
+
+_compiled_expressions = LRUCache(COMPILED_EXPRESSION_CACHE_SIZE)
+
+
+def parse_expression(string, cs=False):
+    '''
+    Return a CompiledExpression for string, reusing a previous compilation
+    of the same (string, cs) pair if there is one.
+
+    Raises pyparsing.ParseException if string is not a valid expression.
+    '''
+    key = (string, bool(cs))
+    compiled = _compiled_expressions.get(key)
+    if compiled is None:
+        compiled = CompiledExpression(string, cs)
+        _compiled_expressions.set(key, compiled)
+    return compiled
+
+
+def evaluator(variables, functions, string, cs=False):
+    '''
+    Evaluate an expression. Variables are passed as a dictionary
+    from string to value. Unary functions are passed as a dictionary
+    from string to function. Variables must be floats.
+    cs: Case sensitive
+
+    TODO: Fix it so we can pass integers and complex numbers in variables dict
+    '''
+    # log.debug("variables: {0}".format(variables))
+    # log.debug("functions: {0}".format(functions))
+    # log.debug("string: {0}".format(string))
+
+    all_variables, all_functions = merge_with_defaults(variables, functions, cs)
+
+    if not cs:
+        string_cs = string.lower()
+    else:
+        string_cs = string
+
+    # Report undefined variables before any parse errors
+    check_variables(string_cs, set(all_variables.keys() + all_functions.keys()))
+
+    if string.strip() == "":
+        return float('nan')
+
+    return parse_expression(string, cs).evaluate_merged(all_variables, all_functions)
+
+
+def batch_evaluator(variables, functions, string, size, cs=False):
+    '''
+    Evaluate an expression for `size` samples at once. Like `evaluator`,
+    except that any variable may be given as a numpy array holding one
+    value per sample. Returns a numpy array of `size` results.
+    '''
+    all_variables, all_functions = merge_with_defaults(variables, functions, cs)
+
+    if not cs:
+        string_cs = string.lower()
+    else:
+        string_cs = string
+
+    check_variables(string_cs, set(all_variables.keys() + all_functions.keys()))
+
+    if string.strip() == "":
+        return numpy.zeros(size) + float('nan')
+
+    return parse_expression(string, cs).evaluate_batch_merged(all_variables, all_functions, size)
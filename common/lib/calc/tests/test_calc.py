@@ -375,3 +375,85 @@ class EvaluatorTest(unittest.TestCase):
                           {'r1': 5}, {}, "r1+r2")
         self.assertRaises(calc.UndefinedVariable, calc.evaluator,
                           variables, {}, "r1*r3", cs=True)
+
+    def test_function_used_as_variable(self):
+        """
+        Names must be used for what they are defined as
+        """
+        self.assertRaises(calc.UndefinedVariable, calc.evaluator,
+                          {'x': 1.0}, {}, "x(2)")
+        self.assertRaises(calc.UndefinedVariable, calc.evaluator,
+                          {}, {}, "sin+1")
+
+
+class CompiledExpressionTest(unittest.TestCase):
+    """
+    Test that expressions are parsed once and can be reused with
+    different variables
+    """
+
+    def test_parse_expression_is_cached(self):
+        first = calc.parse_expression("x^2 + 1")
+        self.assertIs(first, calc.parse_expression("x^2 + 1"))
+        self.assertIsNot(first, calc.parse_expression("x^2 + 1", cs=True))
+
+    def test_evaluate_many_bindings(self):
+        compiled = calc.parse_expression("R1 || R2 + x")
+        for (r1, r2, x) in [(1.0, 1.0, 0.0), (2.0, 3.0, 1.5), (4.0, 4.0, -2.0)]:
+            variables = {'R1': r1, 'R2': r2, 'x': x}
+            self.assertAlmostEqual(compiled.evaluate(variables, {}),
+                                   calc.evaluator(variables, {}, "R1 || R2 + x"))
+
+    def test_evaluate_checks_variables(self):
+        compiled = calc.parse_expression("x + y")
+        self.assertEqual(compiled.evaluate({'x': 1.0, 'y': 2.0}, {}), 3.0)
+        self.assertRaises(calc.UndefinedVariable, compiled.evaluate, {'x': 1.0}, {})
+
+    def test_invalid_expressions_raise(self):
+        self.assertRaises(ParseException, calc.parse_expression, "1+")
+        self.assertTrue(numpy.isnan(calc.parse_expression("  ").evaluate({}, {})))
+
+
+class BatchEvaluatorTest(unittest.TestCase):
+    """
+    Test evaluating an expression over many samples at once
+    """
+
+    def assert_matches_evaluator(self, expression, samples, functions=None):
+        """
+        Check batch_evaluator against evaluator, one sample at a time
+        """
+        functions = functions or {}
+        size = len(samples.values()[0])
+        results = calc.batch_evaluator(samples, functions, expression, size)
+        self.assertEqual(len(results), size)
+        for i in range(size):
+            variables = dict((name, values[i]) for (name, values) in samples.items())
+            expected = calc.evaluator(variables, functions, expression)
+            self.assertAlmostEqual(results[i], expected, delta=1e-9)
+
+    def test_simple_expressions(self):
+        samples = {'x': numpy.array([-2.0, 0.5, 3.0, 7.25]),
+                   'y': numpy.array([1.0, 2.0, 3.0, 4.0])}
+        self.assert_matches_evaluator("x + 2*y", samples)
+        self.assert_matches_evaluator("-x^2 / y", samples)
+        self.assert_matches_evaluator("sin(x) * sqrt(y) + e^y", samples)
+        self.assert_matches_evaluator("y || 2k", samples)
+
+    def test_non_ufunc_functions(self):
+        samples = {'n': numpy.array([1.0, 3.0, 5.0])}
+        self.assert_matches_evaluator("fact(n)", samples)
+        self.assert_matches_evaluator("f(n) - 1", samples, {'f': lambda x: x * 2})
+
+    def test_constant_expression(self):
+        results = calc.batch_evaluator({'x': numpy.array([1.0, 2.0])}, {}, "5", 2)
+        self.assertEqual(list(results), [5.0, 5.0])
+
+    def test_parallel_with_zero(self):
+        results = calc.batch_evaluator({'x': numpy.array([0.0, 1.0])}, {}, "x||1", 2)
+        self.assertTrue(numpy.isnan(results[0]))
+        self.assertEqual(results[1], 0.5)
+
+    def test_undefined_variable(self):
+        self.assertRaises(calc.UndefinedVariable, calc.batch_evaluator,
+                          {'x': numpy.array([1.0])}, {}, "x + y", 1)
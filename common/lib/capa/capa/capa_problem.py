@@ -14,6 +14,7 @@ This is used by capa_module.
 '''
 
 from datetime import datetime
+import hashlib
 import logging
 import math
 import numpy
@@ -25,6 +26,8 @@ from lxml import etree
 from xml.sax.saxutils import unescape
 from copy import deepcopy
 
+from lrucache import LRUCache
+
 from .correctmap import CorrectMap
 import inputtypes
 import customrender
@@ -55,6 +58,42 @@ html_problem_semantics = ["codeparam", "responseparam", "answer", "script", "hin
 
 log = logging.getLogger(__name__)
 
+# The number of parsed and preprocessed problems to keep, see ProblemTemplate
+PROBLEM_TEMPLATE_CACHE_SIZE = 256
+_problem_templates = LRUCache(PROBLEM_TEMPLATE_CACHE_SIZE)
+
+
+class ProblemTemplate(object):
+    '''
+    The part of a LoncapaProblem that only depends on its XML and id: the parsed
+    tree, with its includes included and its IDs assigned, and where its responses
+    and their input fields are. The tree is never modified: each problem works on
+    its own copy.
+
+    Elements are identified by their position in document order (as in tree.iter()),
+    which is the same in any copy of the tree.
+    '''
+    def __init__(self, tree, responses):
+        '''
+        - tree (Element): the preprocessed problem tree
+        - responses (list): (response position, Response class, [input field positions])
+                            for each response, in the order IDs were assigned
+        '''
+        self.tree = tree
+        self.responses = responses
+
+    def instantiate(self):
+        '''
+        Return (tree, responses), a copy of the tree, and a list of (response element,
+        Response class, [input field elements]) in that copy.
+        '''
+        tree = deepcopy(self.tree)
+        elements = list(tree.iter())
+        responses = [(elements[response], response_class, [elements[entry] for entry in inputfields])
+                     for response, response_class, inputfields in self.responses]
+        return tree, responses
+
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -110,20 +149,17 @@ class LoncapaProblem(object):
         problem_text = re.sub("endouttext\s*/", "/text", problem_text)
         self.problem_text = problem_text
 
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
+        # Get our own copy of the parsed and preprocessed problem XML tree, with
+        # its responses and their input fields
+        self.tree, responses = self._get_template().instantiate()
 
         # construct script processor context (eg for customresponse problems)
         self.context = self._extract_context(self.tree)
 
-        # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
-        # transformations.  This also creates the dict (self.responders) of Response
-        # instances for each question in the problem. The dict has keys = xml subtree of
-        # Response, values = Response instance
-        self._preprocess_problem(self.tree)
+        # This creates the dict (self.responders) of Response instances for each
+        # question in the problem. The dict has keys = xml subtree of Response,
+        # values = Response instance
+        self._create_responders(responses)
 
         if not self.student_answers:  # True when student_answers is an empty dict
             self.set_initial_display()
@@ -352,6 +388,44 @@ class LoncapaProblem(object):
 
     # ======= Private Methods Below ========
 
+    def _get_template(self):
+        '''
+        Return the ProblemTemplate for this problem's XML and id, from the cache of
+        templates if it has already been built in this process.
+        '''
+        text = self.problem_text
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        key = [self.problem_id, hashlib.md5(text).hexdigest()]
+        if '<include' in self.problem_text:
+            # included files are read from the system's filestore
+            key.append(repr(self.system.filestore))
+        key = tuple(key)
+
+        template = _problem_templates.get(key)
+        if template is None:
+            template = self._build_template()
+            _problem_templates.set(key, template)
+        return template
+
+    def _build_template(self):
+        '''
+        Parse and preprocess this problem's XML into a ProblemTemplate
+        '''
+        # parse problem XML file into an element tree
+        self.tree = etree.XML(self.problem_text)
+
+        # handle any <include file="foo"> tags
+        self._process_includes()
+
+        # Pre-parse the XML tree: modifies it to add ID's
+        responses = self._preprocess_problem(self.tree)
+
+        positions = dict((element, position) for position, element in enumerate(self.tree.iter()))
+        responses = [(positions[response], response_class, [positions[entry] for entry in inputfields])
+                     for response, response_class, inputfields in responses]
+        return ProblemTemplate(self.tree, responses)
+
     def _process_includes(self):
         '''
         Handle any <include file="foo"> tags by reading in the specified file and inserting it
@@ -571,15 +645,13 @@ class LoncapaProblem(object):
         '''
         Assign IDs to all the responses
         Assign sub-IDs to all entries (textline, schematic, etc.)
-        Annoted correctness and value
         In-place transformation
 
-        Also create capa Response instances for each responsetype and save as self.responders
-
-        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        Return a list of (response element, Response class, [input field elements])
+        for each response
         '''
         response_id = 1
-        self.responders = {}
+        responses = []
         for response in tree.xpath('//' + "|//".join(response_tag_dict)):
             response_id_str = self.problem_id + "_" + str(response_id)
             # create and save ID for this response
@@ -599,9 +671,23 @@ class LoncapaProblem(object):
                 entry.attrib['id'] = "%s_%i_%i" % (self.problem_id, response_id, answer_id)
                 answer_id = answer_id + 1
 
+            responses.append((response, response_tag_dict[response.tag], inputfields))
+
+        return responses
+
+    def _create_responders(self, responses):  # private
+        '''
+        Create capa Response instances for each responsetype and save as self.responders,
+        from a list of (response element, Response class, [input field elements])
+
+        Obtain all responder answers and save as self.responder_answers dict (key = response)
+
+        Assign IDs to all the solutions (after the responders have seen their own IDs for them)
+        '''
+        self.responders = {}
+        for response, response_class, inputfields in responses:
             # instantiate capa Response
-            responder = response_tag_dict[response.tag](response, inputfields,
-                                                        self.context, self.system)
+            responder = response_class(response, inputfields, self.context, self.system)
             # save in list in self
             self.responders[response] = responder
 
@@ -620,6 +706,6 @@ class LoncapaProblem(object):
         # IDs for those separately
         # TODO: We should make the namespaces consistent and unique (e.g. %s_problem_%i).
         solution_id = 1
-        for solution in tree.findall('.//solution'):
+        for solution in self.tree.findall('.//solution'):
             solution.attrib['id'] = "%s_solution_%i" % (self.problem_id, solution_id)
             solution_id += 1
@@ -31,7 +31,7 @@ from collections import namedtuple
 from shapely.geometry import Point, MultiPoint
 
 # specific library imports
-from calc import evaluator, UndefinedVariable
+from calc import evaluator, batch_evaluator, UndefinedVariable
 from . import correctmap
 from datetime import datetime
 from .util import *
@@ -1712,14 +1712,26 @@ class FormulaResponse(LoncapaResponse):
                            samples.split('@')[1].split('#')[0].split(':')))
 
         ranges = dict(zip(variables, sranges))
+        # ranges give numerical ranges for testing
+        sample_points = []
         for i in range(numsamples):
-            instructor_variables = self.strip_dict(dict(self.context))
-            student_variables = dict()
-            # ranges give numerical ranges for testing
+            point = dict()
             for var in ranges:
-                value = random.uniform(*ranges[var])
-                instructor_variables[str(var)] = value
-                student_variables[str(var)] = value
+                point[str(var)] = random.uniform(*ranges[var])
+            sample_points.append(point)
+
+        if sample_points:
+            try:
+                return self.check_formula_batch(expected, given, sample_points)
+            except Exception as err:
+                # Go through the samples one at a time, which reports errors
+                # in the student's input properly.
+                log.debug('formularesponse: batch evaluation failed (%s)' % err)
+
+        for point in sample_points:
+            instructor_variables = self.strip_dict(dict(self.context))
+            instructor_variables.update(point)
+            student_variables = dict(point)
             # log.debug('formula: instructor_vars=%s, expected=%s' %
             # (instructor_variables,expected))
             instructor_result = evaluator(instructor_variables, dict(),
@@ -1758,6 +1770,34 @@ class FormulaResponse(LoncapaResponse):
                 return "incorrect"
         return "correct"
 
+    def check_formula_batch(self, expected, given, sample_points):
+        '''
+        Evaluate both formulas over all the sample points at once, and
+        compare the results.
+
+        Any floating point trouble (division by zero, overflow, invalid
+        operations) raises here instead of quietly producing inf or nan,
+        so that the caller can fall back to evaluating the samples one at
+        a time, with the usual error handling.
+        '''
+        numsamples = len(sample_points)
+        sampled = dict((var, numpy.array([point[var] for point in sample_points]))
+                       for var in sample_points[0])
+
+        instructor_variables = self.strip_dict(dict(self.context))
+        instructor_variables.update(sampled)
+        student_variables = dict(sampled)
+
+        with numpy.errstate(divide='raise', over='raise', invalid='raise'):
+            instructor_results = batch_evaluator(instructor_variables, dict(), expected,
+                                                 numsamples, cs=self.case_sensitive)
+            student_results = batch_evaluator(student_variables, dict(), given,
+                                              numsamples, cs=self.case_sensitive)
+
+        if compare_with_tolerance(student_results, instructor_results, self.tolerance):
+            return "correct"
+        return "incorrect"
+
     def strip_dict(self, d):
         ''' Takes a dict. Returns an identical dict, with all non-word
         keys and all non-numeric values stripped out. All values also
@@ -3,6 +3,7 @@
 from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
+from . import worker_pool
 from statsd import statsd
 
 import hashlib
@@ -90,6 +91,9 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
 
+    If a pool of sandbox workers has been configured (see `worker_pool`),
+    code that doesn't need a `python_path` is run by one of its workers.
+
     """
     # Check the cache for a previous result.
     if cache:
@@ -113,10 +117,15 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
 
     # Run the code!  Results are side effects in globals_dict.
     try:
-        codejail_safe_exec(
-            code_prolog + LAZY_IMPORTS + code, globals_dict,
-            python_path=python_path, slug=slug,
-        )
+        if worker_pool.POOL is not None and not python_path:
+            worker_pool.POOL.safe_exec(
+                code_prolog + LAZY_IMPORTS + code, globals_dict, slug=slug,
+            )
+        else:
+            codejail_safe_exec(
+                code_prolog + LAZY_IMPORTS + code, globals_dict,
+                python_path=python_path, slug=slug,
+            )
     except SafeExecException as e:
         emsg = e.message
     else:
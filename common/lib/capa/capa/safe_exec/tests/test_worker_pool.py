@@ -0,0 +1,154 @@
+"""Test worker_pool.py"""
+
+import random
+import textwrap
+import unittest
+
+from capa.safe_exec import safe_exec, worker_pool
+from codejail.safe_exec import SafeExecException
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        worker_pool.configure(size=2, max_jobs=3, timeout=2)
+        self.pool = worker_pool.POOL
+
+    def tearDown(self):
+        worker_pool.configure(size=0)
+
+    def test_set_values(self):
+        g = {'b': 2}
+        safe_exec("a = 17 * b", g)
+        self.assertEqual(g, {'a': 34, 'b': 2})
+
+    def test_division_and_assumed_imports(self):
+        g = {}
+        safe_exec("a = 1/2\nb = int(math.pi)", g)
+        self.assertEqual((g['a'], g['b']), (0.5, 3))
+
+    def test_random_seeding(self):
+        r = random.Random(17)
+        rnums = [r.randint(0, 999) for _ in xrange(100)]
+
+        for _ in xrange(2):
+            g = {}
+            safe_exec(
+                "import random\n"
+                "rnums = [random.randint(0, 999) for _ in xrange(100)]\n",
+                g, random_seed=17)
+            self.assertEqual(g['rnums'], rnums)
+
+    def test_raising_exceptions(self):
+        g = {}
+        with self.assertRaises(SafeExecException) as cm:
+            safe_exec("1/0", g)
+        self.assertIn("ZeroDivisionError", cm.exception.message)
+
+    def test_jobs_are_isolated(self):
+        g = {}
+        safe_exec("import math\nmath.pi = 3\nimport sys\nsys.modules['fake'] = math", g)
+        safe_exec("import sys\na = int(math.pi * 100)\nb = 'fake' in sys.modules", g)
+        self.assertEqual((g['a'], g['b']), (314, False))
+
+    def test_jobs_cant_see_earlier_jobs(self):
+        safe_exec("secret = 'hush'", {'password': 'swordfish'})
+        g = {}
+        safe_exec(textwrap.dedent("""\
+            import gc
+            def count_leaks():
+                # Put together as it runs, so that this job's code isn't a leak
+                found = [''.join(['hu', 'sh']), ''.join(['sword', 'fish'])]
+                count = 0
+                for obj in gc.get_objects():
+                    if obj is found:
+                        continue
+                    elif isinstance(obj, dict):
+                        values = obj.values()
+                    elif isinstance(obj, (list, tuple)):
+                        values = obj
+                    else:
+                        continue
+                    for value in values:
+                        if isinstance(value, basestring) and any(f in value for f in found):
+                            count += 1
+                return count
+            leaks = count_leaks()
+            """), g)
+        self.assertEqual(g['leaks'], 0)
+
+    def test_printing(self):
+        g = {}
+        safe_exec("print 'hello'\nimport os\nos.write(1, 'there')\na = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_workers_are_reused_and_replaced(self):
+        safe_exec("a = 1", {})
+        worker = self.pool.idle.queue[0]
+        safe_exec("a = 1", {})
+        self.assertIs(self.pool.idle.queue[0], worker)
+
+        # max_jobs is 3
+        safe_exec("a = 1", {})
+        self.assertEqual(self.pool.idle.qsize(), 0)
+        self.assertIsNotNone(worker.process.poll())
+
+    def test_runaway_code(self):
+        with self.assertRaises(SafeExecException):
+            safe_exec("while True: pass", {})
+        # The pool still works afterwards
+        g = {}
+        safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_dead_worker(self):
+        safe_exec("a = 1", {})
+        worker = self.pool.idle.queue[0]
+        worker.process.kill()
+        worker.process.wait()
+
+        with self.assertRaises(SafeExecException):
+            safe_exec("a = 1", {})
+        g = {}
+        safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_jobs_cant_reach_the_worker(self):
+        # A job leaves a process behind, which tries to take the next job from
+        # the worker and to answer it with made-up globals.
+        try:
+            safe_exec(textwrap.dedent("""\
+                import __main__, os, time
+                try:
+                    responses = __main__.responses.fileno()
+                except (AttributeError, ValueError):
+                    responses = None
+                try:
+                    pid = os.fork()
+                except OSError:
+                    pid = None
+                if pid == 0:
+                    # Don't keep the worker waiting for this job's answer.
+                    for fd in range(3, 256):
+                        if fd != responses:
+                            try:
+                                os.close(fd)
+                            except OSError:
+                                pass
+                    forged = '{"globals": {"a": "forged"}, "error": null}\\n'
+                    deadline = time.time() + 4
+                    while time.time() < deadline:
+                        try:
+                            if os.read(0, 65536) and responses is not None:
+                                os.write(responses, forged)
+                        except OSError:
+                            pass
+                        time.sleep(0.01)
+                    os._exit(0)
+                """), {})
+        except SafeExecException:
+            pass
+
+        for _ in xrange(3):
+            g = {}
+            safe_exec("a = 1", g)
+            self.assertEqual(g, {'a': 1})
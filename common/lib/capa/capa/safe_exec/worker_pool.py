@@ -0,0 +1,392 @@
+"""
+A pool of long-lived sandbox processes for safe_exec to run code in.
+
+Running code with codejail starts a new sandboxed Python for every execution,
+which then has to import numpy, scipy and the rest of the assumed imports.
+Instead, each worker here is a sandboxed Python that has imported them once,
+and forks a child for every job.  The child runs the code, with codejail's
+limits applied to it alone, sends back the resulting globals and exits, so jobs
+can't see each other's changes to the interpreter.  The child can't read the
+worker's jobs or write its answers, and is killed along with its process group
+when the job ends.
+
+Workers are replaced after `max_jobs` jobs, and whenever anything goes wrong
+talking to them.
+
+Use `configure` to turn the pool on; `safe_exec` then uses it for code that
+doesn't need extra directories on its Python path.
+
+"""
+
+import inspect
+import json
+import logging
+import os
+import os.path
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import Queue
+
+from codejail.safe_exec import json_safe, SafeExecException
+
+log = logging.getLogger(__name__)
+
+# The code run by each worker, with `python -c`.  The sandboxed Python may not
+# be able to read files from our installation, so everything it needs is in here.
+WORKER_CODE = """\
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+from StringIO import StringIO
+
+ASSUMED_MODULES = %(assumed_modules)r
+CPU_LIMIT = %(cpu_limit)r
+REALTIME_LIMIT = %(realtime_limit)r
+VMEM_LIMIT = %(vmem_limit)r
+
+for modname in ASSUMED_MODULES:
+    try:
+        __import__(modname)
+    except Exception:
+        pass
+
+# Keep our stdout for responses, anything else written to it goes to stderr.
+responses = os.fdopen(os.dup(1), 'w')
+os.dup2(2, 1)
+responses.write("ready\\n")
+responses.flush()
+
+%(json_safe)s
+
+def run_job(code, g_dict, result_fd):
+    # The same limits codejail puts on its sandboxes: no new processes, no
+    # files written, and bounded CPU and memory.
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    if CPU_LIMIT:
+        resource.setrlimit(resource.RLIMIT_CPU, (CPU_LIMIT, CPU_LIMIT))
+    if VMEM_LIMIT:
+        resource.setrlimit(resource.RLIMIT_AS, (VMEM_LIMIT, VMEM_LIMIT))
+    if REALTIME_LIMIT:
+        signal.alarm(REALTIME_LIMIT)
+    sys.stdout = StringIO()
+    try:
+        exec code in g_dict
+    except BaseException:
+        error = traceback.format_exc()
+    else:
+        error = None
+    sys.stdout = sys.__stdout__
+    result = json.dumps({'globals': json_safe(g_dict), 'error': error})
+    os.write(result_fd, result)
+
+def read_result(read_fd):
+    # Read what the job writes, until it's done or out of time.  Anything it
+    # left running could keep the pipe open, so don't wait for that.
+    chunks = []
+    deadline = time.time() + REALTIME_LIMIT + 1 if REALTIME_LIMIT else None
+    while True:
+        timeout = max(deadline - time.time(), 0) if deadline else None
+        ready, _, _ = select.select([read_fd], [], [], timeout)
+        if not ready:
+            break
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return "".join(chunks)
+
+def handle_job(line):
+    # Everything to do with a job is local to this, so that nothing of
+    # earlier jobs is left for the next one to find in the worker.
+    code, g_dict = json.loads(line)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # Jobs get a process group of their own, so that everything they
+            # start can be killed with them, and none of the channels to the
+            # LMS: only the worker may read the next job or write results.
+            os.setpgid(0, 0)
+            os.close(read_fd)
+            devnull = os.open(os.devnull, os.O_RDWR)
+            os.dup2(devnull, 0)
+            os.close(devnull)
+            responses.close()
+            run_job(code, g_dict, write_fd)
+        finally:
+            os._exit(0)
+
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        # The child got there first.
+        pass
+    os.close(write_fd)
+    result = read_result(read_fd)
+    os.close(read_fd)
+    # The child isn't reaped yet, so its process group is still ours to kill.
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    _, status = os.waitpid(pid, 0)
+
+    try:
+        # Re-encoded, so that it's one line whatever the job wrote.
+        result = json.dumps(json.loads(result)) if status == 0 else None
+    except ValueError:
+        result = None
+    if result is None:
+        result = json.dumps({
+            'globals': {},
+            'error': "Job process died with status %%d" %% status,
+        })
+    responses.write(result + "\\n")
+    responses.flush()
+
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    handle_job(line)
+    del line
+"""
+
+
+# How long a worker has to import everything and be ready for jobs
+STARTUP_TIMEOUT = 60
+
+# How much longer than a job's real time limit to wait for a worker's answer
+# before giving up on it
+GRACE_TIME = 5
+
+
+class WorkerFault(Exception):
+    """Something went wrong talking to a worker, it can't be used any more."""
+    pass
+
+
+class SandboxWorker(object):
+    """
+    One sandboxed Python process, running WORKER_CODE.
+    """
+
+    def __init__(self, command, worker_code, timeout):
+        """
+        Start the worker, and wait for it to be ready.
+
+        `timeout` is how long to wait for the answer to a job.
+
+        Raises WorkerFault if the worker doesn't start properly.
+        """
+        self.jobs = 0
+        self.timeout = timeout
+        self.tmpdir = tempfile.mkdtemp(prefix='codejail-worker-')
+        # The sandbox user needs to be able to work in its directory.
+        os.chmod(self.tmpdir, 0777)
+        self.devnull = open(os.devnull, 'w')
+        self.process = subprocess.Popen(
+            command + ['-c', worker_code],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self.devnull,
+            cwd=self.tmpdir, env={}, close_fds=True,
+        )
+        try:
+            if self._readline(STARTUP_TIMEOUT).strip() != "ready":
+                raise WorkerFault("Worker didn't start properly")
+        except Exception:
+            self.close()
+            raise
+
+    def _readline(self, timeout):
+        """
+        Return the next line the worker writes, waiting up to `timeout` seconds for it.
+        """
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            raise WorkerFault("No answer in {0} seconds".format(timeout))
+        line = self.process.stdout.readline()
+        if not line:
+            raise WorkerFault("Worker exited with status {0}".format(self.process.poll()))
+        return line
+
+    def run(self, code, globals_dict):
+        """
+        Run `code` with `globals_dict` in the worker, and return (error, globals):
+        the formatted exception raised by the code, or None, and the JSON-safe
+        globals it left.
+
+        Raises WorkerFault if the worker doesn't answer properly in time.
+        """
+        self.jobs += 1
+        try:
+            self.process.stdin.write(json.dumps([code, json_safe(globals_dict)]) + "\n")
+            self.process.stdin.flush()
+
+            result = json.loads(self._readline(self.timeout))
+            return result['error'], result['globals']
+        except (IOError, OSError, ValueError, KeyError) as err:
+            raise WorkerFault(repr(err))
+
+    def close(self):
+        """
+        Stop the worker, and clean up after it.
+        """
+        try:
+            self.process.stdin.close()
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+        except (IOError, OSError):
+            log.exception("Error stopping a sandbox worker")
+        self.devnull.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class SandboxWorkerPool(object):
+    """
+    Up to `size` SandboxWorkers, started when they are needed, and shared by
+    the threads of a process.
+    """
+
+    def __init__(self, command, size, max_jobs=100, timeout=10, cpu_limit=None,
+                 vmem_limit=None, assumed_modules=()):
+        self.command = command
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.worker_code = WORKER_CODE % {
+            'assumed_modules': list(assumed_modules),
+            'cpu_limit': cpu_limit,
+            'realtime_limit': timeout,
+            'vmem_limit': vmem_limit,
+            'json_safe': inspect.getsource(json_safe),
+        }
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.idle = Queue.Queue()
+        # Available slots for workers, whether or not they've been started
+        self.slots = threading.BoundedSemaphore(self.size)
+
+    def _checkout(self):
+        """
+        Return an idle worker, starting one if there is none.
+        """
+        if self.pid != os.getpid():
+            # We've been forked: our workers belong to our parent.
+            self._reset()
+
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except Queue.Empty:
+            pass
+        try:
+            return SandboxWorker(self.command, self.worker_code, self.timeout + GRACE_TIME)
+        except WorkerFault as err:
+            self.slots.release()
+            raise SafeExecException("Couldn't start a sandbox worker: {0}".format(err))
+        except Exception:
+            self.slots.release()
+            raise
+
+    def _checkin(self, worker):
+        """
+        Make `worker` available again, or None to free its slot.
+        """
+        if worker is not None:
+            if worker.jobs >= self.max_jobs:
+                worker.close()
+            else:
+                self.idle.put(worker)
+        self.slots.release()
+
+    def close(self):
+        """
+        Stop the idle workers.  Busy ones are stopped when they're checked in.
+        """
+        self.max_jobs = 0
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Queue.Empty:
+                break
+
+    def safe_exec(self, code, globals_dict, slug=None):
+        """
+        Execute `code` with `globals_dict` in one of the workers, like
+        codejail.safe_exec.safe_exec: changes the code makes to the
+        globals are visible in `globals_dict` when this returns, and
+        SafeExecException is raised if the code raises an exception.
+        """
+        worker = self._checkout()
+        try:
+            error, result_globals = worker.run(code, globals_dict)
+        except WorkerFault as err:
+            log.warning("Sandbox worker failed running %s: %s", slug, err)
+            worker.close()
+            worker = None
+            raise SafeExecException("Couldn't execute jailed code: {0}".format(err))
+        finally:
+            self._checkin(worker)
+
+        if error:
+            raise SafeExecException("Couldn't execute jailed code: {0}".format(error))
+        globals_dict.update(result_globals)
+
+
+# The pool used by safe_exec, if any.
+POOL = None
+
+
+def configure(python_bin=None, user=None, size=4, max_jobs=100, timeout=10, cpu_limit=None,
+              vmem_limit=None):
+    """
+    Make safe_exec run code in a pool of `size` workers.
+
+    `python_bin` and `user` are the sandboxed Python executable and the user
+    to run it as, as configured for codejail.  Without `python_bin`, this
+    Python is used, unsandboxed, like codejail does when it isn't configured.
+
+    Workers are replaced after `max_jobs` jobs.  Each job can use `cpu_limit`
+    seconds of CPU, `timeout` seconds of real time, and `vmem_limit` bytes of
+    memory, counting what the worker has imported.
+
+    A `size` of 0 turns the pool off.
+    """
+    global POOL
+
+    from .safe_exec import ASSUMED_IMPORTS
+
+    if POOL is not None:
+        POOL.close()
+        POOL = None
+
+    if not size:
+        return
+
+    if python_bin is None:
+        log.warning("Running safe_exec workers without a sandbox. This is OK in localdev and testing environment. Not OK in production.")
+        command = [sys.executable, '-E', '-B']
+    else:
+        command = [python_bin, '-E', '-B']
+        if user is not None:
+            command = ['sudo', '-u', user] + command
+
+    POOL = SandboxWorkerPool(
+        command, size, max_jobs=max_jobs, timeout=timeout, cpu_limit=cpu_limit,
+        vmem_limit=vmem_limit, assumed_modules=[modname for _, modname in ASSUMED_IMPORTS],
+    )
@@ -0,0 +1,61 @@
+import textwrap
+import unittest
+
+import mock
+
+from capa import capa_problem
+from capa.capa_problem import LoncapaProblem
+from .response_xml_factory import StringResponseXMLFactory
+from . import test_system
+
+
+class ProblemTemplateTest(unittest.TestCase):
+
+    def setUp(self):
+        super(ProblemTemplateTest, self).setUp()
+        capa_problem._problem_templates.clear()
+        self.xml = textwrap.dedent("""
+            <problem>
+            <script type="loncapa/python">
+            answer = str(random.randint(0, 1e9))
+            </script>
+            <stringresponse answer="$answer">
+                <textline size="20"/>
+            </stringresponse>
+            <solution><p>The answer</p></solution>
+            </problem>
+        """)
+
+    def new_problem(self, xml=None, seed=723, problem_id='1'):
+        return LoncapaProblem(xml or self.xml, id=problem_id, seed=seed, system=test_system())
+
+    def test_parsed_once(self):
+        with mock.patch.object(LoncapaProblem, '_process_includes') as process_includes:
+            problem = self.new_problem()
+            other_problem = self.new_problem(seed=724)
+        self.assertEqual(process_includes.call_count, 1)
+
+        # Each problem has its own tree, with the same IDs
+        self.assertIsNot(problem.tree, other_problem.tree)
+        self.assertEqual(sorted(problem.get_question_answers().keys()), ['1_2_1', '1_solution_1'])
+        self.assertEqual(sorted(other_problem.get_question_answers().keys()), ['1_2_1', '1_solution_1'])
+
+        # ...but the answers for their own seed
+        self.assertNotEqual(problem.context['answer'], other_problem.context['answer'])
+        self.assertEqual(problem.get_question_answers()['1_2_1'], problem.context['answer'])
+        self.assertEqual(other_problem.get_question_answers()['1_2_1'], other_problem.context['answer'])
+
+    def test_changes_not_shared(self):
+        problem = self.new_problem()
+        problem.tree.find('.//textline').set('size', '40')
+        other_problem = self.new_problem()
+        self.assertEqual(other_problem.tree.find('.//textline').get('size'), '20')
+
+    def test_keyed_by_text_and_id(self):
+        self.new_problem()
+        self.new_problem(problem_id='2')
+        self.new_problem(xml=StringResponseXMLFactory().build_xml(answer='Michigan'))
+        self.assertEqual(len(capa_problem._problem_templates), 3)
+
+        problem = self.new_problem(problem_id='2')
+        self.assertEqual(sorted(problem.get_question_answers().keys()), ['2_2_1', '2_solution_1'])
@@ -1,6 +1,8 @@
 from calc import evaluator, UndefinedVariable
 from cmath import isinf
 
+import numpy
+
 #-----------------------------------------------------------------------------
 #
 # Utility functions used in CAPA responsetypes
@@ -14,7 +16,12 @@ def compare_with_tolerance(v1, v2, tol):
      - v2    :  instructor result (number)
      - tol   :  tolerance (string representing a number)
 
+    v1 and v2 may also be numpy arrays of results, one per sample, in
+    which case every pair of samples must match.
     '''
+    if isinstance(v1, numpy.ndarray) or isinstance(v2, numpy.ndarray):
+        return compare_arrays_with_tolerance(v1, v2, tol)
+
     relative = tol.endswith('%')
     if relative:
         tolerance_rel = evaluator(dict(), dict(), tol[:-1]) * 0.01
@@ -31,6 +38,24 @@ def compare_with_tolerance(v1, v2, tol):
         return abs(v1 - v2) <= tolerance
 
 
+def compare_arrays_with_tolerance(v1, v2, tol):
+    ''' Elementwise version of compare_with_tolerance; True if all match '''
+    v1 = numpy.asarray(v1)
+    v2 = numpy.asarray(v2)
+    relative = tol.endswith('%')
+    if relative:
+        tolerance_rel = evaluator(dict(), dict(), tol[:-1]) * 0.01
+        tolerance = tolerance_rel * numpy.maximum(abs(v1), abs(v2))
+    else:
+        tolerance = evaluator(dict(), dict(), tol)
+
+    # Same special case for infinite values as in compare_with_tolerance
+    infinite = numpy.isinf(v1) | numpy.isinf(v2)
+    with numpy.errstate(invalid='ignore'):
+        close = abs(v1 - v2) <= tolerance
+    return bool(numpy.all(numpy.where(infinite, v1 == v2, close)))
+
+
 def contextualize_text(text, context):  # private
     ''' Takes a string with variables. E.g. $a+$b.
     Does a substitution of those variables from the context '''
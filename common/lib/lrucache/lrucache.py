@@ -0,0 +1,39 @@
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    '''
+    A small, thread safe, least-recently-used cache, for things worth keeping
+    in each process (e.g. parsed expressions or problems) without letting them
+    use unbounded memory.
+    '''
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
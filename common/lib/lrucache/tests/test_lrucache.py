@@ -0,0 +1,27 @@
+"""
+Tests for lrucache
+"""
+
+import unittest
+
+from lrucache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_cache_is_bounded(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
@@ -14,11 +14,15 @@ from PIL import Image
 
 
 class StaticContent(object):
-    def __init__(self, loc, name, content_type, data, last_modified_at=None, thumbnail_location=None, import_path=None):
+    def __init__(self, loc, name, content_type, data, last_modified_at=None, thumbnail_location=None, import_path=None,
+                 length=None, content_digest=None):
         self.location = loc
         self.name = name   # a display string which can be edited, and thus not part of the location which needs to be fixed
         self.content_type = content_type
         self.data = data
+        self.length = length
+        # a digest of the content (e.g. the md5 GridFS computes), if known
+        self.content_digest = content_digest
         self.last_modified_at = last_modified_at
         self.thumbnail_location = Location(thumbnail_location) if thumbnail_location is not None else None
         # optional information about where this file was imported from. This is needed to support import/export
@@ -81,6 +85,56 @@ class StaticContent(object):
         return StaticContent.get_url_path_from_location(loc)
 
 
+class StaticContentStream(StaticContent):
+    """
+    StaticContent whose data is read from a file-like object (e.g. a GridFS
+    file), a chunk at a time, when it is needed, instead of being held in memory.
+    """
+    def __init__(self, loc, name, content_type, stream, last_modified_at=None, thumbnail_location=None,
+                 import_path=None, length=None, content_digest=None, chunk_size=256 * 1024):
+        super(StaticContentStream, self).__init__(loc, name, content_type, None, last_modified_at=last_modified_at,
+                                                  thumbnail_location=thumbnail_location, import_path=import_path,
+                                                  length=length, content_digest=content_digest)
+        self._stream = stream
+        self.chunk_size = chunk_size
+
+    def stream_data(self):
+        """
+        Yield the data, a chunk at a time
+        """
+        return self.stream_data_in_range(0, self.length - 1)
+
+    def stream_data_in_range(self, first_byte, last_byte):
+        """
+        Yield the data from first_byte to last_byte (included), a chunk at a time
+        """
+        self._stream.seek(first_byte)
+        remaining = last_byte - first_byte + 1
+        while remaining > 0:
+            chunk = self._stream.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def copy_to_in_mem(self):
+        """
+        Return a StaticContent holding all of the data
+        """
+        self._stream.seek(0)
+        return StaticContent(self.location, self.name, self.content_type, self._stream.read(),
+                             last_modified_at=self.last_modified_at, thumbnail_location=self.thumbnail_location,
+                             import_path=self.import_path, length=self.length, content_digest=self.content_digest)
+
+    def copy_without_data(self):
+        """
+        Return a StaticContent with the same metadata, but no data
+        """
+        return StaticContent(self.location, self.name, self.content_type, None,
+                             last_modified_at=self.last_modified_at, thumbnail_location=self.thumbnail_location,
+                             import_path=self.import_path, length=self.length, content_digest=self.content_digest)
+
+
 class ContentStore(object):
     '''
     Abstraction for all ContentStore providers (e.g. MongoDB)
@@ -6,9 +6,10 @@ from gridfs.errors import NoFile
 from xmodule.modulestore.mongo import location_to_query, Location
 from xmodule.contentstore.content import XASSET_LOCATION_TAG
 
+import datetime
 import logging
 
-from .content import StaticContent, ContentStore
+from .content import StaticContent, StaticContentStream, ContentStore
 from xmodule.exceptions import NotFoundError
 from fs.osfs import OSFS
 import os
@@ -23,7 +24,16 @@ class MongoContentStore(ContentStore):
             _db.authenticate(user, password)
 
         self.fs = gridfs.GridFS(_db)
-        self.fs_files = _db["fs.files"]   # the underlying collection GridFS uses
+        self.fs_files = _db["fs.files"]   # the underlying collections GridFS uses
+        self.fs_chunks = _db["fs.chunks"]
+        self.change_listeners = []
+
+    def add_change_listener(self, listener):
+        """
+        Call listener(location, content_digest) whenever the asset at location,
+        whose data had the digest content_digest, is replaced or deleted.
+        """
+        self.change_listeners.append(listener)
 
     def save(self, content):
         id = content.get_id()
@@ -40,22 +50,91 @@ class MongoContentStore(ContentStore):
         return content
 
     def delete(self, id):
-        if self.fs.exists({"_id": id}):
+        existing = self.fs_files.find_one({"_id": id}, fields=['md5'])
+        if existing is not None:
             self.fs.delete(id)
-
-    def find(self, location):
+            location = Location(id)
+            for listener in self.change_listeners:
+                listener(location, existing.get('md5'))
+
+    def delete_many(self, ids):
+        """
+        Delete the content with all the ids, with a query per collection
+        rather than per content
+        """
+        existing = list(self.fs_files.find({"_id": {"$in": ids}}, fields=['md5']))
+        # the chunks go first, so that no file is ever left without them, including
+        # any left without a file by an interrupted copy
+        self.fs_chunks.remove({"files_id": {"$in": ids}}, safe=True)
+        if not existing:
+            return
+        self.fs_files.remove({"_id": {"$in": [item['_id'] for item in existing]}}, safe=True)
+        for item in existing:
+            location = Location(item['_id'])
+            for listener in self.change_listeners:
+                listener(location, item.get('md5'))
+
+    def copy(self, source, location, batch_size=100, **fields):
+        """
+        Copy the content described by source (one of the dicts returned by
+        get_all_content_for_course) to location, which must not have content
+        yet.  The data is copied batch_size chunks at a time, without ever
+        having the whole of it in memory.
+
+        fields: what to change in the copy's GridFS file, e.g. its thumbnail_location
+        """
+        id = StaticContent.get_id_from_location(location)
+        # chunks left by a copy that didn't finish would clash with the new ones
+        self.fs_chunks.remove({"files_id": id}, safe=True)
+
+        batch = []
+        for chunk in self.fs_chunks.find({"files_id": source['_id']}, fields=['n', 'data']):
+            batch.append({"files_id": id, "n": chunk['n'], "data": chunk['data']})
+            if len(batch) >= batch_size:
+                self.fs_chunks.insert(batch, safe=True)
+                batch = []
+        if batch:
+            self.fs_chunks.insert(batch, safe=True)
+
+        # the file goes last, so that nobody sees it before it has all its chunks
+        file_doc = dict(source)
+        file_doc.update(fields)
+        file_doc.update({
+            "_id": id,
+            "filename": StaticContent.get_url_path_from_location(location),
+            "uploadDate": datetime.datetime.utcnow(),
+        })
+        self.fs_files.insert(file_doc, safe=True)
+
+    def find(self, location, as_stream=False):
+        """
+        Return the StaticContent at location.
+
+        If as_stream is True, return a StaticContentStream that reads the data
+        from GridFS when it is needed, instead of reading it all now.
+        """
         id = StaticContent.get_id_from_location(location)
         try:
-            with self.fs.get(id) as fp:
-                return StaticContent(location, fp.displayname, fp.content_type, fp.read(),
-                                     fp.uploadDate,
-                                     thumbnail_location=fp.thumbnail_location if hasattr(fp, 'thumbnail_location') else None,
-                                     import_path=fp.import_path if hasattr(fp, 'import_path') else None)
+            if as_stream:
+                fp = self.fs.get(id)
+                return StaticContentStream(
+                    location, fp.displayname, fp.content_type, fp, last_modified_at=fp.uploadDate,
+                    thumbnail_location=getattr(fp, 'thumbnail_location', None),
+                    import_path=getattr(fp, 'import_path', None),
+                    length=fp.length, content_digest=fp.md5, chunk_size=fp.chunk_size
+                )
+            else:
+                with self.fs.get(id) as fp:
+                    return StaticContent(location, fp.displayname, fp.content_type, fp.read(),
+                                         fp.uploadDate,
+                                         thumbnail_location=fp.thumbnail_location if hasattr(fp, 'thumbnail_location') else None,
+                                         import_path=fp.import_path if hasattr(fp, 'import_path') else None,
+                                         length=fp.length, content_digest=fp.md5)
         except NoFile:
             raise NotFoundError()
 
     def export(self, location, output_directory):
-        content = self.find(location)
+        content = self.find(location, as_stream=True)
 
         if content.import_path is not None:
             output_directory = output_directory + '/' + os.path.dirname(content.import_path)
@@ -66,7 +145,8 @@ class MongoContentStore(ContentStore):
         disk_fs = OSFS(output_directory)
 
         with disk_fs.open(content.name, 'wb') as asset_file:
-            asset_file.write(content.data)
+            for chunk in content.stream_data():
+                asset_file.write(chunk)
 
     def export_all_for_course(self, course_location, output_directory):
         assets = self.get_all_content_for_course(course_location)
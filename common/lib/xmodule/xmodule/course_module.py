@@ -24,6 +24,17 @@ from .fields import Date
 log = logging.getLogger(__name__)
 
 
+def yield_descriptor_descendents(module_descriptor):
+    """
+    Yield all the descendents of module_descriptor, each one followed by its
+    own descendents, in the order grading_context lists them.
+    """
+    for child in module_descriptor.get_children():
+        yield child
+        for descendent in yield_descriptor_descendents(child):
+            yield descendent
+
+
 class StringOrDate(Date):
     def from_json(self, value):
         """
@@ -587,12 +598,6 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
         all_descriptors = []
         graded_sections = {}
 
-        def yield_descriptor_descendents(module_descriptor):
-            for child in module_descriptor.get_children():
-                yield child
-                for module_descriptor in yield_descriptor_descendents(child):
-                    yield module_descriptor
-
         for c in self.get_children():
             for s in c.get_children():
                 if s.lms.graded:
@@ -2,8 +2,9 @@ import pymongo
 import sys
 import logging
 import copy
+import threading
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 from fs.osfs import OSFS
 from itertools import repeat
 from path import path
@@ -114,7 +115,8 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
     references to metadata_inheritance_tree
     """
     def __init__(self, modulestore, module_data, default_class, resources_fs,
-                 error_tracker, render_template, cached_metadata=None):
+                 error_tracker, render_template, cached_metadata=None,
+                 reuse_descriptors=False):
         """
         modulestore: the module store that can be used to retrieve additional modules
 
@@ -130,6 +132,9 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
 
         render_template: a function for rendering templates, as per
             MakoDescriptorSystem
+
+        reuse_descriptors: if True, keep the descriptors loaded from
+            module_data, and return the same one every time a location is loaded
         """
         super(CachingDescriptorSystem, self).__init__(self.load_item, resources_fs,
                                                       error_tracker, render_template)
@@ -140,12 +145,24 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
         # define an attribute here as well, even though it's None
         self.course_id = None
         self.cached_metadata = cached_metadata
+        self.descriptors = {} if reuse_descriptors else None
 
     def load_item(self, location):
         """
         Return an XModule instance for the specified location
         """
         location = Location(location)
+        if self.descriptors is None:
+            return self._load_item(location)
+
+        descriptor = self.descriptors.get(location)
+        if descriptor is None:
+            descriptor = self._load_item(location)
+            if location in self.module_data:
+                self.descriptors[location] = descriptor
+        return descriptor
+
+    def _load_item(self, location):
         json_data = self.module_data.get(location)
         if json_data is None:
             module = self.modulestore.get_item(location)
@@ -214,6 +231,78 @@ def location_to_query(location, wildcard=True):
 metadata_cache_key = attrgetter('org', 'course')
 
 
+def course_structure_cache_key(location):
+    return ('course_structure',) + metadata_cache_key(location)
+
+
+def cache_version_key(key):
+    return key + ('version',)
+
+
+class DescriptorTreeCache(object):
+    """
+    The fully loaded descriptor trees of the last `size` courses used, each
+    with the version of its course (see MongoModuleStore.get_course_version)
+    it was loaded at.  A tree is the CachingDescriptorSystem holding the data
+    of all the course's items, which loads each descriptor once.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._trees = OrderedDict()  # key -> (version, tree), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """
+        Return the tree stored under key, or None if there isn't one at version
+        """
+        with self._lock:
+            entry = self._trees.pop(key, None)
+            if entry is None or entry[0] != version:
+                return None
+            self._trees[key] = entry
+            return entry[1]
+
+    def set(self, key, version, tree):
+        with self._lock:
+            self._trees.pop(key, None)
+            self._trees[key] = (version, tree)
+            while len(self._trees) > self.size:
+                self._trees.popitem(last=False)
+
+
+# The categories of items that can have children, and so pass metadata on.
+# note when we add new categories of containers, we have to add them here
+METADATA_INHERITANCE_CONTAINERS = ['course', 'chapter', 'sequential', 'vertical',
+                                   'wrapper', 'problemset', 'conditional', 'randomize']
+
+
+def _compute_inherited_metadata(results_by_url, url, metadata_to_inherit):
+    """
+    Compute the metadata inherited by the descendants of the item at url,
+    from the item records in results_by_url, into metadata_to_inherit
+    """
+    # check for presence of metadata key. Note that a given module may not yet be fully formed.
+    # example: update_item -> update_children -> update_metadata sequence on new item create
+    # if we get called here without update_metadata called first then 'metadata' hasn't been set
+    # as we're not fully transactional at the DB layer. Same comment applies to below key name
+    # check
+    my_metadata = results_by_url[url].get('metadata', {})
+
+    # go through all the children and recurse, but only if we have
+    # in the result set. Remember results will not contain leaf nodes
+    for child in results_by_url[url].get('definition', {}).get('children', []):
+        if child in results_by_url:
+            new_child_metadata = copy.deepcopy(my_metadata)
+            new_child_metadata.update(results_by_url[child].get('metadata', {}))
+            results_by_url[child]['metadata'] = new_child_metadata
+            metadata_to_inherit[child] = new_child_metadata
+            _compute_inherited_metadata(results_by_url, child, metadata_to_inherit)
+        else:
+            # this is likely a leaf node, so let's record what metadata we need to inherit
+            metadata_to_inherit[child] = my_metadata
+
+
 class MongoModuleStore(ModuleStoreBase):
     """
     A Mongodb backed ModuleStore
@@ -224,7 +313,15 @@ class MongoModuleStore(ModuleStoreBase):
                  port=27017, default_class=None,
                  error_tracker=null_error_tracker,
                  user=None, password=None, request_cache=None,
-                 metadata_inheritance_cache_subsystem=None, **kwargs):
+                 metadata_inheritance_cache_subsystem=None,
+                 descriptor_tree_cache_size=0, **kwargs):
+        """
+        descriptor_tree_cache_size: if not 0, how many courses to keep the
+            descriptor trees of in this process, for get_item with depth=None
+            (see DescriptorTreeCache).  The same descriptors are returned to
+            every caller, so they mustn't be changed: this is for read-only
+            uses, like the LMS.
+        """
 
         ModuleStoreBase.__init__(self)
 
@@ -240,6 +337,9 @@ class MongoModuleStore(ModuleStoreBase):
         # Force mongo to report errors, at the expense of performance
         self.collection.safe = True
 
+        # course id (without the run) -> a counter of the writes to its items
+        self.course_versions = self.collection['course_versions']
+
         # Force mongo to maintain an index over _id.* that is in the same order
         # that is used when querying by a location
         self.collection.ensure_index(
@@ -257,19 +357,19 @@ class MongoModuleStore(ModuleStoreBase):
         self.ignore_write_events_on_courses = []
         self.request_cache = request_cache
         self.metadata_inheritance_cache_subsystem = metadata_inheritance_cache_subsystem
-
-    def compute_metadata_inheritance_tree(self, location):
+        # cache key -> (version, data) of the course data last fetched from
+        # the metadata_inheritance_cache_subsystem
+        self._course_data = {}
+        self.descriptor_tree_cache = None
+        if descriptor_tree_cache_size:
+            self.descriptor_tree_cache = DescriptorTreeCache(descriptor_tree_cache_size)
+
+    def _query_metadata_inheritance_records(self, query):
         '''
-        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+        Return (results_by_url, root): the Location, children, and inheritable metadata
+        of the items matching query, by location url, and the url of the course among
+        them (or None)
         '''
-
-        # get all collections in the course, this query should not return any leaf nodes
-        # note this is a bit ugly as when we add new categories of containers, we have to add it here
-        query = {'_id.org': location.org,
-                 '_id.course': location.course,
-                 '_id.category': {'$in': ['course', 'chapter', 'sequential', 'vertical',
-                                          'wrapper', 'problemset', 'conditional', 'randomize']}
-                 }
         # we just want the Location, children, and inheritable metadata
         record_filter = {'_id': 1, 'definition.children': 1}
 
@@ -302,75 +402,184 @@ class MongoModuleStore(ModuleStoreBase):
             if location.category == 'course':
                 root = location.url()
 
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
+        return results_by_url, root
 
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            # check for presence of metadata key. Note that a given module may not yet be fully formed.
-            # example: update_item -> update_children -> update_metadata sequence on new item create
-            # if we get called here without update_metadata called first then 'metadata' hasn't been set
-            # as we're not fully transactional at the DB layer. Same comment applies to below key name
-            # check
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
-                else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
+    def compute_metadata_inheritance_tree(self, location):
+        '''
+        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+        '''
 
+        # get all collections in the course, this query should not return any leaf nodes
+        query = {'_id.org': location.org,
+                 '_id.course': location.course,
+                 '_id.category': {'$in': METADATA_INHERITANCE_CONTAINERS}
+                 }
+        results_by_url, root = self._query_metadata_inheritance_records(query)
+
+        # now traverse the tree and compute down the inherited metadata
+        metadata_to_inherit = {}
         if root is not None:
-            _compute_inherited_metadata(root)
+            _compute_inherited_metadata(results_by_url, root, metadata_to_inherit)
 
         return metadata_to_inherit
 
+    def update_metadata_inheritance_tree(self, tree, location):
+        '''
+        Return tree, a metadata inheritance tree computed by compute_metadata_inheritance_tree,
+        updated for a change to the item at location (to its metadata or children, or its
+        creation or deletion). Only the subtree under location is recomputed.
+
+        Return tree itself if the change doesn't affect it, and None if the whole
+        tree has to be recomputed instead.
+        '''
+        location = Location(location)._replace(revision=None)
+
+        # Leaves don't pass any metadata on, so what their children inherit is unchanged
+        if location.category not in METADATA_INHERITANCE_CONTAINERS:
+            return tree
+        if location.category == 'course':
+            return None
+
+        parent_urls = set(Location(parent)._replace(revision=None).url()
+                          for parent in self.get_parent_locations(location, None))
+        if not parent_urls:
+            # Orphans aren't part of the tree
+            return tree
+        if len(parent_urls) > 1:
+            # What is inherited then depends on the order of the traversal
+            return None
+        parent = Location(parent_urls.pop())
+
+        # Load the records of the subtree under location, a level at a time
+        url = location.url()
+        results_by_url, _ = self._query_metadata_inheritance_records({
+            '_id.org': location.org,
+            '_id.course': location.course,
+            '_id.category': {'$in': METADATA_INHERITANCE_CONTAINERS},
+            '_id.name': {'$in': [location.name, parent.name]},
+        })
+        level = [url]
+        while level:
+            children = [child for level_url in level if level_url in results_by_url
+                        for child in results_by_url[level_url].get('definition', {}).get('children', [])]
+            children = [child for child in children if child not in results_by_url]
+            if not children:
+                break
+            level_results, _ = self._query_metadata_inheritance_records({
+                '_id.org': location.org,
+                '_id.course': location.course,
+                '_id.category': {'$in': METADATA_INHERITANCE_CONTAINERS},
+                '_id.name': {'$in': list(set(Location(child).name for child in children))},
+            })
+            for level_url, result in level_results.iteritems():
+                results_by_url.setdefault(level_url, result)
+            level = children
+
+        if parent.category == 'course':
+            if parent.url() not in results_by_url:
+                return None
+            parent_metadata = results_by_url[parent.url()].get('metadata', {})
+        elif parent.url() in tree:
+            parent_metadata = tree[parent.url()]
+        else:
+            return None
+
+        tree = dict(tree)
+        if url not in results_by_url:
+            # the item was deleted, so it doesn't pass anything on
+            tree[url] = parent_metadata
+            return tree
+
+        metadata = copy.deepcopy(parent_metadata)
+        metadata.update(results_by_url[url].get('metadata', {}))
+        results_by_url[url]['metadata'] = metadata
+        tree[url] = metadata
+        _compute_inherited_metadata(results_by_url, url, tree)
+        return tree
+
     def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
         '''
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
         '''
-        key = metadata_cache_key(location)
-        tree = {}
+        return self._get_cached_course_data(
+            'metadata_inheritance', metadata_cache_key(location),
+            lambda: self.compute_metadata_inheritance_tree(location),
+            force_refresh
+        )
+
+    def _get_cached_course_data(self, cache_name, key, compute, force_refresh=False):
+        '''
+        Return the data for a course stored under key, looking in the request
+        cache and then in the caching subsystem (e.g. memcached) before calling
+        compute() to compute it. Computed data is written back to both caches.
+
+        cache_name: the name of the part of the request cache holding this kind of data
+        '''
+        data = {}
 
         if not force_refresh:
             # see if we are first in the request cache (if present)
-            if self.request_cache is not None and key in self.request_cache.data.get('metadata_inheritance', {}):
-                return self.request_cache.data['metadata_inheritance'][key]
+            if self.request_cache is not None and key in self.request_cache.data.get(cache_name, {}):
+                return self.request_cache.data[cache_name][key]
 
             # then look in any caching subsystem (e.g. memcached)
             if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(key, {})
+                data = self._get_course_data_from_subsystem(key)
             else:
                 logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
 
-        if not tree:
+        if not data:
             # if not in subsystem, or we are on force refresh, then we have to compute
-            tree = self.compute_metadata_inheritance_tree(location)
+            data = compute()
+            self._set_cached_course_data(cache_name, key, data)
+        else:
+            self._set_request_cached_course_data(cache_name, key, data)
 
-            # now write out computed tree to caching subsystem (e.g. memcached), if available
-            if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(key, tree)
+        return data
 
-        # now populate a request_cache, if available. NOTE, we are outside of the
-        # scope of the above if: statement so that after a memcache hit, it'll get
-        # put into the request_cache
+    def _get_course_data_from_subsystem(self, key):
+        '''
+        Return the data for a course stored under key in the caching subsystem.
+
+        Data is stored with a version stamp, which is also stored on its own, so the
+        copy of the data last fetched by this process is reused until it is stale
+        instead of being fetched again.
+        '''
+        version = self.metadata_inheritance_cache_subsystem.get(cache_version_key(key))
+        if version is None:
+            return {}
+
+        local_version, data = self._course_data.get(key, (None, {}))
+        if local_version == version:
+            return data
+
+        stored = self.metadata_inheritance_cache_subsystem.get(key)
+        if not isinstance(stored, dict) or 'version' not in stored:
+            return {}
+        self._course_data[key] = (stored['version'], stored['data'])
+        return stored['data']
+
+    def _set_cached_course_data(self, cache_name, key, data):
+        '''
+        Write out data for a course to the caching subsystem (e.g. memcached), if
+        available, with a new version stamp, and to the request cache
+        '''
+        if self.metadata_inheritance_cache_subsystem is not None:
+            version = uuid4().hex
+            self.metadata_inheritance_cache_subsystem.set(key, {'version': version, 'data': data})
+            self.metadata_inheritance_cache_subsystem.set(cache_version_key(key), version)
+            self._course_data[key] = (version, data)
+
+        self._set_request_cached_course_data(cache_name, key, data)
+
+    def _set_request_cached_course_data(self, cache_name, key, data):
+        # populate a request_cache, if available
         if self.request_cache is not None:
-            # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
+            # we can't assume the cache_name part of the request cache dict has been
             # defined
-            if 'metadata_inheritance' not in self.request_cache.data:
-                self.request_cache.data['metadata_inheritance'] = {}
-            self.request_cache.data['metadata_inheritance'][key] = tree
-
-        return tree
+            if cache_name not in self.request_cache.data:
+                self.request_cache.data[cache_name] = {}
+            self.request_cache.data[cache_name][key] = data
 
     def refresh_cached_metadata_inheritance_tree(self, location):
         """
@@ -381,6 +590,73 @@ class MongoModuleStore(ModuleStoreBase):
         if pseudo_course_id not in self.ignore_write_events_on_courses:
             self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
 
+    def update_cached_metadata_inheritance_tree(self, location):
+        """
+        Update the cached metadata inheritance tree for the org/course combination
+        for location, after the item at location has been changed. Only the part of
+        the tree under location is recomputed, if possible.
+        """
+        pseudo_course_id = '/'.join([location.org, location.course])
+        if pseudo_course_id in self.ignore_write_events_on_courses:
+            return
+        if self.request_cache is None and self.metadata_inheritance_cache_subsystem is None:
+            # nothing is cached, so there's nothing to update
+            return
+
+        tree = self.get_cached_metadata_inheritance_tree(location)
+        updated_tree = self.update_metadata_inheritance_tree(tree, location) if tree else None
+        if updated_tree is None:
+            self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
+        elif updated_tree is not tree:
+            self._set_cached_course_data('metadata_inheritance', metadata_cache_key(location), updated_tree)
+
+    def compute_course_structure(self, location):
+        '''
+        Compute the structure index of the org/course combination for location:
+        a dict with the keys
+
+            'children': location url -> the ordered list of urls of its children
+            'parents': child url -> the list of locations (as dicts) of the items
+                that have it as a child, as returned by get_parent_locations
+
+        It is computed with a single query for the ids and children of all
+        the items in the course, drafts included.
+        '''
+        query = {'_id.org': location.org,
+                 '_id.course': location.course}
+        resultset = self.collection.find(query, {'_id': 1, 'definition.children': 1})
+
+        children = {}
+        parents = {}
+        for result in resultset:
+            item_children = result.get('definition', {}).get('children', [])
+            children[Location(result['_id']).url()] = item_children
+            for child in item_children:
+                parents.setdefault(child, []).append(result['_id'])
+
+        return {'children': children, 'parents': parents}
+
+    def get_cached_course_structure(self, location, force_refresh=False):
+        '''
+        Return the structure index of the org/course combination for location
+        (see compute_course_structure), from the request cache or the caching
+        subsystem if it has already been computed.
+        '''
+        return self._get_cached_course_data(
+            'course_structure', course_structure_cache_key(location),
+            lambda: self.compute_course_structure(location),
+            force_refresh
+        )
+
+    def refresh_cached_course_structure(self, location):
+        """
+        Refresh the cached structure index for the org/course combination
+        for location
+        """
+        pseudo_course_id = '/'.join([location.org, location.course])
+        if pseudo_course_id not in self.ignore_write_events_on_courses:
+            self.get_cached_course_structure(location, force_refresh=True)
+
     def _clean_item_data(self, item):
         """
         Renames the '_id' field in item to 'location'
@@ -433,6 +709,13 @@ class MongoModuleStore(ModuleStoreBase):
         """
         Load an XModuleDescriptor from item, using the children stored in data_cache
         """
+        system = self._descriptor_system(item, data_cache, apply_cached_metadata)
+        return system.load_item(item['location'])
+
+    def _descriptor_system(self, item, data_cache, apply_cached_metadata=True, reuse_descriptors=False):
+        """
+        Return a CachingDescriptorSystem to load item and its descendents in data_cache with
+        """
         data_dir = getattr(item, 'data_dir', item['location']['course'])
         root = self.fs_root / data_dir
 
@@ -455,8 +738,8 @@ class MongoModuleStore(ModuleStoreBase):
             self.error_tracker,
             self.render_template,
             cached_metadata,
+            reuse_descriptors,
         )
-        return system.load_item(item['location'])
 
     def _load_items(self, items, depth=0):
         """
@@ -526,10 +809,68 @@ class MongoModuleStore(ModuleStoreBase):
             calls to get_children() to cache. None indicates to cache all descendents.
         """
         location = Location.ensure_fully_specified(location)
+        if depth is None and location.revision is None and self.descriptor_tree_cache is not None:
+            tree = self._get_descriptor_tree(location)
+            if tree is not None and location in tree.module_data:
+                return tree.load_item(location)
+
         item = self._find_one(location)
         module = self._load_items([item], depth)[0]
         return module
 
+    def _get_descriptor_tree(self, location):
+        """
+        Return the descriptor tree (see DescriptorTreeCache) of the course of
+        location, loading it if the cached one is missing or out of date, or
+        None if there isn't exactly one course for the org/course combination
+        """
+        # the version is read before the items, so a tree loaded while the
+        # course is changed is only ever stored under the older version
+        version = self.get_course_version(location)
+        key = metadata_cache_key(location)
+        tree = self.descriptor_tree_cache.get(key, version)
+        if tree is None:
+            courses = list(self.collection.find(location_to_query(
+                Location('i4x', location.org, location.course, 'course', None), wildcard=True)))
+            if len(courses) != 1:
+                return None
+            data_cache = self._cache_children(courses, depth=None)
+            tree = self._descriptor_system(courses[0], data_cache, reuse_descriptors=True)
+            self.descriptor_tree_cache.set(key, version, tree)
+        return tree
+
+    def get_course_version(self, location):
+        """
+        Return the version of the org/course combination for location: a
+        counter which goes up with every write to the course's items.  It is
+        only read once per request.
+        """
+        pseudo_course_id = '/'.join([location.org, location.course])
+        versions = None
+        if self.request_cache is not None:
+            versions = self.request_cache.data.setdefault('course_versions', {})
+            if pseudo_course_id in versions:
+                return versions[pseudo_course_id]
+
+        record = self.course_versions.find_one({'_id': pseudo_course_id})
+        version = record['version'] if record is not None else 0
+        if versions is not None:
+            versions[pseudo_course_id] = version
+        return version
+
+    def bump_course_version(self, pseudo_course_id):
+        """
+        Record a write to the items of the course pseudo_course_id (org/course)
+        """
+        self.course_versions.update(
+            {'_id': pseudo_course_id},
+            {'$inc': {'version': 1}},
+            upsert=True,
+            safe=self.collection.safe
+        )
+        if self.request_cache is not None:
+            self.request_cache.data.get('course_versions', {}).pop(pseudo_course_id, None)
+
     def get_instance(self, course_id, location, depth=0):
         """
         TODO (vshnayder): implement policy tracking in mongo.
@@ -591,13 +932,19 @@ class MongoModuleStore(ModuleStoreBase):
         except pymongo.errors.DuplicateKeyError:
             raise DuplicateItemError(location)
 
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # recompute (and update) the structure index and metadata inheritance tree which are cached
+        self.refresh_cached_course_structure(Location(location))
+        self.update_cached_metadata_inheritance_tree(Location(location))
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
         return item
 
     def fire_updated_modulestore_signal(self, course_id, location):
+        """
+        Record that the course course_id (org/course) was written to at
+        location, and tell the receivers of the modulestore_update_signal
+        """
+        self.bump_course_version(course_id)
         if self.modulestore_update_signal is not None:
             self.modulestore_update_signal.send(self, modulestore=self, course_id=course_id,
                                                 location=location)
@@ -659,6 +1006,7 @@ class MongoModuleStore(ModuleStoreBase):
         """
 
         self._update_single_item(location, {'definition.data': data})
+        self.bump_course_version(get_course_id_no_run(Location(location)))
 
     def update_children(self, location, children):
         """
@@ -670,8 +1018,9 @@ class MongoModuleStore(ModuleStoreBase):
         """
 
         self._update_single_item(location, {'definition.children': children})
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # recompute (and update) the structure index and metadata inheritance tree which are cached
+        self.refresh_cached_course_structure(Location(location))
+        self.update_cached_metadata_inheritance_tree(Location(location))
         # fire signal that we've written to DB
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
@@ -699,7 +1048,7 @@ class MongoModuleStore(ModuleStoreBase):
 
         self._update_single_item(location, {'metadata': metadata})
         # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(loc)
+        self.update_cached_metadata_inheritance_tree(loc)
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def delete_item(self, location, delete_all_versions=False):
@@ -722,8 +1071,9 @@ class MongoModuleStore(ModuleStoreBase):
         # Must include this to avoid the django debug toolbar (which defines the deprecated "safe=False")
         # from overriding our default value set in the init method.
         self.collection.remove({'_id': Location(location).dict()}, safe=self.collection.safe)
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # recompute (and update) the structure index and metadata inheritance tree which are cached
+        self.refresh_cached_course_structure(Location(location))
+        self.update_cached_metadata_inheritance_tree(Location(location))
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def get_parent_locations(self, location, course_id):
@@ -731,9 +1081,15 @@ class MongoModuleStore(ModuleStoreBase):
         course.  Needed for path_to_location().
         '''
         location = Location.ensure_fully_specified(location)
-        items = self.collection.find({'definition.children': location.url()},
-                                     {'_id': True})
-        return [i['_id'] for i in items]
+        if self.request_cache is None and self.metadata_inheritance_cache_subsystem is None:
+            # Without anywhere to keep the structure index, don't compute
+            # it for every lookup
+            items = self.collection.find({'definition.children': location.url()},
+                                         {'_id': True})
+            return [i['_id'] for i in items]
+
+        structure = self.get_cached_course_structure(location)
+        return list(structure['parents'].get(location.url(), []))
 
     def get_errored_courses(self):
         """
@@ -1,9 +1,104 @@
+from contextlib import contextmanager
+
 from xmodule.contentstore.content import StaticContent
 from xmodule.modulestore import Location
-from xmodule.modulestore.mongo import MongoModuleStore
-
+from xmodule.modulestore.mongo import MongoModuleStore, location_to_query, get_course_id_no_run
+
+# How many modules (or assets) are written or removed with one query
+BATCH_SIZE = 100
+
+
+def _report(progress, what, done, total):
+    if progress is not None:
+        progress(what, done, total)
+
+
+def _replace_course(location, dest_location):
+    """
+    Return the location of a module moved to the tag, org and course of dest_location
+    """
+    return location._replace(tag=dest_location.tag, org=dest_location.org, course=dest_location.course)
+
+
+def _replace_content_course(location, dest_location):
+    """
+    Return the location of an asset or thumbnail moved to the org and course of
+    dest_location, keeping its own (c4x) tag
+    """
+    return location._replace(org=dest_location.org, course=dest_location.course)
+
+
+@contextmanager
+def _bulk_write(modulestore, location):
+    """
+    Don't update the cached metadata inheritance tree and structure index of
+    the course at location for each write, but only once when done, and fire
+    a single modulestore update signal.
+    """
+    pseudo_course_id = '/'.join([location.org, location.course])
+    suppressing = pseudo_course_id not in modulestore.ignore_write_events_on_courses
+    if suppressing:
+        modulestore.ignore_write_events_on_courses.append(pseudo_course_id)
+    try:
+        yield
+    finally:
+        if suppressing:
+            modulestore.ignore_write_events_on_courses.remove(pseudo_course_id)
+            modulestore.refresh_cached_course_structure(location)
+            modulestore.refresh_cached_metadata_inheritance_tree(location)
+            modulestore.fire_updated_modulestore_signal(get_course_id_no_run(location), location)
+
+
+def _clone_modules(modulestore, source_location, dest_location, progress=None):
+    """
+    Copy the documents of the modules of the course at source_location to
+    dest_location, BATCH_SIZE at a time, replacing the ones already there
+    """
+    query = location_to_query([source_location.tag, source_location.org, source_location.course, None, None, None])
+    total = modulestore.collection.find(query).count()
+
+    def write(batch):
+        ids = [item['_id'] for item in batch]
+        modulestore.collection.remove({'_id': {'$in': ids}}, safe=modulestore.collection.safe)
+        modulestore.collection.insert(batch, safe=modulestore.collection.safe)
+
+    batch = []
+    done = 0
+    for item in modulestore.collection.find(query):
+        location = _replace_course(Location(item['_id']), dest_location)
+        if location.category == 'course':
+            # on the course module we also have to update the module name
+            location = location._replace(name=dest_location.name)
+        # the _id is rebuilt rather than edited, so its fields stay in the order they're queried in
+        item['_id'] = location.dict()
 
-def clone_course(modulestore, contentstore, source_location, dest_location, delete_original=False):
+        # repoint children
+        definition = item.get('definition', {})
+        if definition.get('children'):
+            definition['children'] = [_replace_course(Location(child), dest_location).url()
+                                      for child in definition['children']]
+
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            write(batch)
+            done += len(batch)
+            batch = []
+            _report(progress, 'modules', done, total)
+
+    if batch:
+        write(batch)
+        done += len(batch)
+        _report(progress, 'modules', done, total)
+
+
+def clone_course(modulestore, contentstore, source_location, dest_location, delete_original=False, progress=None):
+    """
+    Copy the modules and assets of the course at source_location into the
+    empty course at dest_location.
+
+    progress: called like progress(what, done, total) as things get copied,
+    what being 'modules', 'thumbnails' or 'assets'
+    """
     # first check to see if the modulestore is Mongo backed
     if not isinstance(modulestore, MongoModuleStore):
         raise Exception("Expected a MongoModuleStore in the runtime. Aborting....")
@@ -32,77 +127,61 @@ def clone_course(modulestore, contentstore, source_location, dest_location, dele
     if not modulestore.has_item(source_location):
         raise Exception("Cannot find a course at {0}. Aborting".format(source_location))
 
-    # Get all modules under this namespace which is (tag, org, course) tuple
-
-    modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, None])
-
-    for module in modules:
-        original_loc = Location(module.location)
-
-        if original_loc.category != 'course':
-            module.location = module.location._replace(tag=dest_location.tag, org=dest_location.org,
-                                                       course=dest_location.course)
-        else:
-            # on the course module we also have to update the module name
-            module.location = module.location._replace(tag=dest_location.tag, org=dest_location.org,
-                                                       course=dest_location.course, name=dest_location.name)
-
-        print "Cloning module {0} to {1}....".format(original_loc, module.location)
-
-        modulestore.update_item(module.location, module._model_data._kvs._data)
-
-        # repoint children
-        if module.has_children:
-            new_children = []
-            for child_loc_url in module.children:
-                child_loc = Location(child_loc_url)
-                child_loc = child_loc._replace(
-                    tag=dest_location.tag,
-                    org=dest_location.org,
-                    course=dest_location.course
-                )
-                new_children.append(child_loc.url())
-
-            modulestore.update_children(module.location, new_children)
-
-        # save metadata
-        modulestore.update_metadata(module.location, module._model_data._kvs._metadata)
-
-    # now iterate through all of the assets and clone them
-    # first the thumbnails
-    thumbs = contentstore.get_all_content_thumbnails_for_course(source_location)
-    for thumb in thumbs:
-        thumb_loc = Location(thumb["_id"])
-        content = contentstore.find(thumb_loc)
-        content.location = content.location._replace(org=dest_location.org,
-                                                     course=dest_location.course)
-
-        print "Cloning thumbnail {0} to {1}".format(thumb_loc, content.location)
+    with _bulk_write(modulestore, dest_location):
+        _clone_modules(modulestore, source_location, dest_location, progress)
+
+    # now clone all of the assets, first the thumbnails, then the assets, updating their
+    # pointers to the thumbnails
+    for what, get_all_content in (('thumbnails', contentstore.get_all_content_thumbnails_for_course),
+                                  ('assets', contentstore.get_all_content_for_course)):
+        sources = get_all_content(source_location)
+        dest_locations = [_replace_content_course(Location(source['_id']), dest_location) for source in sources]
+        contentstore.delete_many([StaticContent.get_id_from_location(loc) for loc in dest_locations])
+
+        for done, (source, content_location) in enumerate(zip(sources, dest_locations), 1):
+            fields = {}
+            if source.get('thumbnail_location') is not None:
+                fields['thumbnail_location'] = _replace_content_course(Location(source['thumbnail_location']),
+                                                                       dest_location)
+            contentstore.copy(source, content_location, **fields)
+            _report(progress, what, done, len(sources))
 
-        contentstore.save(content)
-
-    # now iterate through all of the assets, also updating the thumbnail pointer
-
-    assets = contentstore.get_all_content_for_course(source_location)
-    for asset in assets:
-        asset_loc = Location(asset["_id"])
-        content = contentstore.find(asset_loc)
-        content.location = content.location._replace(org=dest_location.org,
-                                                     course=dest_location.course)
+    return True
 
-        # be sure to update the pointer to the thumbnail
-        if content.thumbnail_location is not None:
-            content.thumbnail_location = content.thumbnail_location._replace(org=dest_location.org,
-                                                                             course=dest_location.course)
 
-        print "Cloning asset {0} to {1}".format(asset_loc, content.location)
+def _delete_modules(modulestore, source_location, commit, progress=None):
+    """
+    Delete the modules of the course at source_location, BATCH_SIZE at a time,
+    saving the course module itself for last.  Unless commit is True, only
+    print what would be deleted.
+    """
+    query = location_to_query([source_location.tag, source_location.org, source_location.course, None, None, None])
+    query['_id.category'] = {'$ne': 'course'}
+    # the ids are rebuilt, so their fields are in the order they're stored in
+    locations = [Location(item['_id']) for item in modulestore.collection.find(query, fields=['_id'])]
+    for done in range(0, len(locations), BATCH_SIZE):
+        batch = locations[done:done + BATCH_SIZE]
+        for location in batch:
+            print "Deleting {0}...".format(location)
+        if commit:
+            modulestore.collection.remove({'_id': {'$in': [location.dict() for location in batch]}},
+                                          safe=modulestore.collection.safe)
+        _report(progress, 'modules', done + len(batch), len(locations))
 
-        contentstore.save(content)
+    # finally delete the top-level course module itself
+    print "Deleting {0}...".format(source_location)
+    if commit:
+        modulestore.collection.remove({'_id': Location(source_location).dict()},
+                                      safe=modulestore.collection.safe)
 
-    return True
 
+def delete_course(modulestore, contentstore, source_location, commit=False, progress=None):
+    """
+    Delete the course at source_location, its modules and its assets, printing
+    what is deleted.  Unless commit is True, nothing actually is.
 
-def delete_course(modulestore, contentstore, source_location, commit=False):
+    progress: called like progress(what, done, total) as things get deleted
+    """
     # first check to see if the modulestore is Mongo backed
     if not isinstance(modulestore, MongoModuleStore):
         raise Exception("Expected a MongoModuleStore in the runtime. Aborting....")
@@ -111,37 +190,24 @@ def delete_course(modulestore, contentstore, source_location, commit=False):
     if not modulestore.has_item(source_location):
         raise Exception("Cannot find a course at {0}. Aborting".format(source_location))
 
-    # first delete all of the thumbnails
-    thumbs = contentstore.get_all_content_thumbnails_for_course(source_location)
-    for thumb in thumbs:
-        thumb_loc = Location(thumb["_id"])
-        id = StaticContent.get_id_from_location(thumb_loc)
-        print "Deleting {0}...".format(id)
-        if commit:
-            contentstore.delete(id)
-
-    # then delete all of the assets
-    assets = contentstore.get_all_content_for_course(source_location)
-    for asset in assets:
-        asset_loc = Location(asset["_id"])
-        id = StaticContent.get_id_from_location(asset_loc)
-        print "Deleting {0}...".format(id)
-        if commit:
-            contentstore.delete(id)
-
-    # then delete all course modules
-    modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, None])
-
-    for module in modules:
-        if module.category != 'course':   # save deleting the course module for last
-            print "Deleting {0}...".format(module.location)
+    # first delete all of the thumbnails, then all of the assets
+    for what, get_all_content in (('thumbnails', contentstore.get_all_content_thumbnails_for_course),
+                                  ('assets', contentstore.get_all_content_for_course)):
+        ids = [StaticContent.get_id_from_location(Location(item["_id"])) for item in get_all_content(source_location)]
+        for done in range(0, len(ids), BATCH_SIZE):
+            batch = ids[done:done + BATCH_SIZE]
+            for id in batch:
+                print "Deleting {0}...".format(id)
             if commit:
-                modulestore.delete_item(module.location)
+                contentstore.delete_many(batch)
+            _report(progress, what, done + len(batch), len(ids))
 
-    # finally delete the top-level course module itself
-    print "Deleting {0}...".format(source_location)
+    # then delete all course modules, without updating the course's caches
+    # unless something really is deleted
     if commit:
-        modulestore.delete_item(source_location)
+        with _bulk_write(modulestore, source_location):
+            _delete_modules(modulestore, source_location, commit, progress)
+    else:
+        _delete_modules(modulestore, source_location, commit, progress)
 
     return True
-
@@ -1,12 +1,14 @@
 import pymongo
 
 from mock import Mock
-from nose.tools import assert_equals, assert_raises, assert_not_equals, with_setup, assert_false
+from path import path
+from nose.tools import assert_equals, assert_raises, assert_not_equals, with_setup, assert_false, assert_true
 from pprint import pprint
 
 from xmodule.modulestore import Location
 from xmodule.modulestore.mongo import MongoModuleStore
-from xmodule.modulestore.xml_importer import import_from_xml
+from xmodule.modulestore.xml import XMLModuleStore
+from xmodule.modulestore.xml_importer import import_from_xml, import_module
 from xmodule.templates import update_templates
 
 from .test_modulestore import check_path_to_location
@@ -22,6 +24,26 @@ DEFAULT_CLASS = 'xmodule.raw_module.RawDescriptor'
 RENDER_TEMPLATE = lambda t_n, d, ctx=None, nsp='main': ''
 
 
+def import_one_module_at_a_time(store, data_dir, course_dirs):
+    '''
+    Import courses the way import_from_xml used to, writing each module with
+    import_module, the course module first
+    '''
+    xml_module_store = XMLModuleStore(data_dir, default_class=DEFAULT_CLASS, course_dirs=course_dirs)
+    for modules in xml_module_store.modules.itervalues():
+        [course] = [module for module in modules.itervalues() if module.category == 'course']
+        if not course.tabs:
+            course.tabs = [{"type": "courseware"},
+                           {"type": "course_info", "name": "Course Info"},
+                           {"type": "discussion", "name": "Discussion"},
+                           {"type": "wiki", "name": "Wiki"}]
+        course_data_path = path(data_dir) / course.data_dir
+        import_module(course, store, course_data_path, None)
+        for module in modules.itervalues():
+            if module.category != 'course':
+                import_module(module, store, course_data_path, None)
+
+
 class TestMongoModuleStore(object):
     '''Tests!'''
     @classmethod
@@ -113,3 +135,77 @@ class TestMongoModuleStore(object):
                 course.location.org == 'edx' and course.location.course == 'templates',
                 '{0} is a template course'.format(course)
             )
+
+    def test_course_structure(self):
+        '''Make sure the structure index agrees with the items in the db'''
+        structure = self.store.compute_course_structure(Location("i4x://edX/toy/course/2012_Fall"))
+        for children in structure['children'].values():
+            for child in children:
+                items = self.connection[DB][COLLECTION].find({'definition.children': child}, {'_id': True})
+                assert_equals(
+                    sorted(Location(parent).url() for parent in structure['parents'][child]),
+                    sorted(Location(i['_id']).url() for i in items)
+                )
+
+    def test_path_to_location_with_structure_cache(self):
+        '''Make sure that path_to_location works when parents come from the structure index'''
+        self.store.request_cache = Mock(data={})
+        try:
+            check_path_to_location(self.store)
+            assert_false(self.store.request_cache.data['course_structure'] == {})
+        finally:
+            self.store.request_cache = None
+
+    def test_update_metadata_inheritance_tree(self):
+        '''Make sure that recomputing a subtree agrees with computing the whole tree'''
+        course_location = Location("i4x://edX/toy/course/2012_Fall")
+        tree = self.store.compute_metadata_inheritance_tree(course_location)
+        assert_not_equals(tree, {})
+
+        for url in tree:
+            assert_equals(self.store.update_metadata_inheritance_tree(tree, Location(url)), tree)
+
+        assert_equals(self.store.update_metadata_inheritance_tree(tree, course_location), None)
+
+    def test_import_matches_import_module(self):
+        '''Make sure that importing writes the modules the way import_module, one at a time, does'''
+        courses = ['toy', 'full']     # (full has static tabs)
+        collections = [COLLECTION + '_legacy', COLLECTION + '_serial', COLLECTION + '_pipelined']
+        try:
+            stores = [MongoModuleStore(HOST, DB, collection, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS)
+                      for collection in collections]
+            import_one_module_at_a_time(stores[0], DATA_DIR, courses)
+            import_from_xml(stores[1], DATA_DIR, courses, workers=1)
+            import_from_xml(stores[2], DATA_DIR, courses)
+
+            for course in courses:
+                query = {'_id.org': 'edX', '_id.course': course}
+                legacy, serial, pipelined = [
+                    dict((Location(item['_id']).url(), item) for item in store.collection.find(query))
+                    for store in stores
+                ]
+                assert_not_equals(legacy, {})
+                assert_equals(legacy, serial)
+                assert_equals(legacy, pipelined)
+        finally:
+            for collection in collections:
+                self.connection[DB].drop_collection(collection)
+
+    def test_descriptor_tree_cache(self):
+        '''Make sure that deep trees are reused until the course changes'''
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+                                 descriptor_tree_cache_size=1)
+        course_location = Location("i4x://edX/toy/course/2012_Fall")
+        course = store.get_item(course_location, depth=None)
+        assert_true(store.get_item(course_location, depth=None) is course)
+
+        # items in the course come from the same tree
+        chapter = store.get_item(Location("i4x://edX/toy/chapter/Overview"), depth=None)
+        assert_true(any(child is chapter for child in course.get_children()))
+
+        store.bump_course_version('edX/toy')
+        assert_false(store.get_item(course_location, depth=None) is course)
+
+        # only one tree is kept
+        store.get_item(Location("i4x://edX/simple/course/2012_Fall"), depth=None)
+        assert_equals(store.descriptor_tree_cache.get(('edX', 'toy'), store.get_course_version(course_location)), None)
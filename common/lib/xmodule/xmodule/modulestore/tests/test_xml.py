@@ -1,3 +1,10 @@
+import os
+import shutil
+import tempfile
+
+from mock import patch
+from nose.tools import assert_equals, assert_true, assert_false
+
 from xmodule.modulestore import Location
 from xmodule.modulestore.xml import XMLModuleStore
 from xmodule.modulestore.xml_importer import import_from_xml
@@ -15,3 +22,38 @@ class TestXMLModuleStore(object):
         print "finished import"
 
         check_path_to_location(modulestore)
+
+    def test_snapshot(self):
+        """Courses that haven't changed are loaded from their snapshots"""
+        snapshot_dir = tempfile.mkdtemp()
+        try:
+            parsed = XMLModuleStore(DATA_DIR, course_dirs=['toy', 'simple'], snapshot_dir=snapshot_dir)
+            assert_equals(len(os.listdir(snapshot_dir)), 2)
+
+            with patch.object(XMLModuleStore, 'load_course', side_effect=AssertionError("parsed the xml")):
+                modulestore = XMLModuleStore(DATA_DIR, course_dirs=['toy', 'simple'], snapshot_dir=snapshot_dir)
+
+            for course_id, modules in parsed.modules.items():
+                assert_equals(set(modules), set(modulestore.modules[course_id]))
+                for location, descriptor in modules.items():
+                    restored = modulestore.modules[course_id][location]
+                    assert_equals(type(descriptor), type(restored))
+                    assert_equals(descriptor._model_data, restored._model_data)
+            assert_equals(
+                [course.id for course in parsed.get_courses()],
+                [course.id for course in modulestore.get_courses()]
+            )
+            check_path_to_location(modulestore)
+        finally:
+            shutil.rmtree(snapshot_dir)
+
+    def test_lazy_loading(self):
+        """Lazy stores load a course when something in it is asked for"""
+        modulestore = XMLModuleStore(DATA_DIR, course_dirs=['toy', 'simple'], lazy=True)
+        assert_false(modulestore.courses)
+
+        modulestore.get_instance('edX/toy/2012_Fall', Location('i4x://edX/toy/chapter/Overview'))
+        assert_equals(modulestore.courses.keys(), ['toy'])
+
+        assert_equals(len(modulestore.get_courses()), 2)
+        assert_true(modulestore.has_item(Location('i4x://edX/simple/course/2012_Fall')))
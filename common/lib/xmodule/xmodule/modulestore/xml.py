@@ -5,6 +5,7 @@ import os
 import re
 import sys
 import glob
+import threading
 
 from collections import defaultdict
 from cStringIO import StringIO
@@ -21,7 +22,7 @@ from xmodule.x_module import XModuleDescriptor, XMLParsingSystem
 
 from xmodule.html_module import HtmlDescriptor
 
-from . import ModuleStoreBase, Location
+from . import ModuleStoreBase, Location, xml_snapshot
 from .exceptions import ItemNotFoundError
 from .inheritance import compute_inherited_metadata
 
@@ -252,7 +253,8 @@ class XMLModuleStore(ModuleStoreBase):
     """
     An XML backed ModuleStore
     """
-    def __init__(self, data_dir, default_class=None, course_dirs=None, load_error_modules=True):
+    def __init__(self, data_dir, default_class=None, course_dirs=None, load_error_modules=True,
+                 snapshot_dir=None, lazy=False):
         """
         Initialize an XMLModuleStore from data_dir
 
@@ -263,6 +265,16 @@ class XMLModuleStore(ModuleStoreBase):
 
         course_dirs: If specified, the list of course_dirs to load. Otherwise,
             load all course dirs
+
+        snapshot_dir: If specified, a directory to keep snapshots of the
+            loaded courses in (see xml_snapshot).  A course whose directory
+            hasn't changed since its snapshot was saved is loaded from it,
+            instead of from its xml.
+
+        lazy: If True, only read each course's id now, and load a course the
+            first time something in it is asked for.  Until everything is
+            loaded (get_courses() does that), self.modules and self.courses
+            only have the courses loaded so far.
         """
         ModuleStoreBase.__init__(self)
 
@@ -272,6 +284,7 @@ class XMLModuleStore(ModuleStoreBase):
         self.errored_courses = {}  # course_dir -> errorlog, for dirs that failed to load
 
         self.load_error_modules = load_error_modules
+        self.snapshot_dir = snapshot_dir
 
         if default_class is None:
             self.default_class = None
@@ -290,13 +303,67 @@ class XMLModuleStore(ModuleStoreBase):
         if course_dirs is None:
             course_dirs = sorted([d for d in os.listdir(self.data_dir) if
                                   os.path.exists(self.data_dir / d / "course.xml")])
+        self._unloaded_course_dirs = {}  # course_id -> [course_dir], for lazy loading
+        self._load_lock = threading.RLock()
         for course_dir in course_dirs:
-            self.try_load_course(course_dir)
+            course_id = self.read_course_id(course_dir) if lazy else None
+            if course_id is None:
+                self.try_load_course(course_dir)
+            else:
+                self._unloaded_course_dirs.setdefault(course_id, []).append(course_dir)
+        self._all_loaded = not self._unloaded_course_dirs
+
+    def read_course_id(self, course_dir):
+        """
+        Return the id of the course in course_dir, from the attributes of
+        its course.xml, or None if they don't say (or can't be read).
+        """
+        try:
+            with open(self.data_dir / course_dir / "course.xml") as course_file:
+                course_data = etree.parse(
+                    StringIO(clean_out_mako_templating(course_file.read())),
+                    parser=edx_xml_parser
+                ).getroot()
+        except (IOError, etree.XMLSyntaxError):
+            return None
+
+        url_name = course_data.get('url_name', course_data.get('slug'))
+        if not url_name and course_data.get('name'):
+            url_name = Location.clean(course_data.get('name'))
+        if not url_name:
+            return None
+        return CourseDescriptor.make_id(
+            course_data.get('org', 'edx'), course_data.get('course', course_dir), url_name)
+
+    def _load_courses(self, course_id=None):
+        """
+        Load the courses not loaded yet (see lazy) with course_id, or all of
+        them if course_id is None
+        """
+        if self._all_loaded:
+            return
+        with self._load_lock:
+            if course_id is None:
+                course_ids = self._unloaded_course_dirs.keys()
+            else:
+                course_ids = [course_id]
+            for unloaded_id in course_ids:
+                for course_dir in self._unloaded_course_dirs.pop(unloaded_id, []):
+                    self.try_load_course(course_dir)
+            if not self._unloaded_course_dirs:
+                self._all_loaded = True
 
     def try_load_course(self, course_dir):
         '''
         Load a course, keeping track of errors as we go along.
         '''
+        snapshot_key = None
+        if self.snapshot_dir is not None:
+            course_descriptor, snapshot_key = self._load_course_snapshot(course_dir)
+            if course_descriptor is not None:
+                self.courses[course_dir] = course_descriptor
+                return
+
         # Special-case code here, since we don't have a location for the
         # course before it loads.
         # So, make a tracker to track load-time errors, then put in the right
@@ -314,10 +381,37 @@ class XMLModuleStore(ModuleStoreBase):
             self.courses[course_dir] = course_descriptor
             self._location_errors[course_descriptor.location] = errorlog
             self.parent_trackers[course_descriptor.id].make_known(course_descriptor.location)
+            if snapshot_key is not None:
+                self._save_course_snapshot(course_dir, course_descriptor, snapshot_key)
         else:
             # Didn't load course.  Instead, save the errors elsewhere.
             self.errored_courses[course_dir] = errorlog
 
+    def _load_course_snapshot(self, course_dir):
+        """
+        Return (the course descriptor from the snapshot of course_dir, or None
+        if there isn't a current one, the key of the current snapshot).  The
+        key is None if it can't be computed.
+        """
+        key = None
+        try:
+            key = xml_snapshot.snapshot_key(self, course_dir)
+            data = xml_snapshot.read_snapshot(self.snapshot_dir, course_dir, key)
+            if data is not None:
+                course_descriptor = xml_snapshot.load_course(self, course_dir, data)
+                log.debug('Loaded course %s from its snapshot', course_dir)
+                return course_descriptor, key
+        except Exception:
+            log.exception("Couldn't load the snapshot of course %s, loading its xml", course_dir)
+        return None, key
+
+    def _save_course_snapshot(self, course_dir, course_descriptor, key):
+        try:
+            data = xml_snapshot.dump_course(self, course_dir, course_descriptor)
+            xml_snapshot.write_snapshot(self.snapshot_dir, course_dir, key, data)
+        except Exception:
+            log.warning("Couldn't save a snapshot of course %s", course_dir, exc_info=True)
+
     def __unicode__(self):
         '''
         String representation - for debugging
@@ -492,6 +586,7 @@ class XMLModuleStore(ModuleStoreBase):
         location: Something that can be passed to Location
         """
         location = Location(location)
+        self._load_courses(course_id)
         try:
             return self.modules[course_id][location]
         except KeyError:
@@ -502,6 +597,7 @@ class XMLModuleStore(ModuleStoreBase):
         Returns True if location exists in this ModuleStore.
         """
         location = Location(location)
+        self._load_courses()
         return any(location in course_modules for course_modules in self.modules.values())
 
     def get_item(self, location, depth=0):
@@ -529,6 +625,7 @@ class XMLModuleStore(ModuleStoreBase):
                 if all(goal is None or goal == value for goal, value in zip(location, mod_loc)):
                     items.append(module)
 
+        self._load_courses(course_id)
         if course_id is None:
             for _, modules in self.modules.iteritems():
                 _add_get_items(self, location, modules)
@@ -542,13 +639,26 @@ class XMLModuleStore(ModuleStoreBase):
         Returns a list of course descriptors.  If there were errors on loading,
         some of these may be ErrorDescriptors instead.
         """
+        self._load_courses()
         return self.courses.values()
 
+    def get_course(self, course_id):
+        """
+        Returns the course descriptor for course_id, or None.  Only loads
+        that course, if the store is lazy.
+        """
+        self._load_courses(course_id)
+        for course in self.courses.values():
+            if course.id == course_id:
+                return course
+        return None
+
     def get_errored_courses(self):
         """
         Return a dictionary of course_dir -> [(msg, exception_str)], for each
         course_dir where course loading failed.
         """
+        self._load_courses()
         return dict((k, self.errored_courses[k].errors) for k in self.errored_courses)
 
     def update_item(self, location, data):
@@ -589,6 +699,7 @@ class XMLModuleStore(ModuleStoreBase):
         be empty if there are no parents.
         '''
         location = Location.ensure_fully_specified(location)
+        self._load_courses(course_id)
         if not self.parent_trackers[course_id].is_known(location):
             raise ItemNotFoundError("{0} not in {1}".format(location, course_id))
 
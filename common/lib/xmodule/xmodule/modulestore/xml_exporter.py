@@ -1,24 +1,112 @@
 import logging
+import os
+import tarfile
+import time
+import zlib
 from xmodule.modulestore import Location
 from xmodule.modulestore.inheritance import own_metadata
+from fs.memoryfs import MemoryFS
 from fs.osfs import OSFS
 from json import dumps
 
 
 def export_to_xml(modulestore, contentstore, course_location, root_dir, course_dir, draft_modulestore=None):
-
-    course = modulestore.get_item(course_location)
-
     fs = OSFS(root_dir)
     export_fs = fs.makeopendir(course_dir)
 
-    xml = course.export_to_xml(export_fs)
-    with export_fs.open('course.xml', 'w') as course_xml:
-        course_xml.write(xml)
+    export_modules(modulestore, course_location, export_fs, draft_modulestore)
 
     # export the static assets
     contentstore.export_all_for_course(course_location, root_dir + '/' + course_dir + '/static/')
 
+
+def export_to_tar_gz(modulestore, contentstore, course_location, course_dir, draft_modulestore=None):
+    '''
+    Export the course like export_to_xml, but as a .tar.gz archive of course_dir,
+    yielded a piece at a time as it is made.  The XML is written in memory and the
+    assets are read from the contentstore a chunk at a time, so nothing is written
+    to disk, and no asset is ever held in memory whole.
+    '''
+    export_fs = MemoryFS()
+    export_modules(modulestore, course_location, export_fs, draft_modulestore)
+
+    def files():
+        for file_path in export_fs.walkfiles():
+            data = export_fs.getcontents(file_path)
+            yield course_dir + file_path, len(data), [data]
+
+        for asset in contentstore.get_all_content_for_course(course_location):
+            content = contentstore.find(Location(asset['_id']), as_stream=True)
+            asset_dir = os.path.dirname(content.import_path) if content.import_path is not None else ''
+            asset_path = os.path.join(course_dir, 'static', asset_dir, content.name)
+            yield asset_path, content.length, content.stream_data()
+
+    return tar_gz(files())
+
+
+def tar_gz(files, piece_size=64 * 1024):
+    '''
+    Yield a .tar.gz archive of files, in pieces of about piece_size bytes.
+
+    files: (path, size, chunks) for each file in the archive, chunks being an
+        iterable of the file's data
+    '''
+    pieces = []
+    buffered = 0
+    for piece in _tar_gz(files):
+        pieces.append(piece)
+        buffered += len(piece)
+        if buffered >= piece_size:
+            yield ''.join(pieces)
+            pieces = []
+            buffered = 0
+    if pieces:
+        yield ''.join(pieces)
+
+
+def _tar_gz(files):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip format
+    mtime = time.time()
+    offset = 0
+
+    for file_path, size, chunks in files:
+        info = tarfile.TarInfo(file_path)
+        info.size = size
+        info.mtime = mtime
+        info.mode = 0644
+        header = info.tobuf(tarfile.GNU_FORMAT, encoding='utf-8')
+        offset += len(header)
+        yield compressor.compress(header)
+
+        written = 0
+        for chunk in chunks:
+            written += len(chunk)
+            yield compressor.compress(chunk)
+        if written != size:
+            raise IOError("{0} has {1} bytes instead of {2}".format(file_path, written, size))
+
+        # the data is padded to a whole block
+        padding = -size % tarfile.BLOCKSIZE
+        offset += size + padding
+        yield compressor.compress(tarfile.NUL * padding)
+
+    # two empty blocks end the archive, which is padded to a whole record
+    end = 2 * tarfile.BLOCKSIZE
+    end += -(offset + end) % tarfile.RECORDSIZE
+    yield compressor.compress(tarfile.NUL * end)
+    yield compressor.flush()
+
+
+def export_modules(modulestore, course_location, export_fs, draft_modulestore=None):
+    '''
+    Export the XML of the course at course_location (everything but its assets) into export_fs
+    '''
+    course = modulestore.get_item(course_location)
+
+    xml = course.export_to_xml(export_fs)
+    with export_fs.open('course.xml', 'w') as course_xml:
+        course_xml.write(xml)
+
     # export the static tabs
     export_extra_content(export_fs, modulestore, course_location, 'static_tab', 'tabs', '.html')
 
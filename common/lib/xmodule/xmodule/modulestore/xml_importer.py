@@ -1,6 +1,8 @@
 import logging
 import os
 import mimetypes
+import threading
+from multiprocessing.pool import ThreadPool
 from lxml.html import rewrite_links as lxml_rewrite_links
 from path import path
 
@@ -14,88 +16,127 @@ from xmodule.errortracker import make_error_tracker
 
 log = logging.getLogger(__name__)
 
+# How many threads prepare the modules and static content of a course being imported
+IMPORT_WORKERS = 4
 
-def import_static_content(modules, course_loc, course_data_path, static_content_store, target_location_namespace,
-                          subpath='static', verbose=False):
+# How many modules are written to the modulestore with one query
+IMPORT_BATCH_SIZE = 100
 
-    remap_dict = {}
 
-    # now import all static assets
+def import_static_content(modules, course_loc, course_data_path, static_content_store, target_location_namespace,
+                          subpath='static', verbose=False, pool=None):
+    """
+    Import all the files under subpath of course_data_path as assets, generating
+    thumbnails for the images.  The files are imported in the threads of pool,
+    if given.  Returns a dict of the names of the assets by the paths of their files.
+    """
     static_dir = course_data_path / subpath
 
     verbose = True
 
-    for dirname, dirnames, filenames in os.walk(static_dir):
-        for filename in filenames:
+    content_paths = [os.path.join(dirname, filename)
+                     for dirname, dirnames, filenames in os.walk(static_dir)
+                     for filename in filenames]
 
-            try:
-                content_path = os.path.join(dirname, filename)
-                if verbose:
-                    log.debug('importing static content {0}...'.format(content_path))
+    def import_file(content_path):
+        if verbose:
+            log.debug('importing static content {0}...'.format(content_path))
 
-                fullname_with_subpath = content_path.replace(static_dir, '')  # strip away leading path from the name
-                if fullname_with_subpath.startswith('/'):
-                    fullname_with_subpath = fullname_with_subpath[1:]
-                content_loc = StaticContent.compute_location(target_location_namespace.org, target_location_namespace.course, fullname_with_subpath)
-                mime_type = mimetypes.guess_type(filename)[0]
+        fullname_with_subpath = content_path.replace(static_dir, '')  # strip away leading path from the name
+        if fullname_with_subpath.startswith('/'):
+            fullname_with_subpath = fullname_with_subpath[1:]
+        content_loc = StaticContent.compute_location(target_location_namespace.org, target_location_namespace.course, fullname_with_subpath)
+        _import_content_file(content_path, content_loc, static_content_store, fullname_with_subpath)
 
-                with open(content_path, 'rb') as f:
-                    data = f.read()
+        #store the remapping information which will be needed to subsitute in the module data
+        return fullname_with_subpath, content_loc.name
 
-                content = StaticContent(content_loc, filename, mime_type, data, import_path=fullname_with_subpath)
+    return dict((pool.map if pool is not None else map)(import_file, content_paths))
 
-                # first let's save a thumbnail so we can get back a thumbnail location
-                (thumbnail_content, thumbnail_location) = static_content_store.generate_thumbnail(content)
 
-                if thumbnail_content is not None:
-                    content.thumbnail_location = thumbnail_location
+def _import_content_file(content_path, content_loc, static_content_store, import_path):
+    """
+    Save the file at content_path as the asset at content_loc, with a thumbnail if it's an image
+    """
+    filename = os.path.basename(content_path)
+    mime_type = mimetypes.guess_type(filename)[0]
 
-                #then commit the content
-                static_content_store.save(content)
+    with open(content_path, 'rb') as f:
+        if mime_type is not None and mime_type.split('/')[0] == 'image':
+            # thumbnails are made from the data in memory
+            data = f.read()
+        else:
+            # other files are streamed into the store a chunk at a time
+            data = f
 
-                #store the remapping information which will be needed to subsitute in the module data
-                remap_dict[fullname_with_subpath] = content_loc.name
-            except:
-                raise
+        content = StaticContent(content_loc, filename, mime_type, data, import_path=import_path)
 
-    return remap_dict
+        # first let's save a thumbnail so we can get back a thumbnail location
+        (thumbnail_content, thumbnail_location) = static_content_store.generate_thumbnail(content)
 
+        if thumbnail_content is not None:
+            content.thumbnail_location = thumbnail_location
+
+        #then commit the content
+        static_content_store.save(content)
 
-def verify_content_links(module, base_dir, static_content_store, link, remap_dict=None):
-    if link.startswith('/static/'):
-        # yes, then parse out the name
-        path = link[len('/static/'):]
 
-        static_pathname = base_dir / path
+class ImportedLinks(dict):
+    """
+    The new links of the static content imported for '/static/' links so far,
+    by link, shared by all the threads importing a course
+    """
+    def __init__(self):
+        super(ImportedLinks, self).__init__()
+        self.lock = threading.Lock()
+        self.link_locks = {}
 
-        if os.path.exists(static_pathname):
-            try:
-                content_loc = StaticContent.compute_location(module.location.org, module.location.course, path)
-                filename = os.path.basename(path)
-                mime_type = mimetypes.guess_type(filename)[0]
+    def link_lock(self, link):
+        """
+        Return the lock to hold while importing the content of link, so that
+        different links are imported at the same time, but each one only once
+        """
+        with self.lock:
+            return self.link_locks.setdefault(link, threading.Lock())
+
+
+def verify_content_links(module, base_dir, static_content_store, link, remap_dict=None, imported_links=None):
+    """
+    Import the file a '/static/' link in module points to as an asset, and
+    return the link to the asset (or link itself, if there is no such file).
 
-                with open(static_pathname, 'rb') as f:
-                    data = f.read()
+    imported_links: an ImportedLinks, so that each file is only imported once
+    """
+    if link.startswith('/static/'):
+        if imported_links is None:
+            new_link = _import_content_link(module, base_dir, static_content_store, link)
+        else:
+            with imported_links.link_lock(link):
+                if link not in imported_links:
+                    imported_links[link] = _import_content_link(module, base_dir, static_content_store, link)
+                new_link = imported_links[link]
 
-                content = StaticContent(content_loc, filename, mime_type, data, import_path=path)
+        if remap_dict is not None and new_link != link:
+            remap_dict[link] = new_link
 
-                # first let's save a thumbnail so we can get back a thumbnail location
-                (thumbnail_content, thumbnail_location) = static_content_store.generate_thumbnail(content)
+        return new_link
 
-                if thumbnail_content is not None:
-                    content.thumbnail_location = thumbnail_location
+    return link
 
-                #then commit the content
-                static_content_store.save(content)
 
-                new_link = StaticContent.get_url_path_from_location(content_loc)
+def _import_content_link(module, base_dir, static_content_store, link):
+    # parse out the name
+    path = link[len('/static/'):]
 
-                if remap_dict is not None:
-                    remap_dict[link] = new_link
+    static_pathname = base_dir / path
 
-                return new_link
-            except Exception, e:
-                logging.exception('Skipping failed content load from {0}. Exception: {1}'.format(path, e))
+    if os.path.exists(static_pathname):
+        try:
+            content_loc = StaticContent.compute_location(module.location.org, module.location.course, path)
+            _import_content_file(static_pathname, content_loc, static_content_store, path)
+            return StaticContent.get_url_path_from_location(content_loc)
+        except Exception, e:
+            logging.exception('Skipping failed content load from {0}. Exception: {1}'.format(path, e))
 
     return link
 
@@ -175,7 +216,7 @@ def import_course_from_xml(modulestore, static_content_store, course_data_path,
 def import_from_xml(store, data_dir, course_dirs=None,
                     default_class='xmodule.raw_module.RawDescriptor',
                     load_error_modules=True, static_content_store=None, target_location_namespace=None,
-                    verbose=False, draft_store=None):
+                    verbose=False, draft_store=None, workers=IMPORT_WORKERS):
     """
     Import the specified xml data_dir into the "store" modulestore,
     using org and course as the location org and course.
@@ -188,6 +229,10 @@ def import_from_xml(store, data_dir, course_dirs=None,
     expects a 'url_name' as an identifier to where things are on disk e.g. ../policies/<url_name>/policy.json as well as metadata keys in
     the policy.json. so we need to keep the original url_name during import
 
+    Each course is imported in stages: its static content is imported, and
+    the documents of its modules prepared (importing the content they link
+    to), by `workers` threads, then the documents are written to the store
+    IMPORT_BATCH_SIZE at a time.
     """
 
     xml_module_store = XMLModuleStore(
@@ -197,98 +242,141 @@ def import_from_xml(store, data_dir, course_dirs=None,
         load_error_modules=load_error_modules
     )
 
+    pool = ThreadPool(workers) if workers > 1 else None
+
     # NOTE: the XmlModuleStore does not implement get_items() which would be a preferable means
     # to enumerate the entire collection of course modules. It will be left as a TBD to implement that
     # method on XmlModuleStore.
     course_items = []
-    for course_id in xml_module_store.modules.keys():
+    try:
+        for course_id in xml_module_store.modules.keys():
+            course_items.extend(_import_course(
+                store, xml_module_store, course_id, data_dir, static_content_store,
+                target_location_namespace, verbose, draft_store, pool
+            ))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-        if target_location_namespace is not None:
-            pseudo_course_id = '/'.join([target_location_namespace.org, target_location_namespace.course])
-        else:
-            course_id_components = course_id.split('/')
-            pseudo_course_id = '/'.join([course_id_components[0], course_id_components[1]])
+    return xml_module_store, course_items
 
-        try:
-            # turn off all write signalling while importing as this is a high volume operation
-            if pseudo_course_id not in store.ignore_write_events_on_courses:
-                store.ignore_write_events_on_courses.append(pseudo_course_id)
 
-            course_data_path = None
-            course_location = None
+def _import_course(store, xml_module_store, course_id, data_dir, static_content_store,
+                   target_location_namespace, verbose, draft_store, pool):
+    """
+    Import the course course_id of xml_module_store into store (see
+    import_from_xml), using the threads of pool (if not None), and return
+    the list of its course modules
+    """
+    course_items = []
+    imported_links = ImportedLinks()
 
-            if verbose:
-                log.debug("Scanning {0} for course module...".format(course_id))
+    if target_location_namespace is not None:
+        pseudo_course_id = '/'.join([target_location_namespace.org, target_location_namespace.course])
+    else:
+        course_id_components = course_id.split('/')
+        pseudo_course_id = '/'.join([course_id_components[0], course_id_components[1]])
 
-            # Quick scan to get course module as we need some info from there. Also we need to make sure that the
-            # course module is committed first into the store
-            for module in xml_module_store.modules[course_id].itervalues():
-                if module.category == 'course':
-                    course_data_path = path(data_dir) / module.data_dir
-                    course_location = module.location
+    try:
+        # turn off all write signalling while importing as this is a high volume operation
+        if pseudo_course_id not in store.ignore_write_events_on_courses:
+            store.ignore_write_events_on_courses.append(pseudo_course_id)
 
-                    module = remap_namespace(module, target_location_namespace)
+        course_data_path = None
+        course_location = None
 
-                    # cdodge: more hacks (what else). Seems like we have a problem when importing a course (like 6.002) which
-                    # does not have any tabs defined in the policy file. The import goes fine and then displays fine in LMS,
-                    # but if someone tries to add a new tab in the CMS, then the LMS barfs because it expects that -
-                    # if there is *any* tabs - then there at least needs to be some predefined ones
-                    if module.tabs is None or len(module.tabs) == 0:
-                        module.tabs = [{"type": "courseware"},
-                                       {"type": "course_info", "name": "Course Info"},
-                                       {"type": "discussion", "name": "Discussion"},
-                                       {"type": "wiki", "name": "Wiki"}]  # note, add 'progress' when we can support it on Edge
+        if verbose:
+            log.debug("Scanning {0} for course module...".format(course_id))
 
-                    import_module(module, store, course_data_path, static_content_store)
+        # Quick scan to get course module as we need some info from there. Also we need to make sure that the
+        # course module is committed first into the store
+        for module in xml_module_store.modules[course_id].itervalues():
+            if module.category == 'course':
+                course_data_path = path(data_dir) / module.data_dir
+                course_location = module.location
 
-                    # a bit of a hack, but typically the "course image" which is shown on marketing pages is hard coded to /images/course_image.jpg
-                    # so let's make sure we import in case there are no other references to it in the modules
-                    verify_content_links(module, course_data_path, static_content_store, '/static/images/course_image.jpg')
+                module = remap_namespace(module, target_location_namespace)
 
-                    course_items.append(module)
+                # cdodge: more hacks (what else). Seems like we have a problem when importing a course (like 6.002) which
+                # does not have any tabs defined in the policy file. The import goes fine and then displays fine in LMS,
+                # but if someone tries to add a new tab in the CMS, then the LMS barfs because it expects that -
+                # if there is *any* tabs - then there at least needs to be some predefined ones
+                if module.tabs is None or len(module.tabs) == 0:
+                    module.tabs = [{"type": "courseware"},
+                                   {"type": "course_info", "name": "Course Info"},
+                                   {"type": "discussion", "name": "Discussion"},
+                                   {"type": "wiki", "name": "Wiki"}]  # note, add 'progress' when we can support it on Edge
 
-            # then import all the static content
-            if static_content_store is not None:
-                _namespace_rename = target_location_namespace if target_location_namespace is not None else course_location
+                _sync_static_tab_names(module, xml_module_store.modules[course_id].itervalues())
 
-                # first pass to find everything in /static/
-                import_static_content(xml_module_store.modules[course_id], course_location, course_data_path, static_content_store,
-                                      _namespace_rename, subpath='static', verbose=verbose)
+                write_module_documents(store, [module_document(module, course_data_path, static_content_store,
+                                                               imported_links)])
 
-            # finally loop through all the modules
-            for module in xml_module_store.modules[course_id].itervalues():
+                # a bit of a hack, but typically the "course image" which is shown on marketing pages is hard coded to /images/course_image.jpg
+                # so let's make sure we import in case there are no other references to it in the modules
+                verify_content_links(module, course_data_path, static_content_store, '/static/images/course_image.jpg',
+                                     imported_links=imported_links)
 
-                if module.category == 'course':
-                    # we've already saved the course module up at the top of the loop
-                    # so just skip over it in the inner loop
-                    continue
+                course_items.append(module)
 
-                # remap module to the new namespace
-                if target_location_namespace is not None:
-                    module = remap_namespace(module, target_location_namespace)
+        # then import all the static content
+        if static_content_store is not None:
+            _namespace_rename = target_location_namespace if target_location_namespace is not None else course_location
 
-                if verbose:
-                    log.debug('importing module location {0}'.format(module.location))
+            # first pass to find everything in /static/
+            import_static_content(xml_module_store.modules[course_id], course_location, course_data_path, static_content_store,
+                                  _namespace_rename, subpath='static', verbose=verbose, pool=pool)
 
-                import_module(module, store, course_data_path, static_content_store)
+        # finally loop through all the modules
+        modules = []
+        for module in xml_module_store.modules[course_id].itervalues():
 
-            # now import any 'draft' items
-            if draft_store is not None:
-                import_course_draft(xml_module_store, store, draft_store, course_data_path,
-                                    static_content_store, target_location_namespace if target_location_namespace is not None
-                                    else course_location)
+            if module.category == 'course':
+                # we've already saved the course module up at the top of the loop
+                # so just skip over it in the inner loop
+                continue
 
-        finally:
-            # turn back on all write signalling
-            if pseudo_course_id in store.ignore_write_events_on_courses:
-                store.ignore_write_events_on_courses.remove(pseudo_course_id)
-                store.refresh_cached_metadata_inheritance_tree(target_location_namespace if
-                                                               target_location_namespace is not None else course_location)
+            # remap module to the new namespace
+            if target_location_namespace is not None:
+                module = remap_namespace(module, target_location_namespace)
 
-    return xml_module_store, course_items
+            if verbose:
+                log.debug('importing module location {0}'.format(module.location))
 
+            modules.append(module)
 
-def import_module(module, store, course_data_path, static_content_store, allow_not_found=False):
+        def prepare(module):
+            return module_document(module, course_data_path, static_content_store, imported_links)
+
+        write_module_documents(store, (pool.map if pool is not None else map)(prepare, modules))
+
+        # now import any 'draft' items
+        if draft_store is not None:
+            import_course_draft(xml_module_store, store, draft_store, course_data_path,
+                                static_content_store, target_location_namespace if target_location_namespace is not None
+                                else course_location)
+
+    finally:
+        # turn back on all write signalling
+        if pseudo_course_id in store.ignore_write_events_on_courses:
+            store.ignore_write_events_on_courses.remove(pseudo_course_id)
+            store.refresh_cached_course_structure(target_location_namespace if
+                                                  target_location_namespace is not None else course_location)
+            store.refresh_cached_metadata_inheritance_tree(target_location_namespace if
+                                                           target_location_namespace is not None else course_location)
+            # and let everybody know about all the writes at once
+            store.fire_updated_modulestore_signal(pseudo_course_id, target_location_namespace if
+                                                  target_location_namespace is not None else course_location)
+
+    return course_items
+
+
+def _module_data(module, course_data_path, static_content_store, imported_links=None):
+    """
+    Return the content of module to store, after importing the static content
+    its '/static/' links point to, and rewriting the links
+    """
     content = {}
     for field in module.fields:
         if field.scope != Scope.content:
@@ -316,7 +404,7 @@ def import_module(module, store, course_data_path, static_content_store, allow_n
             # Note the dropped element closing tag. This causes the LMS to fail when rendering modules - that's
             # no good, so we have to do this kludge
             if isinstance(module_data, str) or isinstance(module_data, unicode):   # some module 'data' fields are non strings which blows up the link traversal code
-                lxml_rewrite_links(module_data, lambda link: verify_content_links(module, course_data_path, static_content_store, link, remap_dict))
+                lxml_rewrite_links(module_data, lambda link: verify_content_links(module, course_data_path, static_content_store, link, remap_dict, imported_links))
 
                 for key in remap_dict.keys():
                     module_data = module_data.replace(key, remap_dict[key])
@@ -326,6 +414,12 @@ def import_module(module, store, course_data_path, static_content_store, allow_n
     else:
         module_data = content
 
+    return module_data
+
+
+def import_module(module, store, course_data_path, static_content_store, allow_not_found=False):
+    module_data = _module_data(module, course_data_path, static_content_store)
+
     if allow_not_found:
         store.update_item(module.location, module_data, allow_not_found=allow_not_found)
     else:
@@ -339,6 +433,69 @@ def import_module(module, store, course_data_path, static_content_store, allow_n
     store.update_metadata(module.location, dict(own_metadata(module)))
 
 
+def module_document(module, course_data_path, static_content_store, imported_links=None):
+    """
+    Return the document for module in the MongoModuleStore, as import_module would write it
+    """
+    definition = {'data': _module_data(module, course_data_path, static_content_store, imported_links)}
+    if hasattr(module, 'children') and module.children != []:
+        definition['children'] = module.children
+
+    return {
+        '_id': Location(module.location).dict(),
+        'definition': definition,
+        # NOTE: It's important to use own_metadata here to avoid writing
+        # inherited metadata everywhere.
+        'metadata': dict(own_metadata(module)),
+    }
+
+
+def write_module_documents(store, documents, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Write documents (see module_document) to store, a MongoModuleStore,
+    batch_size at a time.  New modules are inserted together, and modules
+    already there are updated one at a time, the way import_module does it,
+    so that they never go missing.
+
+    This doesn't update the cached metadata inheritance tree and structure
+    index, or fire the modulestore update signal: see import_from_xml.
+    """
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        existing = set(Location(item['_id']).url() for item in store.collection.find(
+            {'_id': {'$in': [document['_id'] for document in batch]}}, fields=['_id']))
+
+        new_documents = []
+        for document in batch:
+            if Location(document['_id']).url() not in existing:
+                new_documents.append(document)
+                continue
+            update = {'definition.data': document['definition']['data'], 'metadata': document['metadata']}
+            if 'children' in document['definition']:
+                update['definition.children'] = document['definition']['children']
+            store.collection.update({'_id': document['_id']}, {'$set': update}, upsert=True,
+                                    safe=store.collection.safe)
+        if new_documents:
+            store.collection.insert(new_documents, safe=store.collection.safe)
+
+
+def _sync_static_tab_names(course, modules):
+    """
+    Set the names of the static tabs of course, a course module about to be
+    imported, to the display names of their static_tab modules among modules,
+    as MongoModuleStore.update_metadata does when a static_tab is written.
+    """
+    tabs = course.tabs or []
+    for module in modules:
+        if module.category != 'static_tab':
+            continue
+        for tab in tabs:
+            if tab.get('url_slug') == module.location.name:
+                tab['name'] = own_metadata(module).get('display_name')
+                break
+    course.tabs = tabs
+
+
 def import_course_draft(xml_module_store, store, draft_store, course_data_path, static_content_store, target_location_namespace):
     '''
     This will import all the content inside of the 'drafts' folder, if it exists
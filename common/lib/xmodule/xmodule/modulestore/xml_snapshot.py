@@ -0,0 +1,245 @@
+"""
+Snapshots of the courses an XMLModuleStore has loaded, so that the next
+process to start with the same course directories doesn't have to parse all
+their xml again.
+
+A snapshot holds what loading a course put in the store: the class, location
+and model data of each descriptor, the parent pointers and the load errors.
+It is written with marshal, which only knows about the builtin types, so
+reading one back never runs any code, and is keyed by a hash of the course
+directory's content (and of the xmodule code), so a changed course (or a new
+release) simply doesn't find its snapshot and is parsed again.
+"""
+import errno
+import hashlib
+import logging
+import marshal
+import os
+import re
+import sys
+import tempfile
+
+from importlib import import_module
+
+from xmodule.errortracker import make_error_tracker
+
+from . import Location
+
+log = logging.getLogger(__name__)
+
+# Change this when the contents of snapshots change
+SNAPSHOT_VERSION = 1
+
+# Files in these top-level dirs of a course are only hashed by their size and
+# modification time, since the xml never comes from them, and there can be a
+# lot of them.
+STAT_ONLY_DIRS = ('static',)
+
+_code_version = None
+
+
+def code_version():
+    """
+    Return a hash of everything besides the course content that decides what
+    loading a course makes: the snapshot format, the python version (for
+    marshal), and the xmodule code.
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha1()
+        digest.update('{0}\n{1}\n'.format(SNAPSHOT_VERSION, sys.version))
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for directory, dirnames, filenames in os.walk(package_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.py'):
+                    stat = os.stat(os.path.join(directory, filename))
+                    digest.update('{0} {1} {2}\n'.format(
+                        os.path.join(directory, filename), stat.st_size, stat.st_mtime))
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def course_dir_digest(course_path):
+    """
+    Return a hash of the content of the course directory at course_path.
+    Hidden files and directories (.git, ...) are left out.
+    """
+    digest = hashlib.sha1()
+    for directory, dirnames, filenames in os.walk(course_path, followlinks=True):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        relative_dir = os.path.relpath(directory, course_path)
+        stat_only = relative_dir.split(os.sep)[0] in STAT_ONLY_DIRS
+        for filename in sorted(filenames):
+            if filename.startswith('.'):
+                continue
+            filepath = os.path.join(directory, filename)
+            digest.update(os.path.join(relative_dir, filename) + '\0')
+            if stat_only:
+                stat = os.stat(filepath)
+                digest.update('{0} {1}\0'.format(stat.st_size, stat.st_mtime))
+            else:
+                with open(filepath, 'rb') as f:
+                    digest.update(hashlib.sha1(f.read()).digest())
+    return digest.hexdigest()
+
+
+SNAPSHOT_NAME_RE = re.compile(r'^(?P<course_dir>.+)\.(?P<key>[0-9a-f]{40})\.snapshot$')
+
+
+def snapshot_path(snapshot_dir, course_dir, key):
+    return os.path.join(snapshot_dir, '{0}.{1}.snapshot'.format(course_dir, key))
+
+
+def snapshot_key(xmlstore, course_dir):
+    """
+    Return the key of the snapshot of course_dir as xmlstore would load it
+    """
+    digest = hashlib.sha1(code_version())
+    default_class = xmlstore.default_class
+    if default_class is not None:
+        default_class = default_class.__module__ + '.' + default_class.__name__
+    digest.update('{0}\n{1}\n'.format(default_class, xmlstore.load_error_modules))
+    digest.update(course_dir_digest(xmlstore.data_dir / course_dir))
+    return digest.hexdigest()
+
+
+def _class_path(cls):
+    return cls.__module__ + '.' + cls.__name__
+
+
+def _load_class(class_path):
+    module_path, _, class_name = class_path.rpartition('.')
+    return getattr(import_module(module_path), class_name)
+
+
+def dump_course(xmlstore, course_dir, course_descriptor):
+    """
+    Return the snapshot of course_dir, which xmlstore has just loaded as
+    course_descriptor, as a string.  Raises ValueError if some of it can't
+    be marshalled.
+    """
+    course_id = course_descriptor.id
+    modules = []
+    for location, descriptor in xmlstore.modules[course_id].iteritems():
+        if getattr(descriptor, 'data_dir', None) != course_dir:
+            continue
+        if type(descriptor._model_data) is not dict:
+            raise ValueError("{0} doesn't keep its model data in a dict".format(location))
+        modules.append((
+            _class_path(type(descriptor)),
+            tuple(location),
+            descriptor._model_data,
+            getattr(descriptor, '_inherited_metadata', None),
+            getattr(descriptor, '_inheritable_metadata', None),
+        ))
+
+    parents = [
+        (tuple(child), [tuple(parent) for parent in child_parents])
+        for child, child_parents in xmlstore.parent_trackers[course_id]._parents.iteritems()
+    ]
+    errors = xmlstore._location_errors[course_descriptor.location].errors
+
+    return marshal.dumps({
+        'course_id': course_id,
+        'course_location': tuple(course_descriptor.location),
+        'policy': course_descriptor.system.policy,
+        'modules': modules,
+        'parents': parents,
+        'errors': [tuple(error) for error in errors],
+    })
+
+
+def load_course(xmlstore, course_dir, data):
+    """
+    Put the course in the snapshot data (a string from dump_course) into
+    xmlstore, and return its course descriptor.
+    """
+    # the import is here because xml imports this module
+    from .xml import ImportSystem
+
+    snapshot = marshal.loads(data)
+    course_id = snapshot['course_id']
+
+    # descriptors report errors in __init__, which we already have from the
+    # snapshot, so they go to a throwaway tracker until the errors are restored
+    errorlog = make_error_tracker()
+    system = ImportSystem(
+        xmlstore,
+        course_id,
+        course_dir,
+        snapshot['policy'],
+        errorlog.tracker,
+        xmlstore.parent_trackers[course_id],
+        xmlstore.load_error_modules,
+    )
+
+    modules = {}
+    for class_path, location, model_data, inherited, inheritable in snapshot['modules']:
+        location = Location(location)
+        descriptor = _load_class(class_path)(system, location, model_data)
+        descriptor.data_dir = course_dir
+        if inherited is not None:
+            descriptor._inherited_metadata = inherited
+        if inheritable is not None:
+            descriptor._inheritable_metadata = inheritable
+        modules[location] = descriptor
+    errorlog.errors[:] = snapshot['errors']
+
+    course_location = Location(snapshot['course_location'])
+    course_descriptor = modules[course_location]
+
+    xmlstore.modules[course_id].update(modules)
+    parent_tracker = xmlstore.parent_trackers[course_id]
+    for child, parents in snapshot['parents']:
+        parent_tracker._parents.setdefault(Location(child), set()).update(
+            Location(parent) for parent in parents)
+    xmlstore._location_errors[course_location] = errorlog
+    return course_descriptor
+
+
+def read_snapshot(snapshot_dir, course_dir, key):
+    """
+    Return the data of the snapshot of course_dir with key, or None if
+    there isn't one
+    """
+    try:
+        with open(snapshot_path(snapshot_dir, course_dir, key), 'rb') as f:
+            return f.read()
+    except IOError as err:
+        if err.errno != errno.ENOENT:
+            raise
+        return None
+
+
+def write_snapshot(snapshot_dir, course_dir, key, data):
+    """
+    Save data as the snapshot of course_dir with key, and remove the
+    course's older snapshots.
+    """
+    if not os.path.isdir(snapshot_dir):
+        try:
+            os.makedirs(snapshot_dir)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+
+    # write to a temporary file first, so nobody ever reads a partial snapshot
+    path = snapshot_path(snapshot_dir, course_dir, key)
+    fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+
+    for filename in os.listdir(snapshot_dir):
+        match = SNAPSHOT_NAME_RE.match(filename)
+        if match and match.group('course_dir') == course_dir and match.group('key') != key:
+            try:
+                os.unlink(os.path.join(snapshot_dir, filename))
+            except OSError:
+                # another process removed it
+                pass
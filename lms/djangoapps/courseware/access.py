@@ -7,7 +7,10 @@ from datetime import datetime, timedelta
 from functools import partial
 
 from django.conf import settings
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 
 from xmodule.course_module import CourseDescriptor
 from xmodule.error_module import ErrorDescriptor
@@ -16,9 +19,13 @@ from xmodule.x_module import XModule, XModuleDescriptor
 
 from student.models import CourseEnrollmentAllowed
 from courseware.masquerade import is_masquerading_as_student
+from request_cache.middleware import RequestCache
 
 DEBUG_ACCESS = False
 
+# How long the names of the groups of a course are cached, in seconds
+COURSE_GROUP_NAMES_TIMEOUT = 60
+
 log = logging.getLogger(__name__)
 
 
@@ -339,8 +346,76 @@ def _dispatch(table, action, user, obj):
         type(obj), action))
 
 
-def _does_course_group_name_exist(name):
-    return len(Group.objects.filter(name=name)) > 0
+def _access_request_cache(name):
+    """
+    The memoized group names ('groups': user id -> frozenset of group names)
+    or access decisions ('decisions': (user id, access level, course, course id)
+    -> bool) of this request, or None outside of requests, e.g. when grading
+    every student of a course, where they'd only pile up.
+    """
+    return RequestCache.get_request_data('courseware_access_' + name)
+
+
+def _get_user_group_names(user):
+    """
+    Return a frozenset of the names of the groups user is in, looked up once per request.
+    """
+    groups = _access_request_cache('groups')
+    if groups is None:
+        return frozenset(g.name for g in user.groups.all())
+    if user.id not in groups:
+        groups[user.id] = frozenset(g.name for g in user.groups.all())
+    return groups[user.id]
+
+
+def _course_group_key(course):
+    return 'courseware.access.course_group_names.{0}'.format(course)
+
+
+def _get_course_group_names(course):
+    """
+    Return a frozenset of the names of the existing groups with the legacy
+    naming for course (e.g. staff_6.002x), shared across requests for
+    COURSE_GROUP_NAMES_TIMEOUT seconds.
+    """
+    key = _course_group_key(course)
+    names = cache.get(key)
+    if names is None:
+        names = frozenset(Group.objects.filter(name__endswith='_' + course)
+                                       .values_list('name', flat=True))
+        cache.set(key, names, COURSE_GROUP_NAMES_TIMEOUT)
+    return names
+
+
+def _clear_access_request_cache():
+    for name in ('groups', 'decisions'):
+        request_cache = _access_request_cache(name)
+        if request_cache is not None:
+            request_cache.clear()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def _invalidate_group_names(sender, instance, **kwargs):
+    """
+    Forget the cached group names of the course of a group that was saved or deleted
+    """
+    # the course is the end of the name, after one of the underscores
+    parts = instance.name.split('_')
+    cache.delete_many([_course_group_key('_'.join(parts[i:])) for i in range(1, len(parts))])
+    _clear_access_request_cache()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _invalidate_user_groups(sender, **kwargs):
+    """
+    Forget the memoized groups and decisions when someone joins or leaves a group
+    """
+    _clear_access_request_cache()
+
+
+def _does_course_group_name_exist(name, course):
+    return name in _get_course_group_names(course)
 
 
 def _course_org_staff_group_name(location, course_context=None):
@@ -402,7 +477,7 @@ def _course_staff_group_name(location, course_context=None):
     loc = Location(location)
     group_name, legacy_group_name = group_names_for_staff(location, course_context)
 
-    if _does_course_group_name_exist(legacy_group_name):
+    if _does_course_group_name_exist(legacy_group_name, loc.course):
         return legacy_group_name
 
     return group_name
@@ -443,7 +518,7 @@ def _course_instructor_group_name(location, course_context=None):
     loc = Location(location)
     group_name, legacy_group_name = group_names_for_instructor(location, course_context)
 
-    if _does_course_group_name_exist(legacy_group_name):
+    if _does_course_group_name_exist(legacy_group_name, loc.course):
         return legacy_group_name
 
     return group_name
@@ -500,7 +575,7 @@ def _adjust_start_date_for_beta_testers(user, descriptor):
         # bail early if no beta testing is set up
         return descriptor.lms.start
 
-    user_groups = [g.name for g in user.groups.all()]
+    user_groups = _get_user_group_names(user)
 
     beta_group = course_beta_test_group_name(descriptor.location)
     if beta_group in user_groups:
@@ -553,7 +628,24 @@ def _has_access_to_location(user, location, access_level, course_context):
         return True
 
     # If not global staff, is the user in the Auth group for this class?
-    user_groups = [g.name for g in user.groups.all()]
+    # has_access is called for every descriptor of a course tree, so the
+    # decision is memoized for the rest of the request.
+    loc = Location(location)
+    key = (user.id, access_level, loc.course, loc.course_id if loc.category == 'course' else course_context)
+    decisions = _access_request_cache('decisions')
+    if decisions is None:
+        return _user_in_course_groups(user, location, access_level, course_context)
+    if key not in decisions:
+        decisions[key] = _user_in_course_groups(user, location, access_level, course_context)
+    return decisions[key]
+
+
+def _user_in_course_groups(user, location, access_level, course_context):
+    """
+    Returns True if user is in one of the groups giving access_level
+    (= staff or instructor) access to location.
+    """
+    user_groups = _get_user_group_names(user)
 
     if access_level == 'staff':
         staff_groups = group_names_for_staff(location, course_context) + \
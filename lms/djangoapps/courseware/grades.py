@@ -1,20 +1,25 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 
+import hashlib
+import json
 import random
 import logging
 
 from collections import defaultdict
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import IntegrityError
 
-from .model_data import ModelDataCache, LmsKeyValueStore
+from .model_data import ModelDataCache, MultiUserModelDataCache, LmsKeyValueStore, chunks
 from xblock.core import Scope
 from .module_render import get_module, get_module_for_descriptor
 from xmodule import graders
-from xmodule.capa_module import CapaModule
+from xmodule.course_module import yield_descriptor_descendents
 from xmodule.graders import Score
-from .models import StudentModule
+from xmodule.modulestore import Location
+from xmodule.modulestore.django import modulestore
+from .models import StudentModule, StudentSectionScore
 
 log = logging.getLogger("mitx.courseware")
 
@@ -50,49 +55,61 @@ def yield_dynamic_descriptor_descendents(descriptor, module_creator):
         yield next_descriptor
 
 
-def yield_problems(request, course, student):
+def yield_student_model_data_caches(course, students, chunk_size=100):
     """
-    Return an iterator over capa_modules that this student has
-    potentially answered.  (all that student has answered will definitely be in
-    the list, but there may be others as well).
-    """
-    grading_context = course.grading_context
-
-    descriptor_locations = (descriptor.location.url() for descriptor in grading_context['all_descriptors'])
-    existing_student_modules = set(StudentModule.objects.filter(
-        module_state_key__in=descriptor_locations
-    ).values_list('module_state_key', flat=True))
-
-    sections_to_list = []
-    for _, sections in grading_context['graded_sections'].iteritems():
-        for section in sections:
+    Yield (student, model_data_cache) for each of students, where the
+    ModelDataCache holds everything needed to grade the student in course.
 
-            section_descriptor = section['section_descriptor']
+    The data is loaded chunk_size students at a time, with a
+    MultiUserModelDataCache, instead of a few queries per student.
+    """
+    descriptors = course.grading_context['all_descriptors']
+    for students_chunk in chunks(students, chunk_size):
+        multi_user_cache = MultiUserModelDataCache(descriptors, course.id, students_chunk)
+        for student in students_chunk:
+            yield student, multi_user_cache.model_data_cache_for_user(student)
 
-            # If the student hasn't seen a single problem in the section, skip it.
-            for moduledescriptor in section['xmoduledescriptors']:
-                if moduledescriptor.location.url() in existing_student_modules:
-                    sections_to_list.append(section_descriptor)
-                    break
 
-    model_data_cache = ModelDataCache(sections_to_list, course.id, student)
-    for section_descriptor in sections_to_list:
-        section_module = get_module(student, request,
-                                    section_descriptor.location, model_data_cache,
-                                    course.id)
-        if section_module is None:
-            # student doesn't have access to this module, or something else
-            # went wrong.
-            # log.debug("couldn't get module for student {0} for section location {1}"
-            #           .format(student.username, section_descriptor.location))
-            continue
+def yield_problem_answers(course_id, problem_locations, batch_size=1000):
+    """
+    Yield (module_state_key, student_answers) for every enrolled student's
+    state in course_id for the problems whose location urls are in
+    problem_locations.
 
-        for problem in yield_module_descendents(section_module):
-            if isinstance(problem, CapaModule):
-                yield problem
+    The StudentModule rows are read batch_size at a time, in id order, and
+    only the student_answers in their state are used, so neither the
+    students' modules nor whole querysets are ever held in memory.
+    """
+    student_modules = StudentModule.objects.filter(
+        course_id=course_id,
+        module_type='problem',
+        student__courseenrollment__course_id=course_id,
+    ).exclude(state__isnull=True).order_by('id')
+
+    last_id = 0
+    while True:
+        batch = list(student_modules.filter(id__gt=last_id).values_list(
+            'id', 'module_state_key', 'state'
+        )[:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1][0]
+
+        for _, module_state_key, state in batch:
+            # Don't bother decoding the state of problems that aren't counted,
+            # or that have never been answered
+            if module_state_key not in problem_locations or '"student_answers"' not in state:
+                continue
+            try:
+                student_answers = json.loads(state).get('student_answers')
+            except ValueError:
+                log.warning("Unable to decode state of %s in %s", module_state_key, course_id)
+                continue
+            if student_answers:
+                yield module_state_key, student_answers
 
 
-def answer_distributions(request, course):
+def answer_distributions(course):
     """
     Given a course_descriptor, compute frequencies of answers for each problem:
 
@@ -100,21 +117,24 @@ def answer_distributions(request, course):
 
     dict: (problem url_name, problem display_name, problem_id) -> (dict : answer ->  count)
 
-    TODO (vshnayder): this is currently doing a full linear pass through all
-    students and all problems.  This will be just a little slow.
+    The answers are read straight out of the enrolled students' StudentModule
+    states, in batches, for the problems in the course's graded sections.
     """
+    problems = {}
+    for _, sections in course.grading_context['graded_sections'].iteritems():
+        for section in sections:
+            for descriptor in section['xmoduledescriptors']:
+                if descriptor.location.category == 'problem':
+                    problems[descriptor.location.url()] = (descriptor.url_name, descriptor.display_name_with_default)
 
     counts = defaultdict(lambda: defaultdict(int))
 
-    enrolled_students = User.objects.filter(courseenrollment__course_id=course.id)
-
-    for student in enrolled_students:
-        for capa_module in yield_problems(request, course, student):
-            for problem_id in capa_module.lcp.student_answers:
-                # Answer can be a list or some other unhashable element.  Convert to string.
-                answer = str(capa_module.lcp.student_answers[problem_id])
-                key = (capa_module.url_name, capa_module.display_name_with_default, problem_id)
-                counts[key][answer] += 1
+    for module_state_key, student_answers in yield_problem_answers(course.id, problems):
+        url_name, display_name = problems[module_state_key]
+        for problem_id, answer in student_answers.iteritems():
+            # Answer can be a list or some other unhashable element.  Convert to string.
+            key = (url_name, display_name, problem_id)
+            counts[key][unicode(answer)] += 1
 
     return counts
 
@@ -144,6 +164,8 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
     if model_data_cache is None:
         model_data_cache = ModelDataCache(grading_context['all_descriptors'], course.id, student)
 
+    section_scores = load_section_scores(student, course.id)
+
     totaled_scores = {}
     # This next complicated loop is just to collect the totaled_scores, which is
     # passed to the grader
@@ -175,32 +197,19 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
                     break
 
             if should_grade_section:
-                scores = []
+                # Use the scores stored when the student's problems were graded, if they are
+                # still valid. Otherwise, compute them (which may load the section's modules).
+                scores = stored_section_scores(section, section_scores)
+                if scores is None:
 
-                def create_module(descriptor):
-                    '''creates an XModule instance given a descriptor'''
-                    # TODO: We need the request to pass into here. If we could forego that, our arguments
-                    # would be simpler
-                    return get_module_for_descriptor(student, request, descriptor, model_data_cache, course.id)
+                    def create_module(descriptor):
+                        '''creates an XModule instance given a descriptor'''
+                        # TODO: We need the request to pass into here. If we could forego that, our arguments
+                        # would be simpler
+                        return get_module_for_descriptor(student, request, descriptor, model_data_cache, course.id)
 
-                for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
-
-                    (correct, total) = get_score(course.id, student, module_descriptor, create_module, model_data_cache)
-                    if correct is None and total is None:
-                        continue
-
-                    if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
-                        if total > 1:
-                            correct = random.randrange(max(total - 2, 1), total + 1)
-                        else:
-                            correct = total
-
-                    graded = module_descriptor.lms.graded
-                    if not total > 0:
-                        #We simply cannot grade a problem that is 12/0, because we might need it as a percentage
-                        graded = False
-
-                    scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
+                    scores = score_section(student, course.id, section, create_module, model_data_cache)
+                    save_section_scores(student, course.id, section, scores)
 
                 _, graded_total = graders.aggregate_scores(scores, section_name)
                 if keep_raw_scores:
@@ -232,6 +241,171 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
     return grade_summary
 
 
+def score_section(student, course_id, section, create_module, model_data_cache):
+    """
+    Return the list of Scores of student on the scored modules in a graded
+    section, as described in course.grading_context['graded_sections'].
+
+    create_module: a function that takes a descriptor, and returns the corresponding XModule for this user.
+    """
+    section_descriptor = section['section_descriptor']
+    scores = []
+    for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
+
+        (correct, total) = get_score(course_id, student, module_descriptor, create_module, model_data_cache)
+        if correct is None and total is None:
+            continue
+
+        if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
+            if total > 1:
+                correct = random.randrange(max(total - 2, 1), total + 1)
+            else:
+                correct = total
+
+        graded = module_descriptor.lms.graded
+        if not total > 0:
+            #We simply cannot grade a problem that is 12/0, because we might need it as a percentage
+            graded = False
+
+        scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
+    return scores
+
+
+def section_signature(section):
+    """
+    Identify the scored modules of a graded section, and their weights, so
+    that scores stored for an older version of the section aren't used.
+    """
+    signature = hashlib.md5()
+    for descriptor in section['xmoduledescriptors']:
+        signature.update(descriptor.location.url())
+        signature.update(repr(getattr(descriptor, 'weight', None)))
+    return signature.hexdigest()
+
+
+def can_store_section_scores(section):
+    """
+    Scores can't be stored for sections with modules that are scored
+    independently of the LMS (e.g. foldit), nor when they are made up.
+    """
+    if settings.GENERATE_PROFILE_SCORES:
+        return False
+    return not any(descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors'])
+
+
+def load_section_scores(student, course_id):
+    """
+    Return a dict of section location -> StudentSectionScore, for all the
+    stored section scores of student in a course
+    """
+    if not student.is_authenticated():
+        return {}
+    return dict(
+        (section_score.section_location, section_score)
+        for section_score in StudentSectionScore.objects.filter(student=student.id, course_id=course_id)
+    )
+
+
+def stored_section_scores(section, section_scores):
+    """
+    Return the stored list of Scores for a graded section, from the dict
+    returned by load_section_scores, or None if there are no valid ones.
+    """
+    if not can_store_section_scores(section):
+        return None
+    section_score = section_scores.get(section['section_descriptor'].location.url())
+    if section_score is None or section_score.signature != section_signature(section):
+        return None
+    return [Score(*score) for score in json.loads(section_score.scores)]
+
+
+def save_section_scores(student, course_id, section, scores):
+    """
+    Store the list of Scores of student on a graded section
+    """
+    if not student.is_authenticated() or not can_store_section_scores(section):
+        return
+
+    section_location = section['section_descriptor'].location.url()
+    values = {
+        'signature': section_signature(section),
+        'scores': json.dumps([list(score) for score in scores]),
+    }
+    updated = StudentSectionScore.objects.filter(
+        student=student.id, course_id=course_id, section_location=section_location
+    ).update(**values)
+    if not updated:
+        try:
+            StudentSectionScore.objects.create(
+                student_id=student.id, course_id=course_id, section_location=section_location, **values
+            )
+        except IntegrityError:
+            # Another request stored them first; they'll be recomputed when needed.
+            pass
+
+
+def graded_sections_containing(course_id, location):
+    """
+    Return descriptions of the graded sections (like the ones in
+    course.grading_context['graded_sections']) that contain the module at
+    location.
+    """
+    store = modulestore()
+
+    # Sections are the children of chapters, so look for ancestors whose parent is a chapter
+    section_locations = set()
+    visited = set()
+    to_visit = [Location(location)]
+    while to_visit:
+        current = to_visit.pop()
+        for parent in store.get_parent_locations(current, course_id):
+            parent = Location(parent)
+            if parent.category == 'chapter':
+                section_locations.add(current)
+            elif parent not in visited:
+                visited.add(parent)
+                to_visit.append(parent)
+
+    sections = []
+    for section_location in section_locations:
+        section_descriptor = store.get_instance(course_id, section_location, depth=None)
+        if not section_descriptor.lms.graded:
+            continue
+
+        # In the same order as the course's grading_context, so that
+        # section_signature matches for the scores stored from either.
+        xmoduledescriptors = list(yield_descriptor_descendents(section_descriptor))
+        xmoduledescriptors.append(section_descriptor)
+        sections.append({
+            'section_descriptor': section_descriptor,
+            'xmoduledescriptors': [descriptor for descriptor in xmoduledescriptors if descriptor.has_score],
+        })
+    return sections
+
+
+def update_section_scores(student, request, course_id, location):
+    """
+    Recompute and store the scores of student on the graded sections that contain
+    the module at location, e.g. because that module has just been graded.
+    """
+    if not student.is_authenticated():
+        return
+
+    for section in graded_sections_containing(course_id, location):
+        if not can_store_section_scores(section):
+            continue
+
+        model_data_cache = ModelDataCache.cache_for_descriptor_descendents(
+            course_id, student, section['section_descriptor'])
+
+        def create_module(descriptor):
+            '''creates an XModule instance given a descriptor'''
+            return get_module_for_descriptor(student, request, descriptor, model_data_cache, course_id)
+
+        scores = score_section(student, course_id, section, create_module, model_data_cache)
+        save_section_scores(student, course_id, section, scores)
+
+
 def grade_for_percentage(grade_cutoffs, percentage):
     """
     Returns a letter grade as defined in grading_policy (e.g. 'A' 'B' 'C' for 6.002x) or None.
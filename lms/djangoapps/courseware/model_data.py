@@ -32,12 +32,23 @@ def chunks(items, chunk_size):
     return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
 
 
+def fields_to_cache(descriptors):
+    """
+    Returns a map of scopes to the fields in that scope that descriptors use
+    """
+    scope_map = defaultdict(set)
+    for descriptor in descriptors:
+        for field in (descriptor.module_class.fields + descriptor.module_class.lms.fields):
+            scope_map[field.scope].add(field)
+    return scope_map
+
+
 class ModelDataCache(object):
     """
     A cache of django model objects needed to supply the data
     for a module and its decendants
     """
-    def __init__(self, descriptors, course_id, user, select_for_update=False):
+    def __init__(self, descriptors, course_id, user, select_for_update=False, cache=None):
         '''
         Find any courseware.models objects that are needed by any descriptor
         in descriptors. Attempts to minimize the number of queries to the database.
@@ -49,6 +60,9 @@ class ModelDataCache(object):
         course_id: The id of the current course
         user: The user for which to cache data
         select_for_update: True if rows should be locked until end of transaction
+        cache: Optionally, model data objects that have already been loaded
+            for this user (see MultiUserModelDataCache), keyed the same way as
+            this cache. If given, the database isn't queried at all.
         '''
         self.cache = {}
         self.descriptors = descriptors
@@ -56,7 +70,9 @@ class ModelDataCache(object):
         self.course_id = course_id
         self.user = user
 
-        if user.is_authenticated():
+        if cache is not None:
+            self.cache.update(cache)
+        elif user.is_authenticated():
             for scope, fields in self._fields_to_cache().items():
                 for field_object in self._retrieve_fields(scope, fields):
                     self.cache[self._cache_key_from_field_object(scope, field_object)] = field_object
@@ -180,11 +196,7 @@ class ModelDataCache(object):
         """
         Returns a map of scopes to fields in that scope that should be cached
         """
-        scope_map = defaultdict(set)
-        for descriptor in self.descriptors:
-            for field in (descriptor.module_class.fields + descriptor.module_class.lms.fields):
-                scope_map[field.scope].add(field)
-        return scope_map
+        return fields_to_cache(self.descriptors)
 
     def _cache_key_from_kvs_key(self, key):
         """
@@ -201,7 +213,8 @@ class ModelDataCache(object):
         elif key.scope == Scope.user_info:
             return (key.scope, key.field_name)
 
-    def _cache_key_from_field_object(self, scope, field_object):
+    @staticmethod
+    def _cache_key_from_field_object(scope, field_object):
         """
         Return the key used in the ModelDataCache for the specified scope and
         field
@@ -273,6 +286,137 @@ class ModelDataCache(object):
         return field_object
 
 
+class MultiUserModelDataCache(object):
+    """
+    A cache of django model objects needed to supply the data for a set of
+    descriptors, for many users at once.
+
+    Everything is loaded up front, in a few queries per chunk of users rather
+    than a few queries per user. `model_data_cache_for_user` then gives a
+    ModelDataCache for any one of the users without querying the database.
+    """
+    def __init__(self, descriptors, course_id, users, user_chunk_size=100, chunk_size=500):
+        '''
+        Arguments
+        descriptors: A list of XModuleDescriptors.
+        course_id: The id of the current course
+        users: The users for which to cache data
+        user_chunk_size: The number of users to query for at once
+        chunk_size: The number of other values (e.g. locations) to query for at once
+        '''
+        self.descriptors = descriptors
+        self.course_id = course_id
+        self.user_chunk_size = user_chunk_size
+        self.chunk_size = chunk_size
+
+        # Objects that are the same for all users (Scope.content and Scope.settings)
+        self.shared_cache = {}
+        # user id -> cache of that user's own objects
+        self.user_caches = defaultdict(dict)
+
+        user_ids = [user.pk for user in users if user.is_authenticated()]
+        if not user_ids:
+            return
+
+        for scope, fields in fields_to_cache(descriptors).items():
+            for field_object in self._retrieve_fields(scope, fields, user_ids):
+                cache_key = ModelDataCache._cache_key_from_field_object(scope, field_object)
+                if scope in (Scope.content, Scope.settings):
+                    self.shared_cache[cache_key] = field_object
+                else:
+                    self.user_caches[field_object.student_id][cache_key] = field_object
+
+    def _chunked_query(self, model_class, chunk_field, items, user_ids=None, **kwargs):
+        """
+        Queries model_class with `chunk_field` set to chunks of `items` (if
+        `chunk_field` is not None), for chunks of `user_ids` (if not None), and
+        with all other parameters from `**kwargs`
+        """
+        if chunk_field is None:
+            item_chunks = [None]
+        else:
+            item_chunks = list(chunks(items, self.chunk_size))
+
+        if user_ids is None:
+            user_id_chunks = [None]
+        else:
+            user_id_chunks = list(chunks(user_ids, self.user_chunk_size))
+
+        def query(user_id_chunk, item_chunk):
+            filters = dict(kwargs)
+            if user_id_chunk is not None:
+                filters['student__in'] = user_id_chunk
+            if item_chunk is not None:
+                filters[chunk_field] = item_chunk
+            return model_class.objects.filter(**filters)
+
+        return chain.from_iterable(
+            query(user_id_chunk, item_chunk)
+            for user_id_chunk in user_id_chunks
+            for item_chunk in item_chunks
+        )
+
+    def _retrieve_fields(self, scope, fields, user_ids):
+        """
+        Queries the database for all of the fields in the specified scope,
+        for all of user_ids
+        """
+        if scope in (Scope.children, Scope.parent):
+            return []
+        elif scope == Scope.user_state:
+            return self._chunked_query(
+                StudentModule,
+                'module_state_key__in',
+                (descriptor.location.url() for descriptor in self.descriptors),
+                user_ids,
+                course_id=self.course_id,
+            )
+        elif scope == Scope.content:
+            return self._chunked_query(
+                XModuleContentField,
+                'definition_id__in',
+                (descriptor.location.url() for descriptor in self.descriptors),
+                field_name__in=set(field.name for field in fields),
+            )
+        elif scope == Scope.settings:
+            return self._chunked_query(
+                XModuleSettingsField,
+                'usage_id__in',
+                (
+                    '%s-%s' % (self.course_id, descriptor.location.url())
+                    for descriptor in self.descriptors
+                ),
+                field_name__in=set(field.name for field in fields),
+            )
+        elif scope == Scope.preferences:
+            return self._chunked_query(
+                XModuleStudentPrefsField,
+                'module_type__in',
+                set(descriptor.location.category for descriptor in self.descriptors),
+                user_ids,
+                field_name__in=set(field.name for field in fields),
+            )
+        elif scope == Scope.user_info:
+            return self._chunked_query(
+                XModuleStudentInfoField,
+                None,
+                None,
+                user_ids,
+                field_name__in=set(field.name for field in fields),
+            )
+        else:
+            raise InvalidScopeError(scope)
+
+    def model_data_cache_for_user(self, user):
+        """
+        Return a ModelDataCache for `user`, who must be one of the users this
+        cache was created for, made from the objects loaded here
+        """
+        cache = dict(self.shared_cache)
+        cache.update(self.user_caches.get(user.pk, {}))
+        return ModelDataCache(self.descriptors, self.course_id, user, cache=cache)
+
+
 class LmsKeyValueStore(KeyValueStore):
     """
     This KeyValueStore will read data from descriptor_model_data if it exists,
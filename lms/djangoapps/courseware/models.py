@@ -14,7 +14,7 @@ ASSUMPTIONS: modules have unique IDs, even across different module_types
 """
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 class StudentModule(models.Model):
@@ -227,6 +227,51 @@ class XModuleStudentInfoField(models.Model):
         return unicode(repr(self))
 
 
+class StudentSectionScore(models.Model):
+    """
+    The scores of a student on the scored modules of one graded section
+    (sequential) of a course.
+
+    These are kept up to date as the student's problems are graded, so
+    that grading the student doesn't have to load the section's modules
+    again. See courseware.grades.
+    """
+    class Meta:
+        unique_together = (('student', 'course_id', 'section_location'),)
+
+    student = models.ForeignKey(User, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+    section_location = models.CharField(max_length=255)
+
+    # Identifies the scored modules of the section (and their weights) at the
+    # time the scores were computed, so that scores of a changed section are
+    # not used.
+    signature = models.CharField(max_length=32)
+
+    # JSON list of [earned, possible, graded, name] for each scored module
+    scores = models.TextField(default='[]')
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __unicode__(self):
+        return "[StudentSectionScore] %s: %s %s" % (self.student_id, self.course_id, self.section_location)
+
+    @staticmethod
+    def invalidate(student_id, course_id):
+        """
+        Forget all of a student's section scores in a course, e.g. because
+        their module state was changed outside of the courseware. They are
+        recomputed the next time the student is graded.
+        """
+        StudentSectionScore.objects.filter(student=student_id, course_id=course_id).delete()
+
+
+@receiver(post_delete, sender=StudentModule)
+def invalidate_section_scores(sender, instance, **kwargs):
+    StudentSectionScore.invalidate(instance.student_id, instance.course_id)
+
+
 class OfflineComputedGrade(models.Model):
     """
     Table of grades computed offline for a given user and course.
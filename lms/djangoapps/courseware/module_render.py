@@ -22,7 +22,7 @@ from capa.xqueue_interface import XQueueInterface
 from courseware.masquerade import setup_masquerade
 from courseware.access import has_access
 from mitxmako.shortcuts import render_to_string
-from .models import StudentModule
+from .models import StudentModule, StudentSectionScore
 from psychometrics.psychoanalyze import make_psychometrics_data_update_handler
 from student.models import unique_id_for_user
 from xmodule.errortracker import exc_info_to_str
@@ -32,7 +32,7 @@ from xmodule.modulestore.django import modulestore
 from xmodule.x_module import ModuleSystem
 from xmodule.error_module import ErrorDescriptor, NonStaffErrorDescriptor
 from xblock.runtime import DbModel
-from xmodule_modifiers import replace_course_urls, replace_static_urls, add_histogram, wrap_xmodule
+from xmodule_modifiers import replace_urls, add_histogram, wrap_xmodule
 from .model_data import LmsKeyValueStore, LmsUsage, ModelDataCache
 
 from xmodule.modulestore.exceptions import ItemNotFoundError
@@ -266,6 +266,15 @@ def get_module_for_descriptor(user, request, descriptor, model_data_cache, cours
         student_module.max_grade = event.get('max_value')
         student_module.save()
 
+        # Keep the student's stored section scores in step with the new grade.
+        # Imported here because courseware.grades imports this module.
+        from courseware import grades
+        try:
+            grades.update_section_scores(user, request, course_id, descriptor.location)
+        except Exception:
+            log.exception("Unable to update section scores for %s in %s", descriptor.location.url(), course_id)
+            StudentSectionScore.invalidate(user.id, course_id)
+
         #Bin score into range and increment stats
         score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
         org, course_num, run = course_id.split("/")
@@ -301,7 +310,7 @@ def get_module_for_descriptor(user, request, descriptor, model_data_cache, cours
                           user=user,
                           # TODO (cpennington): This should be removed when all html from
                           # a module is coming through get_html and is therefore covered
-                          # by the replace_static_urls code below
+                          # by the replace_urls code below
                           replace_urls=partial(
                               static_replace.replace_static_urls,
                               data_directory=getattr(descriptor, 'data_dir', None),
@@ -350,15 +359,14 @@ def get_module_for_descriptor(user, request, descriptor, model_data_cache, cours
     if wrap_xmodule_display == True:
         _get_html = wrap_xmodule(module.get_html, module, 'xmodule_display.html')
 
-    module.get_html = replace_static_urls(
+    # Rewrite /static/ urls, and allow URLs of the form '/course/' refer to the
+    #   root of multicourse directory hierarchy of this course
+    module.get_html = replace_urls(
         _get_html,
         getattr(descriptor, 'data_dir', None),
+        course_id,
         course_namespace=module.location._replace(category=None, name=None))
 
-    # Allow URLs of the form '/course/' refer to the root of multicourse directory
-    #   hierarchy of this course
-    module.get_html = replace_course_urls(module.get_html, course_id)
-
     if settings.MITX_FEATURES.get('DISPLAY_HISTOGRAMS_TO_STAFF'):
         if has_access(user, module, 'staff', course_id):
             module.get_html = add_histogram(module.get_html, module, user)
@@ -4,6 +4,8 @@ import time
 from mock import Mock, MagicMock, patch
 
 from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
 from django.test import TestCase
 
 from xmodule.course_module import CourseDescriptor
@@ -12,6 +14,7 @@ from xmodule.modulestore import Location
 from xmodule.timeparse import parse_time
 from xmodule.x_module import XModule, XModuleDescriptor
 import courseware.access as access
+from request_cache.middleware import RequestCache
 from .factories import CourseEnrollmentAllowedFactory
 
 
@@ -44,6 +47,7 @@ class AccessTestCase(TestCase):
                                                         'staff', None))
         # A user has staff access if they are in the instructor group
         g.name = 'instructor_edX/toy/2012_Fall'
+        RequestCache().clear_request_cache()
         self.assertTrue(access._has_access_to_location(u, location,
                                                         'staff', None))
 
@@ -55,6 +59,7 @@ class AccessTestCase(TestCase):
         # A user does not have staff access if they are
         # not in either the staff or the the instructor group
         g.name = 'student_only'
+        RequestCache().clear_request_cache()
         self.assertFalse(access._has_access_to_location(u, location,
                                                         'staff', None))
 
@@ -112,3 +117,39 @@ class AccessTestCase(TestCase):
 
         # TODO:
         # Non-staff cannot enroll outside the open enrollment period if not specifically allowed
+
+
+class AccessCacheTestCase(TestCase):
+    def setUp(self):
+        RequestCache().process_request(None)
+        cache.delete(access._course_group_key('toy'))
+        self.location = Location('i4x://edX/toy/course/2012_Fall')
+        self.user = User.objects.create_user('tester', 'tester@edx.org', 'foo')
+
+    def tearDown(self):
+        RequestCache().process_response(None, None)
+
+    def test_groups_looked_up_once(self):
+        self.assertFalse(access._has_staff_access_to_location(self.user, self.location))
+        with self.assertNumQueries(0):
+            self.assertFalse(access._has_staff_access_to_location(self.user, self.location))
+            self.assertFalse(access._has_instructor_access_to_location(self.user, self.location))
+
+    def test_joining_group_invalidates(self):
+        self.assertFalse(access._has_staff_access_to_location(self.user, self.location))
+        group = Group.objects.create(name='staff_edX/toy/2012_Fall')
+        self.user.groups.add(group)
+        self.assertTrue(access._has_staff_access_to_location(self.user, self.location))
+
+    def test_not_memoized_outside_requests(self):
+        RequestCache().process_response(None, None)
+        self.assertFalse(access._has_staff_access_to_location(self.user, self.location))
+        self.assertEqual(RequestCache.get_request_cache().data, {})
+
+    def test_course_group_names(self):
+        self.assertEqual(access._course_staff_group_name(self.location), 'staff_edX/toy/2012_Fall')
+        with self.assertNumQueries(0):
+            access._course_instructor_group_name(self.location)
+        # creating a legacy group is noticed straight away
+        Group.objects.create(name='staff_toy')
+        self.assertEqual(access._course_staff_group_name(self.location), 'staff_toy')
@@ -0,0 +1,160 @@
+"""
+Tests for the section scores stored by courseware.grades
+"""
+import json
+from mock import Mock, patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from courseware import grades
+from courseware.models import StudentSectionScore
+from courseware.tests.factories import UserFactory, StudentModuleFactory, location
+from courseware.tests.tests import TEST_DATA_XML_MODULESTORE
+from student.tests.factories import CourseEnrollmentFactory
+from xmodule.graders import Score
+from xmodule.modulestore.django import modulestore
+
+course_id = 'edX/test_course/test'
+
+
+def mock_section(name, problem_names, weight=None):
+    """
+    Return a graded section description, like the ones in
+    course.grading_context['graded_sections'].
+    """
+    section_descriptor = Mock()
+    section_descriptor.location = location(name)
+    problems = []
+    for problem_name in problem_names:
+        problem = Mock(weight=weight, always_recalculate_grades=False)
+        problem.location = location(problem_name)
+        problems.append(problem)
+    return {'section_descriptor': section_descriptor, 'xmoduledescriptors': problems}
+
+
+@override_settings(GENERATE_PROFILE_SCORES=False)
+class TestSectionScores(TestCase):
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.section = mock_section('section', ['p1', 'p2'])
+        self.scores = [Score(1.0, 2.0, True, 'p1'), Score(0.0, 1.0, False, 'p2')]
+
+    def test_round_trip(self):
+        grades.save_section_scores(self.user, course_id, self.section, self.scores)
+        section_scores = grades.load_section_scores(self.user, course_id)
+        self.assertEquals(self.scores, grades.stored_section_scores(self.section, section_scores))
+
+    def test_update(self):
+        grades.save_section_scores(self.user, course_id, self.section, self.scores)
+        grades.save_section_scores(self.user, course_id, self.section, self.scores[:1])
+        section_scores = grades.load_section_scores(self.user, course_id)
+        self.assertEquals(self.scores[:1], grades.stored_section_scores(self.section, section_scores))
+
+    def test_changed_section(self):
+        grades.save_section_scores(self.user, course_id, self.section, self.scores)
+        section_scores = grades.load_section_scores(self.user, course_id)
+
+        reweighted = mock_section('section', ['p1', 'p2'], weight=5)
+        self.assertIsNone(grades.stored_section_scores(reweighted, section_scores))
+
+        extended = mock_section('section', ['p1', 'p2', 'p3'])
+        self.assertIsNone(grades.stored_section_scores(extended, section_scores))
+
+    def test_always_recalculate(self):
+        self.section['xmoduledescriptors'][0].always_recalculate_grades = True
+        grades.save_section_scores(self.user, course_id, self.section, self.scores)
+        self.assertEquals(0, StudentSectionScore.objects.count())
+
+    def test_invalidated_by_deleted_state(self):
+        student_module = StudentModuleFactory.create(student=self.user, course_id=course_id)
+        grades.save_section_scores(self.user, course_id, self.section, self.scores)
+        student_module.delete()
+        self.assertEquals({}, grades.load_section_scores(self.user, course_id))
+
+    @patch('courseware.grades.ModelDataCache')
+    @patch('courseware.grades.score_section')
+    @patch('courseware.grades.graded_sections_containing')
+    def test_update_section_scores(self, mock_sections, mock_score_section, _mock_cache):
+        mock_sections.return_value = [self.section]
+        mock_score_section.return_value = self.scores
+
+        grades.update_section_scores(self.user, Mock(), course_id, location('p1'))
+
+        section_scores = grades.load_section_scores(self.user, course_id)
+        self.assertEquals(self.scores, grades.stored_section_scores(self.section, section_scores))
+
+
+@override_settings(MODULESTORE=TEST_DATA_XML_MODULESTORE, GENERATE_PROFILE_SCORES=False)
+class TestGradedSectionsContaining(TestCase):
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.course = modulestore().get_course('edX/graded/2012_Fall')
+        [self.section] = [
+            section for section in self.course.grading_context['graded_sections']['Homework']
+            if section['section_descriptor'].url_name == 'Homework1'
+        ]
+
+    def test_same_as_grading_context(self):
+        problems = self.section['xmoduledescriptors']
+        self.assertGreater(len(problems), 1)
+
+        [section] = grades.graded_sections_containing(self.course.id, problems[0].location)
+        self.assertEquals(
+            [problem.location for problem in problems],
+            [problem.location for problem in section['xmoduledescriptors']]
+        )
+
+        # Scores stored after a problem is graded are used by grade()
+        scores = [Score(1.0, 2.0, True, problem.display_name_with_default) for problem in problems]
+        grades.save_section_scores(self.user, self.course.id, section, scores)
+        section_scores = grades.load_section_scores(self.user, self.course.id)
+        self.assertEquals(scores, grades.stored_section_scores(self.section, section_scores))
+
+
+class TestAnswerDistributions(TestCase):
+
+    def setUp(self):
+        self.course = Mock(id=course_id)
+        section = mock_section('section', ['p1', 'p2'])
+        for problem in section['xmoduledescriptors']:
+            problem.url_name = problem.location.name
+            problem.display_name_with_default = problem.location.name.upper()
+        self.course.grading_context = {'graded_sections': {'Homework': [section]}}
+
+    def answer(self, problem_name, student_answers, enrolled=True):
+        user = UserFactory.create()
+        if enrolled:
+            CourseEnrollmentFactory.create(user=user, course_id=course_id)
+        StudentModuleFactory.create(
+            student=user,
+            course_id=course_id,
+            module_state_key=location(problem_name).url(),
+            state=json.dumps({'student_answers': student_answers}),
+        )
+
+    def test_counts(self):
+        self.answer('p1', {'p1_2_1': '42'})
+        self.answer('p1', {'p1_2_1': '42'})
+        self.answer('p1', {'p1_2_1': ['a', 'b']})
+        self.answer('p2', {'p2_2_1': '7'})
+        # Not enrolled, not graded, and not answered: not counted
+        self.answer('p2', {'p2_2_1': '7'}, enrolled=False)
+        self.answer('p3', {'p3_2_1': '7'})
+        self.answer('p2', {})
+
+        dist = grades.answer_distributions(self.course)
+
+        self.assertEquals({
+            ('p1', 'P1', 'p1_2_1'): {'42': 2, unicode(['a', 'b']): 1},
+            ('p2', 'P2', 'p2_2_1'): {'7': 1},
+        }, dist)
+
+    def test_batches(self):
+        for _ in range(5):
+            self.answer('p1', {'p1_2_1': '42'})
+
+        answers = list(grades.yield_problem_answers(course_id, [location('p1').url()], batch_size=2))
+        self.assertEquals(5, len(answers))
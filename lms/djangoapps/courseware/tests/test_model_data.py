@@ -3,7 +3,7 @@ from mock import Mock
 from functools import partial
 
 from courseware.model_data import LmsKeyValueStore, InvalidWriteError
-from courseware.model_data import InvalidScopeError, ModelDataCache
+from courseware.model_data import InvalidScopeError, ModelDataCache, MultiUserModelDataCache
 from courseware.models import StudentModule, XModuleContentField, XModuleSettingsField
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
@@ -257,3 +257,49 @@ class TestStudentInfoStorage(StorageTestBase, TestCase):
     scope = Scope.user_info
     key_factory = user_info_key
     storage_class = XModuleStudentInfoField
+
+
+class TestMultiUserModelDataCache(TestCase):
+    """
+    Check that a MultiUserModelDataCache gives each user their own data,
+    without querying the database per user
+    """
+
+    def setUp(self):
+        self.users = [UserFactory.create(username='user%d' % i) for i in range(3)]
+        for i, user in enumerate(self.users[:2]):
+            StudentModuleFactory(student=user, state=json.dumps({'a_field': 'value%d' % i}))
+            StudentPrefsFactory(student=user, value=json.dumps('pref%d' % i))
+        ContentFactory()
+        self.descriptors = [mock_descriptor([
+            mock_field(Scope.user_state, 'a_field'),
+            mock_field(Scope.preferences, 'existing_field'),
+            mock_field(Scope.content, 'existing_field'),
+        ])]
+        self.multi_user_cache = MultiUserModelDataCache(self.descriptors, course_id, self.users)
+
+    def kvs_for(self, user):
+        return LmsKeyValueStore({}, self.multi_user_cache.model_data_cache_for_user(user))
+
+    def test_per_user_data(self):
+        with self.assertNumQueries(0):
+            for i, user in enumerate(self.users[:2]):
+                kvs = self.kvs_for(user)
+                self.assertEquals('value%d' % i, kvs.get(user_state_key('a_field')))
+                self.assertEquals('pref%d' % i, kvs.get(prefs_key('existing_field')))
+                self.assertEquals('old_value', kvs.get(content_key('existing_field')))
+
+    def test_user_without_data(self):
+        with self.assertNumQueries(0):
+            kvs = self.kvs_for(self.users[2])
+            self.assertFalse(kvs.has(user_state_key('a_field')))
+            self.assertEquals('old_value', kvs.get(content_key('existing_field')))
+
+    def test_writes_go_to_database(self):
+        self.kvs_for(self.users[2]).set(user_state_key('a_field'), 'new_value')
+        student_module = StudentModule.objects.get(student=self.users[2])
+        self.assertEquals({'a_field': 'new_value'}, json.loads(student_module.state))
+
+    def test_one_query_per_scope(self):
+        with self.assertNumQueries(3):
+            MultiUserModelDataCache(self.descriptors, course_id, self.users)
@@ -8,6 +8,7 @@ from xmodule.modulestore.tests.factories import CourseFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from django.core.urlresolvers import reverse
 from django.core.management import call_command
+from django.core.cache import cache
 
 from courseware.tests.tests import TEST_DATA_MONGO_MODULESTORE
 from nose.tools import assert_true, assert_equal
@@ -17,9 +18,12 @@ log = logging.getLogger(__name__)
 
 
 @override_settings(MODULESTORE=TEST_DATA_MONGO_MODULESTORE)
-@patch('comment_client.utils.requests.request')
+@patch('comment_client.utils._session.request')
 class ViewsTestCase(ModuleStoreTestCase):
     def setUp(self):
+        # don't answer the comments service requests from an earlier test's cache
+        cache.clear()
+
         # create a course
         self.course = CourseFactory.create(org='MITx', course='999',
                                            display_name='Robot Super Course')
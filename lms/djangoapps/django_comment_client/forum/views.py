@@ -110,10 +110,11 @@ def inline_discussion(request, course_id, discussion_id):
     """
     course = get_course_with_access(request.user, course_id, 'load')
 
+    # get the user's info from the comments service while we get the threads
+    user_info_request = cc.utils.submit(cc.User.from_django_user(request.user).to_dict)
     try:
         threads, query_params = get_threads(request, course_id, discussion_id, per_page=INLINE_THREADS_PER_PAGE)
-        cc_user = cc.User.from_django_user(request.user)
-        user_info = cc_user.to_dict()
+        user_info = user_info_request.get()
     except (cc.utils.CommentClientError, cc.utils.CommentClientUnknownError) as err:
         # TODO (vshnayder): since none of this code seems to be aware of the fact that
         # sometimes things go wrong, I suspect that the js client is also not
@@ -171,6 +172,8 @@ def forum_form_discussion(request, course_id):
     course = get_course_with_access(request.user, course_id, 'load')
     category_map = utils.get_discussion_category_map(course)
 
+    # get the user's info from the comments service while we get the threads
+    user_info_request = cc.utils.submit(cc.User.from_django_user(request.user).to_dict)
     try:
         unsafethreads, query_params = get_threads(request, course_id)   # This might process a search query
         threads = [utils.safe_content(thread) for thread in unsafethreads]
@@ -181,8 +184,7 @@ def forum_form_discussion(request, course_id):
         log.error("Error loading forum discussion threads: %s" % str(err))
         raise Http404
 
-    user = cc.User.from_django_user(request.user)
-    user_info = user.to_dict()
+    user_info = user_info_request.get()
 
     annotated_content_info = utils.get_metadata_for_threads(course_id, threads, request.user, user_info)
 
@@ -239,14 +241,15 @@ def forum_form_discussion(request, course_id):
 @login_required
 def single_thread(request, course_id, discussion_id, thread_id):
     course = get_course_with_access(request.user, course_id, 'load')
-    cc_user = cc.User.from_django_user(request.user)
-    user_info = cc_user.to_dict()
+    # get the user's info from the comments service while we get the thread
+    user_info_request = cc.utils.submit(cc.User.from_django_user(request.user).to_dict)
 
     try:
         thread = cc.Thread.find(thread_id).retrieve(recursive=True, user_id=request.user.id)
     except (cc.utils.CommentClientError, cc.utils.CommentClientUnknownError) as err:
         log.error("Error loading single thread.")
         raise Http404
+    user_info = user_info_request.get()
 
     if request.is_ajax():
         courseware_context = get_courseware_context(thread, course)
@@ -4,23 +4,43 @@ from django.dispatch import receiver
 from student.models import CourseEnrollment
 
 import logging
+from request_cache.middleware import RequestCache
 from util.cache import cache
 from django.core import cache
 cache = cache.get_cache('default')
 
 
-def cached_has_permission(user, permission, course_id=None):
+def get_permissions(user, course_id=None):
     """
-    Call has_permission if it's not cached. A change in a user's role or
-    a role's permissions will only become effective after CACHE_LIFESPAN seconds.
+    Return a frozenset of the names of all the permissions user has in the
+    course.  It is worked out once per request, and otherwise cached: a change
+    in a user's role or a role's permissions will only become effective after
+    CACHE_LIFESPAN seconds.
     """
     CACHE_LIFESPAN = 60
-    key = "permission_%d_%s_%s" % (user.id, str(course_id), permission)
-    val = cache.get(key, None)
-    if val not in [True, False]:
-        val = has_permission(user, permission, course_id=course_id)
-        cache.set(key, val, CACHE_LIFESPAN)
-    return val
+    key = "permissions_%d_%s" % (user.id, str(course_id))
+    # (outside of requests, only the shared cache is used)
+    request_cache = RequestCache.get_request_data('forum_permissions')
+    permissions = request_cache.get(key) if request_cache is not None else None
+    if permissions is None:
+        permissions = cache.get(key)
+        if permissions is None:
+            permissions = set()
+            for role in user.roles.filter(course_id=course_id):
+                permissions.update(role.get_permission_names())
+            permissions = frozenset(permissions)
+            cache.set(key, permissions, CACHE_LIFESPAN)
+        if request_cache is not None:
+            request_cache[key] = permissions
+    return permissions
+
+
+def cached_has_permission(user, permission, course_id=None):
+    """
+    Return whether user has permission in the course, looking it up in
+    the user's cached permissions (see get_permissions).
+    """
+    return permission in get_permissions(user, course_id)
 
 
 def has_permission(user, permission, course_id=None):
@@ -54,19 +74,24 @@ def check_condition(user, condition, course_id, data):
     return handlers[condition](user, condition, course_id, data)
 
 
-def check_conditions_permissions(user, permissions, course_id, **kwargs):
+def check_conditions_permissions(user, permissions, course_id, user_permissions=None, **kwargs):
     """
     Accepts a list of permissions and proceed if any of the permission is valid.
     Note that ["can_view", "can_edit"] will proceed if the user has either
     "can_view" or "can_edit" permission. To use AND operator in between, wrap them in
     a list.
+
+    user_permissions is the set of the user's permissions in the course, if the
+    caller already has it (see get_permissions).
     """
+    if user_permissions is None:
+        user_permissions = get_permissions(user, course_id)
 
     def test(user, per, operator="or"):
         if isinstance(per, basestring):
             if per in CONDITIONS:
                 return check_condition(user, per, course_id, kwargs)
-            return cached_has_permission(user, per, course_id=course_id)
+            return per in user_permissions
         elif isinstance(per, list) and operator in ["and", "or"]:
             results = [test(user, x, operator="and") for x in per]
             if operator == "or":
@@ -106,9 +131,9 @@ VIEW_PERMISSIONS = {
 }
 
 
-def check_permissions_by_view(user, course_id, content, name):
+def check_permissions_by_view(user, course_id, content, name, user_permissions=None):
     try:
         p = VIEW_PERMISSIONS[name]
     except KeyError:
         logging.warning("Permission for view named %s does not exist in permissions.py" % name)
-    return check_conditions_permissions(user, p, course_id, content=content)
+    return check_conditions_permissions(user, p, course_id, user_permissions=user_permissions, content=content)
@@ -0,0 +1,189 @@
+import threading
+
+from django.core.cache import cache
+from django.test import TestCase
+from mock import Mock, patch
+from request_cache.middleware import RequestCache
+import requests
+
+import comment_client
+from comment_client import settings as cc_settings
+from comment_client import utils
+
+THREAD_ID = '518d4237b023791dca00000d'
+
+
+class RequestTestCase(TestCase):
+
+    def test_endpoint_name(self):
+        self.assertEqual(utils.endpoint_name(cc_settings.PREFIX + '/threads/' + THREAD_ID + '/comments'),
+                         '/threads/:id/comments')
+        self.assertEqual(utils.endpoint_name(cc_settings.PREFIX + '/users/42/subscriptions'),
+                         '/users/:id/subscriptions')
+        self.assertEqual(utils.endpoint_name(cc_settings.PREFIX + '/search/threads'), '/search/threads')
+
+    @patch('comment_client.utils.dog_stats_api')
+    @patch('comment_client.utils._session.request')
+    def test_metric_tags(self, mock_request, mock_stats):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.text = '{}'
+
+        utils.perform_request('put', cc_settings.PREFIX + '/threads/' + THREAD_ID + '/abuse_flag', {'user_id': '1'})
+
+        mock_stats.timer.assert_called_with('comment_client.request.time',
+                                            tags=['method:put', 'endpoint:/threads/:id/abuse_flag'])
+
+    @patch('comment_client.utils.dog_stats_api')
+    @patch('comment_client.utils._session.request')
+    def test_concurrent_gets_are_coalesced(self, mock_request, mock_stats):
+        # the first GET blocks until the other two are waiting for it, then fails
+        requested = threading.Event()
+        waiting = threading.Event()
+        waiters = []
+
+        def slow_failing_request(*args, **kwargs):
+            requested.set()
+            waiting.wait(5)
+            raise requests.exceptions.ConnectionError('the comments service is down')
+        mock_request.side_effect = slow_failing_request
+
+        def coalesced(*args, **kwargs):
+            waiters.append(args)
+            if len(waiters) == 2:
+                waiting.set()
+        mock_stats.increment.side_effect = coalesced
+
+        errors = []
+
+        def get_thread():
+            try:
+                utils.perform_request('get', cc_settings.PREFIX + '/threads/' + THREAD_ID, {'recursive': False})
+            except utils.CommentClientError as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=get_thread)]
+        threads[0].start()
+        self.assertTrue(requested.wait(5))
+        threads.extend(threading.Thread(target=get_thread) for _ in range(2))
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(len(waiters), 2)
+        self.assertEqual(len(errors), 3)
+        for err in errors:
+            self.assertIn('the comments service is down', err.message)
+
+    def test_submit(self):
+        self.assertEqual(utils.submit(lambda x, y: x * y, 6, y=7).get(), 42)
+
+    def test_submit_reraises(self):
+        def fail():
+            raise comment_client.CommentClientError('boom')
+        result = utils.submit(fail)
+        with self.assertRaises(comment_client.CommentClientError):
+            result.get()
+
+
+COURSE_ID = 'MITx/999/Robot_Super_Course'
+THREAD = ('{"id": "518d4237b023791dca00000d", "course_id": "MITx/999/Robot_Super_Course", "user_id": "1", '
+          '"title": "Hello", "body": "this is a post", "votes": {"count": 0}}')
+USER = '{"id": "2", "username": "student", "course_id": "MITx/999/Robot_Super_Course"}'
+SEARCH = '{"collection": [], "page": 1, "num_pages": 1}'
+
+
+def fake_request(method, url, **kwargs):
+    """
+    Answer like the comments service would to requests about THREAD and USER
+    """
+    response = Mock(status_code=200)
+    if url.endswith('/threads') or '/search/' in url:
+        response.text = SEARCH
+    elif '/users/' in url:
+        response.text = USER
+    else:
+        response.text = THREAD
+    return response
+
+
+@patch('comment_client.utils._session.request', side_effect=fake_request)
+class CachedGetTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def read_everything(self):
+        comment_client.Thread(id=THREAD_ID).retrieve()
+        comment_client.User(id='2').retrieve()
+        comment_client.Thread.search({'course_id': COURSE_ID})
+
+    def versions(self):
+        return cache.get_many(utils._version_keys([
+            ('thread', THREAD_ID), ('course', COURSE_ID), ('user', '1'), ('user', '2')
+        ]))
+
+    def assert_bumps(self, change, dependencies):
+        """
+        Check that change makes the reads depending on exactly dependencies
+        out of date
+        """
+        self.read_everything()
+        before = self.versions()
+        change()
+        after = self.versions()
+        bumped = set(key for key in after if before.get(key) != after[key])
+        self.assertEqual(bumped, set(utils._version_keys(dependencies)))
+
+    def test_reads_are_remembered_for_the_request(self, mock_request):
+        request_cache = RequestCache()
+        request_cache.process_request(None)
+        try:
+            self.read_everything()
+            cache.clear()
+            self.read_everything()
+        finally:
+            request_cache.process_response(None, None)
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_reads_are_cached(self, mock_request):
+        self.read_everything()
+        self.read_everything()
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_changes_make_reads_miss(self, mock_request):
+        self.read_everything()
+        comment_client.Thread(id=THREAD_ID).retrieve().delete()
+        self.read_everything()
+        # the reads, the delete, then the reads of the thread and of its
+        # course's threads again: the user read is still cached
+        self.assertEqual(mock_request.call_count, 6)
+
+    def test_vote_bumps_versions(self, mock_request):
+        thread = comment_client.Thread(id=THREAD_ID).retrieve()
+        self.assert_bumps(lambda: comment_client.User(id='2').vote(thread, 'up'),
+                          [('thread', THREAD_ID), ('course', COURSE_ID), ('user', '1'), ('user', '2')])
+
+    def test_follow_bumps_versions(self, mock_request):
+        thread = comment_client.Thread(id=THREAD_ID).retrieve()
+        self.assert_bumps(lambda: comment_client.User(id='2').follow(thread), [('user', '2')])
+
+    def test_save_bumps_versions(self, mock_request):
+        thread = comment_client.Thread(id=THREAD_ID).retrieve()
+        self.assert_bumps(thread.save, [('thread', THREAD_ID), ('course', COURSE_ID), ('user', '1')])
+
+    def test_delete_bumps_versions(self, mock_request):
+        thread = comment_client.Thread(id=THREAD_ID).retrieve()
+        self.assert_bumps(thread.delete, [('thread', THREAD_ID), ('course', COURSE_ID), ('user', '1')])
+
+    def test_no_cache_timeout_bypasses_the_cache(self, mock_request):
+        request_cache = RequestCache()
+        request_cache.process_request(None)
+        try:
+            with patch('comment_client.utils.settings.COMMENTS_SERVICE_CACHE_TIMEOUT', 0):
+                self.read_everything()
+                self.read_everything()
+        finally:
+            request_cache.process_response(None, None)
+        self.assertEqual(mock_request.call_count, 6)
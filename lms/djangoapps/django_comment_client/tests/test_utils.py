@@ -1,8 +1,15 @@
+import threading
+
+from django.core.cache import cache
 from django.test import TestCase
+from mock import Mock, patch
 from student.tests.factories import UserFactory, CourseEnrollmentFactory
 from django_comment_common.models import Role, Permission
 from factories import RoleFactory
 import django_comment_client.utils as utils
+from django_comment_client.permissions import get_permissions
+from request_cache.middleware import RequestCache
+from django_comment_common.utils import invalidate_discussion_info
 
 
 class DictionaryTestCase(TestCase):
@@ -29,6 +36,37 @@ class DictionaryTestCase(TestCase):
         self.assertEqual(utils.merge_dict(d1, d2), expected)
 
 
+class GetPermissionsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course_id = 'edX/toy/2012_Fall'
+        self.user = UserFactory()
+        role = RoleFactory(name='Moderator', course_id=self.course_id)
+        role.add_permission('vote')
+        role.users.add(self.user)
+
+    def test_memoized_in_requests(self):
+        RequestCache().process_request(None)
+        try:
+            self.assertEqual(get_permissions(self.user, self.course_id), frozenset(['vote']))
+            cache.clear()
+            with self.assertNumQueries(0):
+                self.assertEqual(get_permissions(self.user, self.course_id), frozenset(['vote']))
+        finally:
+            RequestCache().process_response(None, None)
+
+    def test_outside_requests(self):
+        self.assertEqual(get_permissions(self.user, self.course_id), frozenset(['vote']))
+
+        # e.g. the threads the comment client makes requests in, which
+        # share the cache
+        results = []
+        thread = threading.Thread(target=lambda: results.append(get_permissions(self.user, self.course_id)))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [frozenset(['vote'])])
+
+
 class AccessUtilsTestCase(TestCase):
     def setUp(self):
         self.course_id = 'edX/toy/2012_Fall'
@@ -57,3 +95,60 @@ class AccessUtilsTestCase(TestCase):
 
         ret = utils.has_forum_access('student', self.course_id, 'NotARole')
         self.assertFalse(ret)
+
+
+class DiscussionInfoCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Mock(id='edX/toy/2012_Fall')
+        self.course.location.org = 'edX'
+        self.course.location.course = 'toy'
+        self.info = {'id_map': {'discussion1': {'title': 'Week 1 / Topic'}},
+                     'category_map': {'children': [], 'entries': {}, 'subcategories': {}}}
+
+    def test_computed_once(self):
+        with patch('django_comment_client.utils.compute_discussion_info', return_value=self.info) as compute:
+            self.assertEqual(utils.get_discussion_title(self.course, 'discussion1'), 'Week 1 / Topic')
+            self.assertEqual(utils.get_discussion_id_map(self.course), self.info['id_map'])
+            utils.get_discussion_category_map(self.course)
+        self.assertEqual(compute.call_count, 1)
+
+    def test_recomputed_after_course_changes(self):
+        with patch('django_comment_client.utils.compute_discussion_info', return_value=self.info) as compute:
+            utils.get_discussion_id_map(self.course)
+            invalidate_discussion_info(None, course_id='edX/toy')
+            utils.get_discussion_id_map(self.course)
+            # other courses don't matter
+            invalidate_discussion_info(None, course_id='edX/other')
+            utils.get_discussion_id_map(self.course)
+        self.assertEqual(compute.call_count, 2)
+
+
+class AnnotatedContentInfoTestCase(TestCase):
+    def setUp(self):
+        self.user = Mock(id=7)
+        self.user_info = {'upvoted_ids': ['c1'], 'downvoted_ids': [], 'subscribed_thread_ids': ['t1']}
+        self.thread = {
+            'id': 't1', 'type': 'thread', 'closed': False, 'user_id': '7',
+            'children': [
+                {'id': 'c1', 'type': 'comment', 'closed': False, 'user_id': '8', 'children': [
+                    {'id': 'c2', 'type': 'comment', 'closed': False, 'user_id': '7'},
+                ]},
+            ],
+        }
+
+    def test_permissions_resolved_once(self):
+        permissions = frozenset(['update_thread', 'update_comment', 'create_comment', 'create_sub_comment', 'vote'])
+        with patch('django_comment_client.utils.get_permissions', return_value=permissions) as get_permissions:
+            infos = utils.get_annotated_content_infos('edX/toy/2012_Fall', self.thread, self.user, self.user_info)
+        self.assertEqual(get_permissions.call_count, 1)
+
+        self.assertEqual(infos['t1']['ability'], {
+            'editable': True, 'can_reply': True, 'can_endorse': False,
+            'can_delete': True, 'can_openclose': False, 'can_vote': True,
+        })
+        self.assertTrue(infos['t1']['subscribed'])
+        self.assertEqual(infos['c1']['voted'], 'up')
+        # somebody else's comment
+        self.assertFalse(infos['c1']['ability']['editable'])
+        self.assertTrue(infos['c2']['ability']['editable'])
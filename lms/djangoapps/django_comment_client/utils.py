@@ -10,12 +10,14 @@ from xmodule.modulestore import Location
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.search import path_to_location
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.db import connection
 from django.http import HttpResponse
 from django.utils import simplejson
 from django_comment_common.models import Role
-from django_comment_client.permissions import check_permissions_by_view
+from django_comment_common.utils import discussion_info_version
+from django_comment_client.permissions import check_permissions_by_view, get_permissions
 from xmodule.modulestore.exceptions import NoPathToItem
 
 from mitxmako import middleware
@@ -28,7 +30,6 @@ log = logging.getLogger(__name__)
 
 # TODO these should be cached via django's caching rather than in-memory globals
 _FULLMODULES = None
-_DISCUSSIONINFO = defaultdict(dict)
 
 
 def extract(dic, keys):
@@ -79,23 +80,17 @@ def get_discussion_id_map(course):
     """
         return a dict of the form {category: modules}
     """
-    global _DISCUSSIONINFO
-    initialize_discussion_info(course)
-    return _DISCUSSIONINFO[course.id]['id_map']
+    return get_discussion_info(course)['id_map']
 
 
 def get_discussion_title(course, discussion_id):
-    global _DISCUSSIONINFO
-    initialize_discussion_info(course)
-    title = _DISCUSSIONINFO[course.id]['id_map'].get(discussion_id, {}).get('title', '(no title)')
+    title = get_discussion_info(course)['id_map'].get(discussion_id, {}).get('title', '(no title)')
     return title
 
 
 def get_discussion_category_map(course):
 
-    global _DISCUSSIONINFO
-    initialize_discussion_info(course)
-    return filter_unstarted_categories(_DISCUSSIONINFO[course.id]['category_map'])
+    return filter_unstarted_categories(get_discussion_info(course)['category_map'])
 
 
 def filter_unstarted_categories(category_map):
@@ -146,9 +141,25 @@ def sort_map_entries(category_map):
     category_map["children"] = [x[0] for x in sorted(things, key=lambda x: x[1]["sort_key"])]
 
 
-def initialize_discussion_info(course):
-    global _DISCUSSIONINFO
+def get_discussion_info(course):
+    """
+    Return {'id_map': ..., 'category_map': ...} for course, from the cache if
+    it's been computed since the course last changed, and otherwise computed
+    (and cached for the next time).
+    """
+    key = 'discussion_info.{0}.{1}'.format(
+        discussion_info_version('/'.join([course.location.org, course.location.course])), course.id)
+    discussion_info = cache.get(key)
+    if discussion_info is None:
+        discussion_info = compute_discussion_info(course)
+        cache.set(key, discussion_info)
+    return discussion_info
+
 
+def compute_discussion_info(course):
+    """
+    Walk course's discussion modules, and return its {'id_map': ..., 'category_map': ...}
+    """
     course_id = course.id
 
     discussion_id_map = {}
@@ -223,9 +234,7 @@ def initialize_discussion_info(course):
                                           "start_date": time.gmtime()}
     sort_map_entries(category_map)
 
-    _DISCUSSIONINFO[course.id]['id_map'] = discussion_id_map
-    _DISCUSSIONINFO[course.id]['category_map'] = category_map
-    _DISCUSSIONINFO[course.id]['timestamp'] = datetime.now()
+    return {'id_map': discussion_id_map, 'category_map': category_map}
 
 
 class JsonResponse(HttpResponse):
@@ -282,20 +291,31 @@ class QueryCountDebugMiddleware(object):
         return response
 
 
-def get_ability(course_id, content, user):
+def get_ability(course_id, content, user, user_permissions=None):
+    """
+    Return what user can do with content.  user_permissions is the set of the
+    user's permissions in the course, if the caller already has it.
+    """
+    if user_permissions is None:
+        user_permissions = get_permissions(user, course_id)
+
+    def check(view_name):
+        return check_permissions_by_view(user, course_id, content, view_name, user_permissions=user_permissions)
+
+    is_thread = content['type'] == 'thread'
     return {
-        'editable': check_permissions_by_view(user, course_id, content, "update_thread" if content['type'] == 'thread' else "update_comment"),
-        'can_reply': check_permissions_by_view(user, course_id, content, "create_comment" if content['type'] == 'thread' else "create_sub_comment"),
-        'can_endorse': check_permissions_by_view(user, course_id, content, "endorse_comment") if content['type'] == 'comment' else False,
-        'can_delete': check_permissions_by_view(user, course_id, content, "delete_thread" if content['type'] == 'thread' else "delete_comment"),
-        'can_openclose': check_permissions_by_view(user, course_id, content, "openclose_thread") if content['type'] == 'thread' else False,
-        'can_vote': check_permissions_by_view(user, course_id, content, "vote_for_thread" if content['type'] == 'thread' else "vote_for_comment"),
+        'editable': check("update_thread" if is_thread else "update_comment"),
+        'can_reply': check("create_comment" if is_thread else "create_sub_comment"),
+        'can_endorse': check("endorse_comment") if not is_thread else False,
+        'can_delete': check("delete_thread" if is_thread else "delete_comment"),
+        'can_openclose': check("openclose_thread") if is_thread else False,
+        'can_vote': check("vote_for_thread" if is_thread else "vote_for_comment"),
     }
 
 #TODO: RENAME
 
 
-def get_annotated_content_info(course_id, content, user, user_info):
+def get_annotated_content_info(course_id, content, user, user_info, user_permissions=None):
     """
     Get metadata for an individual content (thread or comment)
     """
@@ -307,7 +327,7 @@ def get_annotated_content_info(course_id, content, user, user_info):
     return {
         'voted': voted,
         'subscribed': content['id'] in user_info['subscribed_thread_ids'],
-        'ability': get_ability(course_id, content, user),
+        'ability': get_ability(course_id, content, user, user_permissions),
     }
 
 #TODO: RENAME
@@ -318,9 +338,11 @@ def get_annotated_content_infos(course_id, thread, user, user_info):
     Get metadata for a thread and its children
     """
     infos = {}
+    # look up the user's permissions once for the whole thread
+    user_permissions = get_permissions(user, course_id)
 
     def annotate(content):
-        infos[str(content['id'])] = get_annotated_content_info(course_id, content, user, user_info)
+        infos[str(content['id'])] = get_annotated_content_info(course_id, content, user, user_info, user_permissions)
         for child in content.get('children', []):
             annotate(child)
     annotate(thread)
@@ -9,6 +9,8 @@ import string
 import datetime
 import json
 
+from optparse import make_option
+
 #import student.models
 from instructor.offline_gradecalc import *
 from courseware.courses import get_course_by_id
@@ -24,6 +26,29 @@ class Command(BaseCommand):
     help += "   course_id_or_dir: either course_id or course_dir\n"
     help += 'Example course_id: MITx/8.01rq_MW/Classical_Mechanics_Reading_Questions_Fall_2012_MW_Section'
 
+    option_list = BaseCommand.option_list + (
+        make_option('-w', '--workers',
+                    type='int',
+                    dest='workers',
+                    default=1,
+                    help='Number of processes to grade students in'),
+        make_option('-s', '--chunk-size',
+                    type='int',
+                    dest='chunk_size',
+                    default=DEFAULT_CHUNK_SIZE,
+                    help='Number of students to load, grade and save together'),
+        make_option('-c', '--checkpoint',
+                    metavar='FILE',
+                    dest='checkpoint',
+                    default=None,
+                    help='Record progress in FILE, so that an interrupted run can be resumed'),
+        make_option('-r', '--resume',
+                    action='store_true',
+                    dest='resume',
+                    default=False,
+                    help='Resume from the checkpoint given with --checkpoint'),
+    )
+
     def handle(self, *args, **options):
 
         print "args = ", args
@@ -45,7 +70,17 @@ class Command(BaseCommand):
                 print "Please provide a course ID or course data directory name, eg content-mit-801rq"
                 return
 
+        if options['resume'] and not options['checkpoint']:
+            print "--resume needs a --checkpoint file to resume from"
+            return
+
         print "-----------------------------------------------------------------------------"
         print "Computing grades for %s" % (course.id)
 
-        offline_grade_calculation(course.id)
+        offline_grade_calculation(
+            course.id,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            checkpoint=options['checkpoint'],
+            resume=options['resume'],
+        )
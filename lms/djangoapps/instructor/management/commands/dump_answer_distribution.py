@@ -0,0 +1,44 @@
+#!/usr/bin/python
+#
+# django management command: dump the distribution of answers to problems
+# to a csv file, for use by batch processes
+
+import csv
+import sys
+
+from instructor.views import get_answers_distribution_data
+from courseware.courses import get_course_by_id
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    args = "<course_id> [<filename>]"
+    help = "dump the distribution of answers to the graded problems of a course to a CSV file.\n"
+    help += "   course_id: the course id\n"
+    help += "   filename: where the output CSV is to be stored (defaults to stdout)\n"
+
+    def handle(self, *args, **options):
+        if len(args) < 1 or len(args) > 2:
+            raise CommandError("Usage: dump_answer_distribution {0}".format(self.args))
+
+        course_id = args[0]
+        try:
+            course = get_course_by_id(course_id)
+        except Exception:
+            raise CommandError("Sorry, cannot find course {0}".format(course_id))
+
+        datatable = get_answers_distribution_data(course)
+
+        fp = open(args[1], 'w') if len(args) > 1 else sys.stdout
+        try:
+            writer = csv.writer(fp, dialect='excel', quotechar='"', quoting=csv.QUOTE_ALL)
+            writer.writerow(datatable['header'])
+            for datarow in datatable['data']:
+                encoded_row = [unicode(s).encode('utf-8') for s in datarow]
+                writer.writerow(encoded_row)
+        finally:
+            if fp is not sys.stdout:
+                fp.close()
+
+        sys.stderr.write("Done: {0} answers dumped\n".format(len(datatable['data'])))
@@ -7,15 +7,23 @@
 
 import json
 import logging
+import multiprocessing
+import os
 import time
 
 import courseware.models
 
 from collections import namedtuple
+from itertools import izip
 from json import JSONEncoder
 from courseware import grades, models
 from courseware.courses import get_course_by_id
+from courseware.model_data import MultiUserModelDataCache, chunks
 from django.contrib.auth.models import User, Group
+from django.db import connection, transaction
+from xmodule.modulestore import django as modulestore_django
+
+log = logging.getLogger(__name__)
 
 
 class MyEncoder(JSONEncoder):
@@ -29,44 +37,187 @@ class MyEncoder(JSONEncoder):
             yield chunk
 
 
-def offline_grade_calculation(course_id):
+class DummyRequest(object):
+    """
+    Stand-in for the request object that grading expects, when grading
+    outside of a web request.
+    """
+    META = {}
+
+    def __init__(self):
+        return
+
+    def get_host(self):
+        return 'edx.mit.edu'
+
+    def is_secure(self):
+        return False
+
+
+# Number of students graded (and saved) together
+DEFAULT_CHUNK_SIZE = 100
+
+
+def load_checkpoint(checkpoint, course_id):
     '''
-    Compute grades for all students for a specified course, and save results to the DB.
+    Return the id of the last student whose grades were saved by an interrupted
+    run for course_id, as recorded in the checkpoint file, or None.
     '''
+    if checkpoint is None or not os.path.exists(checkpoint):
+        return None
+    with open(checkpoint) as checkpoint_file:
+        data = json.load(checkpoint_file)
+    if data.get('course_id') != course_id:
+        return None
+    return data.get('last_user_id')
 
-    tstart = time.time()
-    enrolled_students = User.objects.filter(courseenrollment__course_id=course_id).prefetch_related("groups").order_by('username')
 
+def save_checkpoint(checkpoint, course_id, last_user_id, nstudents_done):
+    '''
+    Record that grades of all students up to last_user_id have been saved.
+    '''
+    # Write to a temporary file first, so that an interruption can't leave
+    # a truncated checkpoint behind
+    tmpname = checkpoint + '.tmp'
+    with open(tmpname, 'w') as checkpoint_file:
+        json.dump({
+            'course_id': course_id,
+            'last_user_id': last_user_id,
+            'nstudents_done': nstudents_done,
+        }, checkpoint_file)
+    os.rename(tmpname, checkpoint)
+
+
+def grade_students(course, student_ids):
+    '''
+    Grade the given students.
+
+    Returns a list of (student id, gradeset encoded as JSON) pairs, and the list of
+    ids of the students who couldn't be graded.
+    '''
     enc = MyEncoder()
+    request = DummyRequest()
+    students = list(User.objects.filter(id__in=student_ids).prefetch_related("groups").order_by('id'))
+    multi_user_cache = MultiUserModelDataCache(course.grading_context['all_descriptors'], course.id, students)
+
+    gradesets = []
+    failed = []
+    for student in students:
+        try:
+            model_data_cache = multi_user_cache.model_data_cache_for_user(student)
+            gradeset = grades.grade(student, request, course, model_data_cache=model_data_cache,
+                                    keep_raw_scores=True)
+            gradesets.append((student.id, enc.encode(gradeset)))
+        except Exception:
+            log.exception("Unable to compute grades for %s in %s", student, course.id)
+            failed.append(student.id)
+    return gradesets, failed
+
+
+@transaction.commit_on_success
+def save_gradesets(course_id, gradesets):
+    '''
+    Store the (student id, gradeset) pairs as OfflineComputedGrades, replacing the
+    students' existing rows: they are deleted and all the rows bulk-inserted, in one
+    transaction, rather than updated one query per student.
+    '''
+    models.OfflineComputedGrade.objects.filter(
+        course_id=course_id,
+        user__in=[user_id for user_id, _ in gradesets],
+    ).delete()
+    models.OfflineComputedGrade.objects.bulk_create([
+        models.OfflineComputedGrade(user_id=user_id, course_id=course_id, gradeset=gradeset)
+        for user_id, gradeset in gradesets
+    ])
 
-    class DummyRequest(object):
-        META = {}
-        def __init__(self):
-            return
-        def get_host(self):
-            return 'edx.mit.edu'
-        def is_secure(self):
-            return False
 
-    request = DummyRequest()
+# The course being graded, in each worker process
+_worker_course = None
+
+
+def _init_worker(course_id):
+    '''
+    Set up a worker process. The database and modulestore connections inherited
+    from the parent process can't be shared, so let the worker open its own.
+    '''
+    global _worker_course
+    connection.close()
+    modulestore_django._MODULESTORES.clear()
+    _worker_course = get_course_by_id(course_id)
 
-    print "%d enrolled students" % len(enrolled_students)
+
+def _grade_students_in_worker(student_ids):
+    return grade_students(_worker_course, student_ids)
+
+
+def offline_grade_calculation(course_id, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint=None, resume=False):
+    '''
+    Compute grades for all students for a specified course, and save results to the DB.
+
+    Students are graded in chunks of chunk_size, with the data for each chunk loaded in
+    a few queries, and the results saved together. If workers is more than 1, chunks
+    are graded in that many processes.
+
+    If checkpoint is a filename, progress is recorded there after each chunk. With
+    resume=True, a run picks up after the last chunk recorded by an interrupted run.
+    '''
+
+    tstart = time.time()
+    student_ids = list(User.objects.filter(courseenrollment__course_id=course_id).order_by('id').values_list('id', flat=True))
+    nstudents = len(student_ids)
+
+    print "%d enrolled students" % nstudents
     course = get_course_by_id(course_id)
 
-    for student in enrolled_students:
-        gradeset = grades.grade(student, request, course, keep_raw_scores=True)
-        gs = enc.encode(gradeset)
-        ocg, created = models.OfflineComputedGrade.objects.get_or_create(user=student, course_id=course_id)
-        ocg.gradeset = gs
-        ocg.save()
-        print "%s done" % student  	# print statement used because this is run by a management command
+    last_user_id = load_checkpoint(checkpoint, course_id) if resume else None
+    if last_user_id is not None:
+        student_ids = [student_id for student_id in student_ids if student_id > last_user_id]
+        print "Resuming after student id %d, %d students left" % (last_user_id, len(student_ids))
+
+    student_chunks = list(chunks(student_ids, chunk_size))
+
+    if workers > 1:
+        # Don't let the workers inherit our database connection
+        connection.close()
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(course_id,))
+        results = pool.imap(_grade_students_in_worker, student_chunks)
+    else:
+        pool = None
+        results = (grade_students(course, student_chunk) for student_chunk in student_chunks)
+
+    ndone = nstudents - len(student_ids)
+    ngraded = 0
+    failed = []
+    try:
+        # Results come back in the order of the chunks, so everything up to the
+        # end of the current chunk has been saved when the checkpoint is written
+        for student_chunk, (gradesets, chunk_failed) in izip(student_chunks, results):
+            save_gradesets(course_id, gradesets)
+            failed.extend(chunk_failed)
+            ndone += len(student_chunk)
+            ngraded += len(student_chunk)
+            if checkpoint is not None:
+                save_checkpoint(checkpoint, course_id, student_chunk[-1], ndone)
+            rate = ngraded / max(time.time() - tstart, 0.001)
+            print "%d / %d students done (%.1f students/sec)" % (ndone, nstudents, rate)  	# print statement used because this is run by a management command
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    if failed:
+        print "Unable to compute grades for %d students: %s" % (len(failed), failed)
 
     tend = time.time()
     dt = tend - tstart
 
-    ocgl = models.OfflineComputedGradeLog(course_id=course_id, seconds=dt, nstudents=len(enrolled_students))
+    ocgl = models.OfflineComputedGradeLog(course_id=course_id, seconds=dt, nstudents=nstudents)
     ocgl.save()
+
+    if checkpoint is not None and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
     print ocgl
+    print "%d students graded in %d seconds (%.1f students/sec)" % (ngraded, dt, ngraded / max(dt, 0.001))
     print "All Done!"
 
 
@@ -81,14 +232,14 @@ def offline_grades_available(course_id):
     return ocgl.latest('created')
 
 
-def student_grades(student, request, course, keep_raw_scores=False, use_offline=False):
+def student_grades(student, request, course, keep_raw_scores=False, use_offline=False, model_data_cache=None):
     '''
     This is the main interface to get grades.  It has the same parameters as grades.grade, as well
     as use_offline.  If use_offline is True then this will look for an offline computed gradeset in the DB.
     '''
 
     if not use_offline:
-        return grades.grade(student, request, course, keep_raw_scores=keep_raw_scores)
+        return grades.grade(student, request, course, model_data_cache=model_data_cache, keep_raw_scores=keep_raw_scores)
 
     try:
         ocg = models.OfflineComputedGrade.objects.get(user=student, course_id=course.id)
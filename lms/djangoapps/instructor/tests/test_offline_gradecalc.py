@@ -0,0 +1,92 @@
+"""
+Unit tests for offline grade calculation
+
+Notes for running by hand:
+
+django-admin.py test --settings=lms.envs.test --pythonpath=. lms/djangoapps/instructor
+"""
+
+import json
+import os
+import tempfile
+
+from django.db import connection
+from django.test.utils import override_settings
+
+from courseware.models import OfflineComputedGrade, OfflineComputedGradeLog
+from courseware.tests.tests import LoginEnrollmentTestCase, TEST_DATA_XML_MODULESTORE, get_user
+from instructor.offline_gradecalc import offline_grade_calculation, save_checkpoint, load_checkpoint, save_gradesets
+from xmodule.modulestore.django import modulestore
+import xmodule.modulestore.django
+
+
+@override_settings(MODULESTORE=TEST_DATA_XML_MODULESTORE)
+class TestOfflineGradeCalculation(LoginEnrollmentTestCase):
+    '''
+    Check that grades are computed and stored for every enrolled student
+    '''
+
+    def setUp(self):
+        xmodule.modulestore.django._MODULESTORES = {}
+
+        self.toy = modulestore().get_course("edX/toy/2012_Fall")
+
+        self.password = 'foo'
+        self.emails = ['offline%d@test.com' % i for i in range(3)]
+        for i, email in enumerate(self.emails):
+            self.create_account('offline%d' % i, email, self.password)
+            self.activate_user(email)
+            self.login(email, self.password)
+            self.enroll(self.toy)
+            self.logout()
+
+        checkpoint_file, self.checkpoint = tempfile.mkstemp()
+        os.close(checkpoint_file)
+        os.remove(self.checkpoint)
+
+    def tearDown(self):
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def test_grades_all_students(self):
+        offline_grade_calculation(self.toy.id, chunk_size=2, checkpoint=self.checkpoint)
+
+        for email in self.emails:
+            ocg = OfflineComputedGrade.objects.get(user=get_user(email), course_id=self.toy.id)
+            self.assertIn('percent', json.loads(ocg.gradeset))
+        self.assertEqual(OfflineComputedGradeLog.objects.get(course_id=self.toy.id).nstudents, 3)
+        # A finished run doesn't leave a checkpoint to resume from
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+        # Running again updates the existing rows
+        offline_grade_calculation(self.toy.id, chunk_size=2)
+        self.assertEqual(OfflineComputedGrade.objects.filter(course_id=self.toy.id).count(), 3)
+
+    def test_resume(self):
+        first, second, third = [get_user(email) for email in self.emails]
+        save_checkpoint(self.checkpoint, self.toy.id, second.id, 2)
+        self.assertEqual(load_checkpoint(self.checkpoint, self.toy.id), second.id)
+        self.assertIsNone(load_checkpoint(self.checkpoint, 'edX/full/6.002_Spring_2012'))
+
+        offline_grade_calculation(self.toy.id, checkpoint=self.checkpoint, resume=True)
+
+        graded = OfflineComputedGrade.objects.filter(course_id=self.toy.id).values_list('user', flat=True)
+        self.assertEqual(list(graded), [third.id])
+
+    def count_queries(self, gradesets):
+        with override_settings(DEBUG=True):
+            before = len(connection.queries)
+            save_gradesets(self.toy.id, gradesets)
+            return len(connection.queries) - before
+
+    def test_save_gradesets_over_existing_rows(self):
+        users = [get_user(email) for email in self.emails]
+        save_gradesets(self.toy.id, [(user.id, '{}') for user in users])
+
+        # as many queries for one student as for all of them
+        self.assertEqual(self.count_queries([(users[0].id, '{"percent": 0.5}')]),
+                         self.count_queries([(user.id, '{"percent": 1}') for user in users]))
+        self.assertEqual(
+            sorted(OfflineComputedGrade.objects.filter(course_id=self.toy.id).values_list('user', 'gradeset')),
+            sorted((user.id, u'{"percent": 1}') for user in users)
+        )
@@ -914,7 +914,13 @@ def get_student_grade_summary_data(request, course, course_id, get_grades=True,
     datatable = {'header': header, 'assignments': assignments, 'students': enrolled_students}
     data = []
 
-    for student in enrolled_students:
+    if get_grades and not use_offline:
+        # Load the data for grading many students at once
+        students_and_caches = grades.yield_student_model_data_caches(course, enrolled_students)
+    else:
+        students_and_caches = ((student, None) for student in enrolled_students)
+
+    for student, model_data_cache in students_and_caches:
         datarow = [student.id, student.username, student.profile.name, student.email]
         try:
             datarow.append(student.externalauthmap.external_email)
@@ -922,7 +928,8 @@ def get_student_grade_summary_data(request, course, course_id, get_grades=True,
             datarow.append('')
 
         if get_grades:
-            gradeset = student_grades(student, request, course, keep_raw_scores=get_raw_scores, use_offline=use_offline)
+            gradeset = student_grades(student, request, course, keep_raw_scores=get_raw_scores, use_offline=use_offline,
+                                      model_data_cache=model_data_cache)
             log.debug('student={0}, gradeset={1}'.format(student, gradeset))
             if get_raw_scores:
                 # TODO (ichuang) encode Score as dict instead of as list, so score[0] -> score['earned']
@@ -956,10 +963,10 @@ def gradebook(request, course_id):
     student_info = [{'username': student.username,
                      'id': student.id,
                      'email': student.email,
-                     'grade_summary': student_grades(student, request, course),
+                     'grade_summary': student_grades(student, request, course, model_data_cache=model_data_cache),
                      'realname': student.profile.name,
                      }
-                     for student in enrolled_students]
+                     for student, model_data_cache in grades.yield_student_model_data_caches(course, enrolled_students)]
 
     return render_to_response('courseware/gradebook.html', {
         'students': student_info,
@@ -1089,8 +1096,15 @@ def get_answers_distribution(request, course_id):
     'data': a list of rows
     """
     course = get_course_with_access(request.user, course_id, 'staff')
+    return get_answers_distribution_data(course)
+
 
-    dist = grades.answer_distributions(request, course)
+def get_answers_distribution_data(course):
+    """
+    Get the distribution of answers for all graded problems in course, in the
+    same format as get_answers_distribution.
+    """
+    dist = grades.answer_distributions(course)
 
     d = {}
     d['header'] = ['url_name', 'display name', 'answer id', 'answer', 'count']
@@ -223,6 +223,17 @@ DEV_CONTENT = True
 TRACK_MAX_EVENT = 10000
 DEBUG_TRACK_LOG = False
 
+# Write tracking events from a background thread, in batches, instead of while
+# handling requests.  When QUEUE_SIZE events are waiting, new ones are dropped.
+TRACKING_LOG_WRITER = {
+    'ENABLED': True,
+    'QUEUE_SIZE': 10000,
+    # write at most this many events at a time...
+    'BATCH_SIZE': 100,
+    # ...waiting at most this many seconds for a batch to fill up
+    'FLUSH_INTERVAL': 1.0,
+}
+
 MITX_ROOT_URL = ''
 
 LOGIN_REDIRECT_URL = MITX_ROOT_URL + '/accounts/login'
@@ -269,6 +280,23 @@ MODULESTORE = {
 }
 CONTENTSTORE = None
 
+# Course assets (served by contentserver.middleware.StaticContentServer) bigger
+# than this many bytes are streamed from the contentstore instead of being
+# cached whole (memcached can't hold items over 1MB)
+STATIC_CONTENT_MAX_CACHED_SIZE = 512 * 1024
+
+# Large course assets can also be kept in a cache on local disk, so that they
+# are served without reading them from the contentstore
+STATIC_CONTENT_DISK_CACHE = {
+    # Directory for the cached files.  None means don't cache assets on disk.
+    'ROOT': None,
+    # How many bytes of assets to keep, at most
+    'MAX_SIZE': 1024 * 1024 * 1024,
+    # A header (e.g. 'X-Sendfile') telling the web server to send a cached file
+    # itself, if it supports that.  None means send the files from Django.
+    'SENDFILE_HEADER': None,
+}
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -282,6 +310,20 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # Keep long-lived sandbox processes to run code in, instead of starting
+    # one for every execution.  See capa.safe_exec.worker_pool.
+    'worker_pool': {
+        # How many workers each LMS process can have.  0 turns the pool off.
+        'size': 0,
+        # How many jobs a worker runs before it is replaced.
+        'max_jobs': 100,
+        # How many seconds of real time can a job use?
+        'timeout': 10,
+        # How much memory (in bytes) can a job use, including the numpy and
+        # friends its worker has already imported?
+        'vmem_limit': 500000000,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
@@ -28,6 +28,11 @@ class Comment(models.Model):
     def thread(self):
         return Thread(id=self.thread_id, type='thread')
 
+    def cache_dependencies(self, attributes):
+        # comments are part of their thread
+        return [('thread', attributes.get('thread_id')), ('course', attributes.get('course_id')),
+                ('user', attributes.get('user_id'))]
+
     @classmethod
     def url_for_comments(cls, params={}):
         if params.get('thread_id'):
@@ -52,6 +57,7 @@ class Comment(models.Model):
         params = {'user_id': user.id}
         request = perform_request('put', url, params)
         voteable.update_attributes(request)
+        voteable.invalidate_cached_gets(request)
 
     def unFlagAbuse(self, user, voteable, removeAll):
         if voteable.type == 'thread':
@@ -67,6 +73,7 @@ class Comment(models.Model):
 
         request = perform_request('put', url, params)
         voteable.update_attributes(request)
+        voteable.invalidate_cached_gets(request)
 
 
 def _url_for_thread_comments(thread_id):
@@ -82,6 +82,23 @@ class Model(object):
     def initializable_attributes(self):
         return extract(self.attributes, self.initializable_fields)
 
+    def cache_dependencies(self, attributes):
+        """
+        Return the (kind, id) pairs for the cached reads (see utils.cached_get)
+        that a change to the object with attributes affects.
+        """
+        return []
+
+    def invalidate_cached_gets(self, response=None):
+        """
+        Make the cached reads that a change to this object affects out of date.
+        response is what the comments service answered to the change, if anything.
+        """
+        attributes = dict(self.attributes)
+        if isinstance(response, dict):
+            attributes.update(response)
+        invalidate_cached_gets(self.cache_dependencies(attributes))
+
     @classmethod
     def before_save(cls, instance):
         pass
@@ -100,6 +117,7 @@ class Model(object):
             response = perform_request('post', url, self.initializable_attributes())
         self.retrieved = True
         self.update_attributes(**response)
+        self.invalidate_cached_gets()
         self.__class__.after_save(self)
 
     def delete(self):
@@ -107,6 +125,7 @@ class Model(object):
         response = perform_request('delete', url)
         self.retrieved = True
         self.update_attributes(**response)
+        self.invalidate_cached_gets()
 
     @classmethod
     def url_with_id(cls, params={}):
@@ -11,3 +11,14 @@ if hasattr(settings, "COMMENTS_SERVICE_KEY"):
     API_KEY = settings.COMMENTS_SERVICE_KEY
 else:
     API_KEY = "PUT_YOUR_API_KEY_HERE"
+
+# Seconds to wait for the comments service to answer a request
+COMMENTS_SERVICE_TIMEOUT = getattr(settings, "COMMENTS_SERVICE_TIMEOUT", 5)
+
+# How many requests to the comments service can be made concurrently (see utils.submit)
+COMMENTS_SERVICE_CONCURRENCY = getattr(settings, "COMMENTS_SERVICE_CONCURRENCY", 4)
+
+# Seconds to cache reads of threads, users and thread searches for.  Writes
+# made through this client make the affected cached reads out of date at once.
+# 0 turns the cache off.
+COMMENTS_SERVICE_CACHE_TIMEOUT = getattr(settings, "COMMENTS_SERVICE_CACHE_TIMEOUT", 30)
@@ -39,7 +39,7 @@ class Thread(models.Model):
             url = cls.url(action='get_all', params=extract(params, 'commentable_id'))
             if params.get('commentable_id'):
                 del params['commentable_id']
-        response = perform_request('get', url, params, *args, **kwargs)
+        response = cached_get(url, params, [('course', query_params['course_id'])], *args, **kwargs)
         return response.get('collection', []), response.get('page', 1), response.get('num_pages', 1)
 
     @classmethod
@@ -78,9 +78,13 @@ class Thread(models.Model):
         # request.
         request_params = strip_none(request_params)
 
-        response = perform_request('get', url, request_params)
+        response = cached_get(url, request_params, [('thread', self.id)])
         self.update_attributes(**response)
 
+    def cache_dependencies(self, attributes):
+        return [('thread', attributes.get('id')), ('course', attributes.get('course_id')),
+                ('user', attributes.get('user_id'))]
+
     def flagAbuse(self, user, voteable):
         if voteable.type == 'thread':
             url = _url_for_flag_abuse_thread(voteable.id)
@@ -91,6 +95,7 @@ class Thread(models.Model):
         params = {'user_id': user.id}
         request = perform_request('put', url, params)
         voteable.update_attributes(request)
+        voteable.invalidate_cached_gets(request)
 
     def unFlagAbuse(self, user, voteable, removeAll):
         if voteable.type == 'thread':
@@ -106,18 +111,21 @@ class Thread(models.Model):
 
         request = perform_request('put', url, params)
         voteable.update_attributes(request)
+        voteable.invalidate_cached_gets(request)
 
     def pin(self, user, thread_id):
         url = _url_for_pin_thread(thread_id)
         params = {'user_id': user.id}
         request = perform_request('put', url, params)
         self.update_attributes(request)
+        self.invalidate_cached_gets(request)
 
     def un_pin(self, user, thread_id):
         url = _url_for_un_pin_thread(thread_id)
         params = {'user_id': user.id}
         request = perform_request('put', url, params)
         self.update_attributes(request)
+        self.invalidate_cached_gets(request)
 
 
 def _url_for_flag_abuse_thread(thread_id):
@@ -30,10 +30,12 @@ class User(models.Model):
     def follow(self, source):
         params = {'source_type': source.type, 'source_id': source.id}
         response = perform_request('post', _url_for_subscription(self.id), params)
+        self.invalidate_cached_gets()
 
     def unfollow(self, source):
         params = {'source_type': source.type, 'source_id': source.id}
         response = perform_request('delete', _url_for_subscription(self.id), params)
+        self.invalidate_cached_gets()
 
     def vote(self, voteable, value):
         if voteable.type == 'thread':
@@ -45,6 +47,8 @@ class User(models.Model):
         params = {'user_id': self.id, 'value': value}
         request = perform_request('put', url, params)
         voteable.update_attributes(request)
+        self.invalidate_cached_gets()
+        voteable.invalidate_cached_gets(request)
 
     def unvote(self, voteable):
         if voteable.type == 'thread':
@@ -56,6 +60,8 @@ class User(models.Model):
         params = {'user_id': self.id}
         request = perform_request('delete', url, params)
         voteable.update_attributes(request)
+        self.invalidate_cached_gets()
+        voteable.invalidate_cached_gets(request)
 
     def active_threads(self, query_params={}):
         if not self.course_id:
@@ -77,12 +83,15 @@ class User(models.Model):
 
     def _retrieve(self, *args, **kwargs):
         url = self.url(action='get', params=self.attributes)
-        retrieve_params = self.default_retrieve_params
+        retrieve_params = dict(self.default_retrieve_params)
         if self.attributes.get('course_id'):
             retrieve_params['course_id'] = self.course_id
-        response = perform_request('get', url, retrieve_params)
+        response = cached_get(url, retrieve_params, [('user', self.id)])
         self.update_attributes(**response)
 
+    def cache_dependencies(self, attributes):
+        return [('user', attributes.get('id'))]
+
 
 def _url_for_vote_comment(comment_id):
     return "{prefix}/comments/{comment_id}/votes".format(prefix=settings.PREFIX, comment_id=comment_id)
@@ -1,11 +1,34 @@
+from django.core.cache import cache
 from dogapi import dog_stats_api
+from multiprocessing.pool import ThreadPool
+from request_cache.middleware import RequestCache
+import copy
+import hashlib
 import json
 import logging
+import re
 import requests
+import threading
+import uuid
 import settings
 
 log = logging.getLogger(__name__)
 
+# One session for all the requests, so connections to the comments service are reused
+_session = requests.session()
+
+# Threads for the requests made with submit, started when first needed
+_pool = None
+_pool_lock = threading.Lock()
+
+# The GETs being made right now, by (url, params): other threads wanting the
+# same thing wait for their answers instead of asking again
+_gets_in_flight = {}
+_gets_in_flight_lock = threading.Lock()
+
+# Ids in urls, which are left out of the names of endpoints in metrics
+ID_IN_URL_RE = re.compile(r'/([0-9a-f]{24}|\d+)(?=/|$)')
+
 
 def strip_none(dic):
     return dict([(k, v) for k, v in dic.iteritems() if v is not None])
@@ -28,16 +51,76 @@ def merge_dict(dic1, dic2):
     return dict(dic1.items() + dic2.items())
 
 
+def endpoint_name(url):
+    """
+    Return the name of the endpoint url is for, e.g. "/threads/:id/comments"
+    """
+    if url.startswith(settings.PREFIX):
+        url = url[len(settings.PREFIX):]
+    return ID_IN_URL_RE.sub('/:id', url)
+
+
+class _GetInFlight(object):
+    """
+    A GET being made, whose answer (or error) other threads can wait for
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def _request(method, url, data_or_params):
+    """
+    Make the request, and return the response
+    """
+    tags = ['method:{0}'.format(method), 'endpoint:{0}'.format(endpoint_name(url))]
+    with dog_stats_api.timer('comment_client.request.time', tags=tags):
+        if method in ['post', 'put', 'patch']:
+            return _session.request(method, url, data=data_or_params, timeout=settings.COMMENTS_SERVICE_TIMEOUT)
+        else:
+            return _session.request(method, url, params=data_or_params, timeout=settings.COMMENTS_SERVICE_TIMEOUT)
+
+
+def _coalesced_get(url, params):
+    """
+    Make a GET request, unless the same one is already being made, in which
+    case wait for its response.
+    """
+    key = (url, repr(sorted(params.items())))
+    with _gets_in_flight_lock:
+        in_flight = _gets_in_flight.get(key)
+        leader = in_flight is None
+        if leader:
+            in_flight = _gets_in_flight[key] = _GetInFlight()
+
+    if leader:
+        try:
+            in_flight.response = _request('get', url, params)
+        except Exception as err:
+            in_flight.error = err
+        finally:
+            with _gets_in_flight_lock:
+                del _gets_in_flight[key]
+            in_flight.done.set()
+    else:
+        dog_stats_api.increment('comment_client.request.coalesced', tags=['endpoint:{0}'.format(endpoint_name(url))])
+        in_flight.done.wait()
+
+    if in_flight.error is not None:
+        raise in_flight.error
+    return in_flight.response
+
+
 def perform_request(method, url, data_or_params=None, *args, **kwargs):
     if data_or_params is None:
         data_or_params = {}
     data_or_params['api_key'] = settings.API_KEY
     try:
-        with dog_stats_api.timer('comment_client.request.time'):
-            if method in ['post', 'put', 'patch']:
-                response = requests.request(method, url, data=data_or_params, timeout=5)
-            else:
-                response = requests.request(method, url, params=data_or_params, timeout=5)
+        if method == 'get':
+            response = _coalesced_get(url, data_or_params)
+        else:
+            response = _request(method, url, data_or_params)
     except Exception as err:
         # remove API key if it is in the params
         if 'api_key' in data_or_params:
@@ -62,6 +145,84 @@ def perform_request(method, url, data_or_params=None, *args, **kwargs):
             return json.loads(response.text)
 
 
+def _request_memo():
+    """
+    Return the dict of the reads made while handling the current request, or
+    None if we aren't handling one in this thread.
+    """
+    return RequestCache.get_request_data('comment_client')
+
+
+def _version_keys(dependencies):
+    return ['comment_client.version.{0}.{1}'.format(kind, id) for kind, id in dependencies]
+
+
+def cached_get(url, params, dependencies, *args, **kwargs):
+    """
+    perform_request('get', url, params), with the answer remembered for the
+    rest of the request, and cached for COMMENTS_SERVICE_CACHE_TIMEOUT seconds.
+
+    dependencies is a list of (kind, id) pairs, like ('thread', thread_id),
+    for the things the answer depends on: invalidate_cached_gets makes the
+    cached answers depending on them out of date.
+    """
+    if not settings.COMMENTS_SERVICE_CACHE_TIMEOUT:
+        return perform_request('get', url, params, *args, **kwargs)
+
+    memo = _request_memo()
+    memo_key = (url, repr(sorted(params.items())), kwargs.get('raw', False))
+    if memo is not None and memo_key in memo:
+        return copy.deepcopy(memo[memo_key])
+
+    # the current version of everything the answer depends on is part of its key
+    version_keys = _version_keys(sorted(set(dependencies)))
+    versions = cache.get_many(version_keys)
+    for version_key in version_keys:
+        if version_key not in versions:
+            versions[version_key] = uuid.uuid4().hex
+            cache.set(version_key, versions[version_key])
+    key = 'comment_client.get.{0}'.format(hashlib.md5(repr((
+        memo_key, [versions[version_key] for version_key in version_keys]))).hexdigest())
+
+    response = cache.get(key)
+    if response is None:
+        response = perform_request('get', url, params, *args, **kwargs)
+        cache.set(key, response, settings.COMMENTS_SERVICE_CACHE_TIMEOUT)
+    if memo is not None:
+        memo[memo_key] = copy.deepcopy(response)
+    return response
+
+
+def invalidate_cached_gets(dependencies):
+    """
+    Make the cached answers of cached_get that depend on any of dependencies,
+    a list of (kind, id) pairs with ids that can be None, out of date.
+    """
+    dependencies = [(kind, id) for kind, id in dependencies if id is not None]
+    if dependencies:
+        cache.set_many(dict((version_key, uuid.uuid4().hex) for version_key in _version_keys(dependencies)))
+    memo = _request_memo()
+    if memo is not None:
+        memo.clear()
+
+
+def submit(func, *args, **kwargs):
+    """
+    Start calling func(*args, **kwargs) in one of a bounded pool of threads,
+    so that requests to the comments service it makes can proceed while the
+    caller does something else.  Returns an object whose get() method waits
+    for, and returns, what func returned (or raises what it raised).
+
+    func shouldn't use the database: the pool's threads don't clean up
+    database connections.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(settings.COMMENTS_SERVICE_CONCURRENCY)
+    return _pool.apply_async(func, args, kwargs)
+
+
 class CommentClientError(Exception):
     def __init__(self, msg):
         self.message = msg
@@ -3,6 +3,7 @@ from dogapi import dog_http_api, dog_stats_api
 from django.conf import settings
 from xmodule.modulestore.django import modulestore
 from request_cache.middleware import RequestCache
+from capa.safe_exec import worker_pool
 
 from django.core.cache import get_cache, InvalidCacheBackendError
 
@@ -12,6 +13,15 @@ for store_name in settings.MODULESTORE:
     store.metadata_inheritance_cache_subsystem = cache
     store.request_cache = RequestCache.get_request_cache()
 
+worker_pool_settings = settings.CODE_JAIL.get('worker_pool', {})
+if worker_pool_settings.get('size'):
+    worker_pool.configure(
+        python_bin=settings.CODE_JAIL.get('python_bin'),
+        user=settings.CODE_JAIL.get('user'),
+        cpu_limit=settings.CODE_JAIL.get('limits', {}).get('CPU'),
+        **worker_pool_settings
+    )
+
 if hasattr(settings, 'DATADOG_API'):
     dog_http_api.api_key = settings.DATADOG_API
     dog_stats_api.start(api_key=settings.DATADOG_API, statsd=True)